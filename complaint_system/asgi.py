@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'complaint_system.settings')
+# The polled read endpoints have async views; route to them under ASGI
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+from complaints import duplicates  # noqa: E402
+from complaints.reminders import start_scheduler  # noqa: E402
+
+start_scheduler()
+duplicates.warm()
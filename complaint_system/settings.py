@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'complaints.metrics.MetricsMiddleware',  # Request counts and latency for /metrics
+    'complaints.profiling.ProfilingMiddleware',  # Removes itself unless REQUEST_PROFILING
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -117,6 +119,40 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Largest accepted complaint attachment, in bytes
+COMPLAINT_UPLOAD_MAX_FILE_SIZE = int(os.environ.get('COMPLAINT_UPLOAD_MAX_FILE_SIZE', 5 * 1024 * 1024))
+
+# Threads generating attachment thumbnails in each worker (0 = inline on commit)
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Reverse geocoding: an optional Nominatim endpoint (offline by default; set
+# e.g. https://nominatim.openstreetmap.org/reverse to opt in), an optional
+# gazetteer CSV of name,latitude,longitude[,radius_m], and the size of the
+# in-process LRU in front of the GeocodeCache table
+GEOCODE_NOMINATIM_URL = os.environ.get('GEOCODE_NOMINATIM_URL', '')
+GEOCODE_GAZETTEER = os.environ.get('GEOCODE_GAZETTEER', '')
+GEOCODE_TIMEOUT = float(os.environ.get('GEOCODE_TIMEOUT', 3))
+GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', 4096))
+
+# Cache for API payloads and the admin id list. Local memory by default
+# (per process); point CACHE_BACKEND/CACHE_LOCATION at a shared backend such
+# as django.core.cache.backends.redis.RedisCache + redis://host:6379/0 or
+# django.core.cache.backends.filebased.FileBasedCache + a directory so every
+# worker sees the same invalidations
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'complaints'),
+    }
+}
+
+# Seconds a cached API payload may be served; writes invalidate sooner
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 60))
+
+# Serve the polled read endpoints with their async views. asgi.py turns it on;
+# under WSGI each async view would run in its own event loop
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -125,6 +161,27 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Reminder sweep: seconds between in-process sweeps in each web worker
+# (0 disables it; run `python manage.py sweep_reminders` from cron instead)
+REMINDER_SWEEP_INTERVAL = int(os.environ.get('REMINDER_SWEEP_INTERVAL', 0))
+
+# Request profiling: Server-Timing headers, query counts and repeated-query
+# (N+1) warnings for every request, per-endpoint numbers at
+# /api/get-request-metrics/, and a cProfile (.prof) or pyinstrument (.html)
+# dump of a REQUEST_PROFILING_SAMPLE_RATE share of requests
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'False') == 'True'
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', 0))
+REQUEST_PROFILER = os.environ.get('REQUEST_PROFILER', 'cprofile')
+REQUEST_PROFILING_DIR = os.environ.get('REQUEST_PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+# Prometheus metrics at /metrics. Each worker reports only its own numbers
+# unless METRICS_MULTIPROC_DIR names a directory every worker can write
+# (empty it when the server starts). Only admins' sessions can read it
+# unless METRICS_TOKEN is set, which scrapers then send as
+# `Authorization: Bearer <token>` (render.yaml generates one)
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'complaint_system.settings')
 
 application = get_wsgi_application()
+
+from complaints import duplicates  # noqa: E402
+from complaints.reminders import start_scheduler  # noqa: E402
+
+start_scheduler()
+duplicates.warm()
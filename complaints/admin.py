@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Complaint, ComplaintFile, Notification
+from .models import Complaint, ComplaintFile, GeocodeCache, Notification
 
 class ComplaintFileInline(admin.TabularInline):
     model = ComplaintFile
@@ -8,6 +8,7 @@ class ComplaintFileInline(admin.TabularInline):
 
 @admin.register(Complaint)
 class ComplaintAdmin(admin.ModelAdmin):
+    """Edits here skip the dashboard counters; run ``manage.py rebuild_complaint_stats`` afterwards"""
     list_display = ['complaint_id', 'user', 'complaint_type', 'status', 'urgency', 'submitted_at']
     list_filter = ['status', 'urgency', 'complaint_type', 'submitted_at']
     search_fields = ['complaint_id', 'user__username', 'user__email', 'details', 'location']
@@ -46,4 +47,12 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'type', 'read', 'created_at']
     list_filter = ['type', 'read', 'created_at']
     search_fields = ['title', 'message', 'user__username']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['key', 'address', 'source', 'created_at']
+    list_filter = ['source']
+    search_fields = ['key', 'address']
+    readonly_fields = ['created_at']
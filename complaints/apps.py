@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ComplaintsConfig(AppConfig):
     name = 'complaints'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if settings.REQUEST_PROFILING:
+            # Before any connection opens, so every thread's connection is wrapped
+            from . import profiling
+            profiling.install()
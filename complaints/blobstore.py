@@ -0,0 +1,124 @@
+"""
+Content-addressed storage for complaint attachments.
+
+Attachment bytes live once per SHA-256 under ``blobs/<aa>/<bb>/<hash><ext>``
+and each ``ComplaintFile`` points at its ``Blob``. Re-attaching the same
+photo only bumps ``Blob.ref_count``; streamed uploads whose content is new
+are renamed into place rather than copied. When the last reference goes
+(``ComplaintFile`` post_delete, including complaint cascades) the blob row
+and its file are garbage collected.
+"""
+import os
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+
+from .models import Blob, ComplaintFile
+
+BLOB_ROOT = 'blobs'
+STAGING_DIR = f'{BLOB_ROOT}/incoming'
+
+
+def blob_name(sha256, original_name=''):
+    """Storage name for content with hash ``sha256``"""
+    ext = os.path.splitext(original_name)[1].lower()[:10]
+    return f'{BLOB_ROOT}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def staging_name():
+    """Temporary storage name for an upload whose hash is not known yet"""
+    return f'{STAGING_DIR}/{uuid.uuid4().hex}'
+
+
+def _acquire(sha256):
+    """Take a reference on an existing blob, returning it or None"""
+    if Blob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+        return Blob.objects.get(sha256=sha256)
+    return None
+
+
+def _create(sha256, size, name, write):
+    """Create the blob row after ``write(name)`` put the content in storage"""
+    write(name)
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(sha256=sha256, file=name, size=size, ref_count=1)
+    except IntegrityError:
+        # Another request stored the same content first; both wrote identical bytes
+        return _acquire(sha256)
+
+
+def adopt(stored_name, sha256, size, original_name=''):
+    """
+    Take a reference on the blob for a file already written to ``stored_name``.
+
+    The staged file is deleted when the content is already stored, or
+    renamed to its blob path otherwise.
+    """
+    blob = _acquire(sha256)
+    if blob is not None:
+        default_storage.delete(stored_name)
+        return blob
+
+    def move(name):
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(default_storage.path(stored_name), target)
+
+    return _create(sha256, size, blob_name(sha256, original_name), move)
+
+
+def store_bytes(content, sha256, original_name=''):
+    """Take a reference on the blob holding ``content``, writing it if new"""
+    blob = _acquire(sha256)
+    if blob is not None:
+        return blob
+
+    def write(name):
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(content))
+
+    return _create(sha256, len(content), blob_name(sha256, original_name), write)
+
+
+def attach(complaint, blob, name):
+    """Create a ComplaintFile for ``complaint`` backed by ``blob``"""
+    return ComplaintFile.objects.create(
+        complaint=complaint,
+        blob=blob,
+        file=blob.file.name,
+        name=name,
+        size=blob.size,
+        sha256=blob.sha256
+    )
+
+
+def release(blob_id):
+    """Drop one reference to a blob and collect it once nothing uses it"""
+    Blob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: collect_garbage([blob_id]))
+
+
+def collect_garbage(blob_ids=None):
+    """
+    Delete unreferenced blobs and their files.
+
+    Rows are locked while their files are removed, so a concurrent upload of
+    the same content waits and then stores a fresh copy.
+    """
+    with transaction.atomic():
+        blobs = Blob.objects.select_for_update().filter(ref_count__lte=0).exclude(
+            Exists(ComplaintFile.objects.filter(blob=OuterRef('pk')))
+        )
+        if blob_ids is not None:
+            blobs = blobs.filter(pk__in=blob_ids)
+        blobs = list(blobs)
+        for blob in blobs:
+            default_storage.delete(blob.file.name)
+            if blob.thumbnail:
+                default_storage.delete(blob.thumbnail.name)
+        Blob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+    return len(blobs), sum(blob.size for blob in blobs)
@@ -0,0 +1,97 @@
+"""
+Batch status changes and deletes for the admin panel.
+
+Each call locks the requested complaints, applies a single
+``QuerySet.update()`` or ``delete()`` and does the side effects the
+single-complaint views do (counters, user notifications, tombstones,
+cache versions) with a constant number of queries, all in one
+transaction. The result maps every requested complaint id to its outcome.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import caching, notifications, stats, sync
+from .models import Complaint, ComplaintFile, Notification
+
+MAX_IDS = 1000
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+
+STATUSES = {value for value, _ in Complaint.STATUS_CHOICES}
+# Columns stats.contribution reads, plus what the side effects need
+COLUMNS = ['id', 'complaint_id', 'user_id', 'status', 'urgency', 'rating', 'complaint_type']
+
+
+def parse_ids(raw):
+    """Validate a list of complaint ids from a request, dropping repeats"""
+    if not isinstance(raw, list) or not all(isinstance(cid, str) for cid in raw):
+        raise ValueError('complaint_ids must be a list of complaint IDs')
+    if len(raw) > MAX_IDS:
+        raise ValueError(f'At most {MAX_IDS} complaints per request')
+    return list(dict.fromkeys(raw))
+
+
+def update_status(complaint_ids, status):
+    """Set ``status`` on every listed complaint and notify the owners of the changed ones"""
+    if status not in STATUSES:
+        raise ValueError('Invalid status')
+    results = dict.fromkeys(complaint_ids, NOT_FOUND)
+    with transaction.atomic():
+        found = list(
+            Complaint.objects.select_for_update().filter(complaint_id__in=complaint_ids).only(*COLUMNS)
+        )
+        changed = [c for c in found if c.status != status]
+        for complaint in found:
+            results[complaint.complaint_id] = UNCHANGED
+        if not changed:
+            return results
+
+        # update() skips auto_now; sync and ETags rely on updated_at
+        Complaint.objects.filter(pk__in=[c.pk for c in changed]).update(
+            status=status, updated_at=timezone.now()
+        )
+        changes, pending = [], []
+        for complaint in changed:
+            old_status = complaint.status
+            before = stats.contribution(complaint)
+            complaint.status = status
+            changes.append((complaint.user_id, before, stats.contribution(complaint)))
+            pending.append(Notification(
+                user_id=complaint.user_id,
+                title='Status Updated',
+                message=f'Your complaint {complaint.complaint_id} status changed from {old_status} to {status}',
+                type='info',
+                complaint=complaint
+            ))
+            results[complaint.complaint_id] = UPDATED
+        stats.record_many(changes)
+        notifications.dispatch(pending)
+        caching.complaints_changed(*{c.user_id for c in changed})
+    return results
+
+
+def delete(complaint_ids):
+    """Delete every listed complaint, leaving tombstones for delta sync"""
+    results = dict.fromkeys(complaint_ids, NOT_FOUND)
+    with transaction.atomic():
+        found = list(
+            Complaint.objects.select_for_update().filter(complaint_id__in=complaint_ids).only(*COLUMNS).annotate(
+                has_files=Exists(ComplaintFile.objects.filter(complaint=OuterRef('pk')))
+            )
+        )
+        if not found:
+            return results
+
+        sync.record_deletions(found)
+        Complaint.objects.filter(pk__in=[c.pk for c in found]).delete()
+        stats.record_many([
+            (c.user_id, stats.contribution(c, has_files=c.has_files), None) for c in found
+        ])
+        caching.complaints_changed(*{c.user_id for c in found})
+        for complaint in found:
+            results[complaint.complaint_id] = DELETED
+    return results
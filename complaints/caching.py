@@ -0,0 +1,172 @@
+"""
+Versioned caching of API payloads.
+
+Every cached payload is keyed on the endpoint, the caller's scope and
+query string, and the current *version* of each data scope it was built
+from. Writes never delete entries; they bump the versions they touch,
+which makes every key built from the old version unreachable (it then
+ages out of the cache). Scopes:
+
+* ``complaints`` - any complaint, for admin views
+* ``complaints:<user id>`` - one user's complaints
+* ``notifications:<user id>`` - one user's notifications
+* ``users`` - the set of accounts (admin user counts)
+
+Versions live in the configured Django cache, so a shared backend
+(Redis, file based) invalidates across worker processes; with the
+default local-memory cache each process sees only its own writes until
+API_CACHE_TIMEOUT expires an entry. ``acached`` is the same lookup for
+async views, through the cache's async API.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+KEY_PREFIX = 'complaints:api'
+VERSION_PREFIX = 'complaints:version'
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _version_key(scope):
+    return f'{VERSION_PREFIX}:{scope}'
+
+
+def _new_version():
+    # Time based, so a version evicted and recreated never reuses old keys
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    """Current version of each scope, creating missing ones"""
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, _new_version(), None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+async def aget_versions(scopes):
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = await cache.aget_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            await cache.aadd(key, _new_version(), None)
+            found[key] = await cache.aget(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def _bump(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), _new_version(), None)
+
+
+def bump(*scopes):
+    """
+    Invalidate everything cached from ``scopes``.
+
+    Deferred until the current transaction commits, so a concurrent read
+    can't cache the old rows under the new version.
+    """
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def complaints_changed(*user_ids):
+    """Bump the complaint scopes after a complaint of ``user_ids`` was written"""
+    bump('complaints', *(f'complaints:{user_id}' for user_id in user_ids))
+
+
+def notifications_changed(*user_ids):
+    bump(*(f'notifications:{user_id}' for user_id in set(user_ids)))
+
+
+def users_changed():
+    bump('users')
+
+
+def _record(name, outcome):
+    with _counters_lock:
+        _counters[(name, outcome)] += 1
+    metrics.API_CACHE_REQUESTS.inc(endpoint=name, outcome=outcome[:-1])
+
+
+def counters():
+    """``{endpoint: {'hits': n, 'misses': n}}`` for this process"""
+    with _counters_lock:
+        items = list(_counters.items())
+    result = {}
+    for (name, outcome), count in items:
+        result.setdefault(name, {'hits': 0, 'misses': 0})[outcome] = count
+    return result
+
+
+def cached(name, scopes, build, variant='', timeout=None):
+    """
+    Return ``build()``, cached under ``name`` for this ``variant``.
+
+    ``variant`` distinguishes callers and query strings sharing the same
+    data scopes; the entry is rebuilt as soon as any scope is bumped.
+    """
+    key = _payload_key(name, get_versions(scopes), variant)
+    value = cache.get(key)
+    if value is not None:
+        _record(name, 'hits')
+        return value
+    _record(name, 'misses')
+    value = build()
+    cache.set(key, value, timeout if timeout is not None else settings.API_CACHE_TIMEOUT)
+    return value
+
+
+async def acached(name, scopes, build, variant='', timeout=None):
+    """``cached`` for async views; ``build`` is a coroutine function"""
+    key = _payload_key(name, await aget_versions(scopes), variant)
+    value = await cache.aget(key)
+    if value is not None:
+        _record(name, 'hits')
+        return value
+    _record(name, 'misses')
+    value = await build()
+    await cache.aset(key, value, timeout if timeout is not None else settings.API_CACHE_TIMEOUT)
+    return value
+
+
+def _payload_key(name, versions, variant):
+    raw = '|'.join([variant, *(f'{scope}={versions[scope]}' for scope in sorted(versions))])
+    return f'{KEY_PREFIX}:{name}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def request_variant(request, user=None):
+    """
+    Variant for a request: the caller's role (admins share), its query
+    string and the ETag the response goes out under (see ``etags``), so a
+    payload cached before another worker's write is not served with the
+    validator of the state after it. Async views pass the ``user`` they
+    awaited.
+    """
+    user = user or request.user
+    who = 'admin' if user.is_superuser else f'user:{user.pk}'
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.items()))
+    return f'{who}|{query}|{getattr(request, "api_etag", "")}'
+
+
+def complaint_scopes(user):
+    """Scopes a complaint listing for ``user`` is built from"""
+    return ['complaints'] if user.is_superuser else [f'complaints:{user.pk}']
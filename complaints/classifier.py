@@ -0,0 +1,119 @@
+"""
+Keyword based complaint category and urgency detection.
+
+All keywords (English, Hindi, Marathi and their romanised forms) are
+compiled once into a single regex shaped like a trie, so one left-to-right
+scan of the text finds every keyword. Where keywords overlap the longest
+one wins, e.g. "जलना" counts as fire rather than also as "जल" (water).
+The category with the most distinct keyword hits wins, ties going to the
+one listed first; any urgent word marks the complaint High.
+"""
+import re
+
+GENERAL = 'General'
+HIGH = 'High'
+NORMAL = 'Normal'
+
+CATEGORIES = {
+    'सफाई/Cleaning/स्वच्छता': [
+        'कचरा', 'गंदगी', 'सफाई', 'कूड़ा', 'नाली', 'शौचालय', 'टॉयलेट',
+        'clean', 'garbage', 'dustbin', 'safai', 'kachra', 'gandgi',
+        'स्वच्छता', 'कचरापेटी', 'घाण', 'स्वच्छतागृह', 'dirty', 'gandagi',
+    ],
+    'बिजली/Electricity/वीज': [
+        'बिजली', 'करंट', 'मीटर', 'लाइट', 'पावर', 'वोल्टेज', 'बल्ब', 'स्विच',
+        'light', 'electricity', 'power', 'bijli', 'fan', 'bulb',
+        'वीज', 'लाईट', 'पंखा', 'विजेचा', 'दिवा',
+    ],
+    'पानी/Water/पाणी': [
+        'पानी', 'नल', 'टंकी', 'लीक', 'जल', 'सप्लाई', 'ड्रेन', 'पाइप',
+        'water', 'paani', 'pipe', 'tap',
+        'पाणी', 'नळ', 'टाकी', 'पाण्याचा',
+    ],
+    'सड़क/Road/रस्ता': [
+        'सड़क', 'गड्ढा', 'ट्रैफिक', 'सिग्नल', 'रास्ता',
+        'road', 'pothole', 'traffic',
+        'रस्ता', 'खड्डा', 'वाहतूक',
+    ],
+    'इंटरनेट/Internet': [
+        'इंटरनेट', 'वाईफाई', 'नेटवर्क', 'कनेक्शन',
+        'wifi', 'internet', 'network', 'connection',
+        'वायफाय', 'जाळे',
+    ],
+    'आग/Fire/अग्नी': [
+        'आग', 'धुआँ', 'चिंगारी', 'लपट', 'जलना', 'धधकना',
+        'fire', 'smoke', 'burning',
+        'अग्नी', 'धूर', 'ज्वाला', 'जळणे',
+    ],
+}
+
+URGENT_WORDS = [
+    'तुरंत', 'जल्दी', 'फौरन', 'अभी',
+    'urgent', 'immediately', 'jaldi', 'emergency', 'turant',
+    'तात्काळ', 'लगेच', 'आत्ताच', 'तातडीचे',
+]
+
+# Sentinel label for urgent words in the keyword table
+_URGENT = object()
+
+
+def _trie_pattern(words):
+    """Regex source matching any of ``words``, preferring the longest match"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches, singles = [], []
+        for char in sorted(k for k in node if k):
+            child = node[char]
+            if list(child) == ['']:
+                singles.append(re.escape(char))
+            else:
+                branches.append(re.escape(char) + build(child))
+        if singles:
+            branches.append(singles[0] if len(singles) == 1 else f"[{''.join(singles)}]")
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A word ending here: try the longer continuations first, greedily
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+
+def _compile():
+    labels = {}
+    for category, words in CATEGORIES.items():
+        for word in words:
+            labels.setdefault(word.lower(), category)
+    for word in URGENT_WORDS:
+        labels.setdefault(word.lower(), _URGENT)
+    return re.compile(_trie_pattern(labels)), labels
+
+
+_MATCHER, _LABELS = _compile()
+_ORDER = {category: n for n, category in enumerate(CATEGORIES)}
+
+
+def classify(text):
+    """Return ``{'complaint_type': ..., 'urgency': ...}`` for complaint ``text``"""
+    hits = {}
+    urgent = False
+    for word in set(_MATCHER.findall(text.lower())):
+        label = _LABELS[word]
+        if label is _URGENT:
+            urgent = True
+        else:
+            hits[label] = hits.get(label, 0) + 1
+
+    complaint_type = GENERAL
+    if hits:
+        complaint_type = min(hits, key=lambda category: (-hits[category], _ORDER[category]))
+    return {'complaint_type': complaint_type, 'urgency': HIGH if urgent else NORMAL}
+
+
+def classify_many(texts):
+    """Classify an iterable of texts, e.g. for backfills; returns a list in order"""
+    return [classify(text or '') for text in texts]
@@ -0,0 +1,245 @@
+"""
+Near-duplicate detection for bursts of similar complaints.
+
+Each process keeps an in-memory MinHash/LSH index of the complaints
+submitted during the last WINDOW. Details are reduced to character
+shingles and a NUM_BINS value one-permutation MinHash signature (one hash
+per shingle rather than one per permutation). Signatures are cut into
+BANDS bands keyed together with the complaint type and location, so a
+lookup only compares against complaints sharing a whole band and is
+confirmed by the estimated Jaccard similarity.
+
+Before each lookup the index loads the complaints submitted since its
+last sync, which keeps every worker process current with the others for
+the cost of one range query on ``submitted_at``, run outside the index
+lock. Ids and timestamps are both taken before a complaint commits, so a
+row can become visible after a later one was indexed; each sync therefore
+re-reads SYNC_OVERLAP before the previous one (already indexed rows are
+skipped). Anything slower, such as a bulk import committing in batches,
+is picked up by ``rebuild``, which ``warm()`` runs in a background thread
+at startup and every RESYNC_INTERVAL after: the new index is built
+without the lock and swapped in. Lookups find nothing until the first
+build has finished.
+"""
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import Complaint
+
+logger = logging.getLogger(__name__)
+
+WINDOW = timedelta(hours=48)
+SHINGLE_SIZE = 4
+NUM_BINS = 64
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+THRESHOLD = 0.6
+SYNC_OVERLAP = timedelta(minutes=1)
+RESYNC_INTERVAL = timedelta(minutes=10)
+
+_HASH_MASK = (1 << 61) - 1
+_EMPTY = _HASH_MASK // NUM_BINS + 1
+# ASCII punctuation and the Devanagari danda; \W would also strip vowel signs
+_PUNCTUATION = re.compile(r'[!-/:-@\[-`{-~।॥]+')
+
+
+def normalize(text):
+    return ' '.join(_PUNCTUATION.sub(' ', (text or '').lower()).split())
+
+
+def shingles(text):
+    """Overlapping character SHINGLE_SIZE-grams of the normalized text"""
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(shingle_set):
+    """One-permutation MinHash of ``shingle_set``, or None when it is empty"""
+    if not shingle_set:
+        return None
+    bins = [_EMPTY] * NUM_BINS
+    for shingle in shingle_set:
+        # str hashes are salted per process, which is fine for an in-memory index
+        value = hash(shingle) & _HASH_MASK
+        slot, rest = value % NUM_BINS, value // NUM_BINS
+        if rest < bins[slot]:
+            bins[slot] = rest
+    if _EMPTY in bins:
+        # Densify: an empty bin borrows from the next filled one, tagged by distance
+        filled = list(bins)
+        for slot in range(NUM_BINS):
+            if filled[slot] == _EMPTY:
+                step = 1
+                while filled[(slot + step) % NUM_BINS] == _EMPTY:
+                    step += 1
+                bins[slot] = filled[(slot + step) % NUM_BINS] + step * _EMPTY
+    return bins
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
+
+
+class DuplicateIndex:
+    """LSH buckets over recent complaints; safe to share between threads"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        # pk -> (signature, band keys, cluster root pk, submitted_at), oldest first
+        self._entries = {}
+        self._buckets = defaultdict(set)
+        self._synced_at = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(complaint_type, location, sig):
+        scope = (complaint_type, normalize(location))
+        return [(scope, band, tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+    def _add(self, pk, complaint_type, location, details, root, submitted_at):
+        if pk in self._entries:
+            return
+        sig = signature(shingles(details))
+        if sig is None:
+            return
+        self._put(pk, (sig, self._band_keys(complaint_type, location, sig), root, submitted_at))
+
+    def _put(self, pk, entry):
+        self._entries[pk] = entry
+        for key in entry[1]:
+            self._buckets[key].add(pk)
+
+    def _remove(self, pk):
+        _, keys, _, _ = self._entries.pop(pk)
+        for key in keys:
+            bucket = self._buckets[key]
+            bucket.discard(pk)
+            if not bucket:
+                del self._buckets[key]
+
+    def _prune(self, cutoff):
+        # Entries are mostly in submission order, so expired ones are at the front;
+        # the few that arrived late are dropped by the next rebuild
+        while self._entries:
+            pk = next(iter(self._entries))
+            if self._entries[pk][3] >= cutoff:
+                break
+            self._remove(pk)
+
+    @staticmethod
+    def _rows(since):
+        return Complaint.objects.filter(submitted_at__gte=since).order_by('submitted_at', 'id').values_list(
+            'id', 'complaint_type', 'location', 'details', 'duplicate_of_id', 'submitted_at'
+        )
+
+    def sync(self):
+        """Load complaints submitted since the last sync and drop expired ones; a no-op before the first build"""
+        synced_at = self._synced_at
+        if synced_at is None:
+            return
+        now = timezone.now()
+        cutoff = now - self.window
+        rows = list(self._rows(max(cutoff, synced_at - SYNC_OVERLAP)))
+        with self._lock:
+            for pk, complaint_type, location, details, duplicate_of_id, submitted_at in rows:
+                self._add(pk, complaint_type, location, details, duplicate_of_id or pk, submitted_at)
+            self._synced_at = max(self._synced_at, now)
+            self._prune(cutoff)
+
+    def rebuild(self):
+        """Re-read the whole window into a new index and swap it in"""
+        started = timezone.now()
+        fresh = DuplicateIndex(self.window)
+        rows = self._rows(started - self.window)
+        for pk, complaint_type, location, details, duplicate_of_id, submitted_at in rows.iterator():
+            fresh._add(pk, complaint_type, location, details, duplicate_of_id or pk, submitted_at)
+        with self._lock:
+            # Keep what syncs and add() indexed while the window was being read
+            since = started - SYNC_OVERLAP
+            for pk, entry in self._entries.items():
+                if entry[3] >= since and pk not in fresh._entries:
+                    fresh._put(pk, entry)
+            self._entries, self._buckets = fresh._entries, fresh._buckets
+            # The next sync re-reads from here, in case rows committed during the build
+            self._synced_at = started
+
+    def add(self, complaint):
+        """Index a complaint just created in this process"""
+        with self._lock:
+            self._add(
+                complaint.pk, complaint.complaint_type, complaint.location, complaint.details,
+                complaint.duplicate_of_id or complaint.pk, complaint.submitted_at
+            )
+
+    def find(self, complaint_type, location, details):
+        """Return ``(cluster root pk, similarity)`` of the closest match, or None"""
+        sig = signature(shingles(details))
+        if sig is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(complaint_type, location, sig):
+                candidates.update(self._buckets.get(key, ()))
+            best = None
+            for pk in candidates:
+                entry_sig, _, root, _ = self._entries[pk]
+                score = similarity(sig, entry_sig)
+                if score >= THRESHOLD and (best is None or score > best[1]):
+                    best = (root, score)
+        return best
+
+
+index = DuplicateIndex()
+
+
+def find_duplicate(complaint_type, location, details):
+    """Return the pk of the complaint a new one duplicates, or None"""
+    index.sync()
+    match = index.find(complaint_type, location, details)
+    # The index may still hold a complaint deleted since it was loaded
+    if match and Complaint.objects.filter(pk=match[0]).exists():
+        return match[0]
+    return None
+
+
+def remember(complaint):
+    index.add(complaint)
+
+
+def _run_forever():
+    while True:
+        try:
+            index.rebuild()
+        except Exception:
+            logger.exception('Could not build the duplicate index')
+        finally:
+            close_old_connections()
+        time.sleep(RESYNC_INTERVAL.total_seconds())
+
+
+_warmer = None
+
+
+def warm():
+    """
+    Build the index in a background thread at startup, so the first submit
+    doesn't pay for it, and rebuild it there every RESYNC_INTERVAL.
+    """
+    global _warmer
+    if _warmer is None:
+        _warmer = threading.Thread(target=_run_forever, name='duplicate-index', daemon=True)
+        _warmer.start()
+    return _warmer
@@ -0,0 +1,139 @@
+"""
+ETag validators for the polled JSON endpoints.
+
+A validator is computed before the view does any work, from lookups that
+stay cheap however many complaints there are: the materialized
+``ComplaintStats.total`` of the caller's scope (catches deletes) and the
+newest ``updated_at`` in that scope read off an index (catches inserts
+and edits). Sync views use them through Django's ``condition``
+decorator and the async variants (``a``-prefixed) through
+``acondition``, so a matching ``If-None-Match`` gets an empty 304 with no
+serialization.
+
+The validator is also left on the request as ``api_etag`` and is part of
+the view's cache variant (``caching.request_variant``). A cached body is
+therefore only ever served under the ETag it was built for, even when
+the write that moved the state was made by another worker whose version
+bump this process's cache never saw.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Max, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .models import Complaint, ComplaintStats, Notification
+
+
+def acondition(etag_func):
+    """
+    ``condition(etag_func=...)`` for async views.
+
+    Django's decorator calls ``etag_func`` synchronously, which can't touch
+    the ORM from an event loop; this one awaits it.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = await etag_func(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def _etag(request, user, *parts):
+    # The payload also depends on who asks and on fields/limit/cursor
+    who = 'admin' if user.is_superuser else f'user:{user.pk}'
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.items()))
+    raw = '|'.join([who, query, *map(str, parts)])
+    request.api_etag = hashlib.md5(raw.encode()).hexdigest()
+    return request.api_etag
+
+
+def complaint_state(user=None):
+    """``(total, newest updated_at)`` of one user's complaints, or of all when None"""
+    complaints = Complaint.objects.all() if user is None else Complaint.objects.filter(user=user)
+    latest = complaints.order_by('-updated_at').values('updated_at')[:1]
+    row = ComplaintStats.objects.filter(user=user).annotate(
+        latest=Subquery(latest)
+    ).values_list('total', 'latest').first()
+    if row is None:
+        return 0, complaints.aggregate(latest=Max('updated_at'))['latest']
+    return row
+
+
+async def acomplaint_state(user=None):
+    complaints = Complaint.objects.all() if user is None else Complaint.objects.filter(user=user)
+    latest = complaints.order_by('-updated_at').values('updated_at')[:1]
+    row = await ComplaintStats.objects.filter(user=user).annotate(
+        latest=Subquery(latest)
+    ).values_list('total', 'latest').afirst()
+    if row is None:
+        return 0, (await complaints.aaggregate(latest=Max('updated_at')))['latest']
+    return row
+
+
+def _user_state():
+    users = User.objects.aggregate(count=Count('id'), latest=Max('id'))
+    return users['count'], users['latest']
+
+
+async def _auser_state():
+    users = await User.objects.aaggregate(count=Count('id'), latest=Max('id'))
+    return users['count'], users['latest']
+
+
+def complaints_etag(request):
+    user = request.user
+    return _etag(request, user, *complaint_state(None if user.is_superuser else user))
+
+
+async def acomplaints_etag(request):
+    user = await request.auser()
+    return _etag(request, user, *await acomplaint_state(None if user.is_superuser else user))
+
+
+def dashboard_stats_etag(request):
+    user = request.user
+    if user.is_superuser:
+        return _etag(request, user, *complaint_state(), *_user_state())
+    return _etag(request, user, *complaint_state(user))
+
+
+async def adashboard_stats_etag(request):
+    user = await request.auser()
+    if user.is_superuser:
+        return _etag(request, user, *await acomplaint_state(), *await _auser_state())
+    return _etag(request, user, *await acomplaint_state(user))
+
+
+def admin_data_etag(request):
+    if not request.user.is_superuser:
+        return None
+    # days_pending and the overdue count move with the clock, not with writes
+    hour = timezone.now().strftime('%Y%m%d%H')
+    return _etag(request, request.user, *complaint_state(), *_user_state(), hour)
+
+
+def notifications_etag(request):
+    unread = Notification.objects.filter(user=request.user, read=False).aggregate(
+        count=Count('id'), latest=Max('id')
+    )
+    return _etag(request, request.user, unread['count'], unread['latest'])
+
+
+async def anotifications_etag(request):
+    user = await request.auser()
+    unread = await Notification.objects.filter(user=user, read=False).aaggregate(
+        count=Count('id'), latest=Max('id')
+    )
+    return _etag(request, user, unread['count'], unread['latest'])
@@ -0,0 +1,333 @@
+"""
+Streaming export of complaints as CSV, NDJSON or XLSX.
+
+Rows come from one ``values_list`` query (user and duplicate joined, file
+counts from a correlated subquery) read with ``iterator`` in CHUNK_SIZE
+batches and encoded batch by batch, so memory stays flat however
+many complaints are exported. Encoders are push style (``begin``, ``rows``,
+``end``) so the same code serves the sync generator used by WSGI and the
+management command and the async one used under ASGI; Django would
+otherwise buffer a sync iterator under ASGI (and an async one under WSGI)
+into a list.
+
+XLSX is written without dependencies: the workbook is a zip streamed with
+data descriptors, the sheet uses inline strings. Excel stops at
+XLSX_MAX_ROWS rows, so larger exports are cut there; use CSV or NDJSON.
+"""
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import date, datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Complaint, ComplaintFile
+
+CHUNK_SIZE = 2000
+XLSX_MAX_ROWS = 1048575
+XLSX_MAX_CELL = 32767
+# Leading characters that make a spreadsheet read a CSV cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Output column -> queryset path
+COLUMNS = [
+    ('id', 'complaint_id'),
+    ('user', 'user__username'),
+    ('email', 'user__email'),
+    ('name', 'name'),
+    ('roll', 'roll'),
+    ('category', 'complaint_type'),
+    ('urgency', 'urgency'),
+    ('status', 'status'),
+    ('location', 'location'),
+    ('details', 'details'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('rating', 'rating'),
+    ('feedback', 'feedback'),
+    ('reopen_count', 'reopen_count'),
+    ('duplicate_of', 'duplicate_of__complaint_id'),
+    ('files_count', 'files_count'),
+    ('submitted_at', 'submitted_at'),
+    ('updated_at', 'updated_at'),
+]
+HEADERS = [name for name, _ in COLUMNS]
+
+STATUSES = {value for value, _ in Complaint.STATUS_CHOICES}
+
+
+def _parse_date(raw, name):
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f'Invalid {name} date, expected YYYY-MM-DD')
+
+
+def parse_filters(params):
+    """
+    Validate ``status`` (comma separated), ``from`` and ``to`` (inclusive
+    YYYY-MM-DD submission dates) into keyword arguments for ``queryset``.
+    """
+    filters = {}
+    if params.get('status'):
+        statuses = [s.strip() for s in params['status'].split(',') if s.strip()]
+        unknown = [s for s in statuses if s not in STATUSES]
+        if unknown:
+            raise ValueError(f"Unknown status(es): {', '.join(unknown)}")
+        filters['statuses'] = statuses
+    if params.get('from'):
+        filters['start'] = _parse_date(params['from'], 'from')
+    if params.get('to'):
+        filters['end'] = _parse_date(params['to'], 'to')
+    return filters
+
+
+def queryset(statuses=None, start=None, end=None):
+    """The export rows as ``values_list`` tuples in COLUMNS order, oldest first"""
+    files_count = ComplaintFile.objects.filter(complaint=OuterRef('pk')).order_by().values(
+        'complaint'
+    ).annotate(n=Count('id')).values('n')
+    complaints = Complaint.objects.annotate(
+        files_count=Coalesce(Subquery(files_count, output_field=IntegerField()), Value(0))
+    )
+    if statuses:
+        complaints = complaints.filter(status__in=statuses)
+    # Whole local days, as ranges on the indexed column
+    if start:
+        complaints = complaints.filter(
+            submitted_at__gte=timezone.make_aware(datetime.combine(start, time.min))
+        )
+    if end:
+        complaints = complaints.filter(
+            submitted_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        )
+    return complaints.order_by('submitted_at', 'id').values_list(*(path for _, path in COLUMNS))
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class CSVEncoder:
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self):
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    @staticmethod
+    def _cell(value):
+        text = _text(value)
+        # Spreadsheets would evaluate user text starting like a formula
+        if isinstance(value, str) and text.startswith(FORMULA_PREFIXES):
+            text = "'" + text
+        return text
+
+    def begin(self):
+        self._writer.writerow(HEADERS)
+        # BOM so Excel reads the Hindi/Marathi text as UTF-8
+        return '\ufeff'.encode() + self._drain()
+
+    def rows(self, rows):
+        self._writer.writerows([self._cell(v) for v in row] for row in rows)
+        return self._drain()
+
+    def end(self):
+        return b''
+
+
+class NDJSONEncoder:
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def begin(self):
+        return b''
+
+    def rows(self, rows):
+        return ''.join(
+            json.dumps(dict(zip(HEADERS, row)), default=_text, ensure_ascii=False) + '\n' for row in rows
+        ).encode()
+
+    def end(self):
+        return b''
+
+
+class _Sink:
+    """Write-only file for zipfile; ``drain`` hands over what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Complaints" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class XLSXEncoder:
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    extension = 'xlsx'
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._written = 0
+
+    @staticmethod
+    def _cell(value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c><v>{value}</v></c>'
+        if value is None:
+            return '<c/>'
+        # Inline strings are never evaluated, so no formula guard is needed here
+        text = _XML_ILLEGAL.sub('', _text(value))[:XLSX_MAX_CELL]
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+    def _row(self, values):
+        return '<row>' + ''.join(self._cell(v) for v in values) + '</row>'
+
+    def begin(self):
+        for name, content in _XLSX_PARTS.items():
+            self._zip.writestr(name, content)
+        self._sheet = self._zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            + self._row(HEADERS)
+        ).encode())
+        return self._sink.drain()
+
+    def rows(self, rows):
+        rows = rows[:max(XLSX_MAX_ROWS - self._written, 0)]
+        self._written += len(rows)
+        self._sheet.write(''.join(self._row(row) for row in rows).encode())
+        return self._sink.drain()
+
+    def end(self):
+        self._sheet.write(b'</sheetData></worksheet>')
+        self._sheet.close()
+        self._zip.close()
+        return self._sink.drain()
+
+
+ENCODERS = {
+    'csv': CSVEncoder,
+    'ndjson': NDJSONEncoder,
+    'xlsx': XLSXEncoder,
+}
+
+
+def get_encoder(format):
+    try:
+        return ENCODERS[format]()
+    except KeyError:
+        raise ValueError(f"Unknown format, expected one of: {', '.join(ENCODERS)}")
+
+
+def _batches(rows, chunk_size):
+    batch = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) == chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream(encoder, rows, chunk_size=CHUNK_SIZE):
+    """Encoded chunks of ``rows`` (a values_list queryset), read in batches"""
+    yield encoder.begin()
+    for batch in _batches(rows, chunk_size):
+        yield encoder.rows(batch)
+    yield encoder.end()
+
+
+async def astream(encoder, rows, chunk_size=CHUNK_SIZE):
+    """
+    ``stream`` for the ASGI server.
+
+    Batches are pulled from the sync iterator on one thread, so a
+    server-side cursor stays on its connection (``aiterator`` runs a
+    values_list query on the event loop and fails).
+    """
+    yield encoder.begin()
+    batches = _batches(rows, chunk_size)
+    next_batch = sync_to_async(lambda: next(batches, None), thread_sensitive=True)
+    while (batch := await next_batch()) is not None:
+        yield encoder.rows(batch)
+    yield encoder.end()
+
+
+def filename(encoder):
+    return f'complaints-export-{timezone.localdate().isoformat()}.{encoder.extension}'
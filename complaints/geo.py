@@ -0,0 +1,157 @@
+"""
+Geohash cells for complaint GPS coordinates.
+
+``Complaint.geohash`` holds a PRECISION character geohash, so every
+shorter prefix is the enclosing cell at a coarser zoom level. Cells are
+contiguous ranges of the indexed column: box and radius queries first
+narrow to the few cells covering the area with range lookups, then apply
+the exact coordinate test in SQL. Hotspots group on a prefix of the column.
+"""
+import math
+
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt, Substr
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {char: n for n, char in enumerate(BASE32)}
+
+# 9 characters is a cell of roughly 5 x 5 metres
+PRECISION = 9
+DEFAULT_HOTSPOT_PRECISION = 6
+MAX_COVERING_CELLS = 32
+MAX_RADIUS = 50000
+EARTH_RADIUS = 6371008.8
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash of a point, or None if it isn't a valid coordinate; bits alternate longitude, latitude"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    """``(south, west, north, east)`` of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            interval[0 if value >> shift & 1 else 1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def cell_size(precision):
+    """``(lat_degrees, lon_degrees)`` spanned by a cell at ``precision``"""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVERING_CELLS):
+    """The finest set of at most ``max_cells`` geohash prefixes covering a box"""
+    for precision in range(PRECISION, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = math.floor((north + 90) / lat_step) - math.floor((south + 90) / lat_step) + 1
+        cols = math.floor((east + 180) / lon_step) - math.floor((west + 180) / lon_step) + 1
+        if rows * cols <= max_cells:
+            break
+    cells = set()
+    for row in range(rows):
+        lat = min(south + row * lat_step, north)
+        for col in range(cols):
+            cells.add(encode(lat, min(west + col * lon_step, east), precision))
+    return sorted(cells)
+
+
+def prefix_q(cells):
+    """Q matching geohashes inside any of ``cells``, as index range scans"""
+    q = Q()
+    for cell in cells:
+        # Every stored geohash has PRECISION characters, so the cell is one range
+        q |= Q(geohash__gte=cell, geohash__lte=cell + 'z' * (PRECISION - len(cell)))
+    return q
+
+
+def parse_bbox(raw):
+    """Parse ``south,west,north,east``; boxes across the antimeridian are rejected"""
+    try:
+        south, west, north, east = (float(v) for v in raw.split(','))
+    except ValueError:
+        raise ValueError('bbox must be south,west,north,east')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError('Invalid bbox')
+    return south, west, north, east
+
+
+def radius_bbox(latitude, longitude, radius):
+    """Bounding box of a circle of ``radius`` metres"""
+    dlat = math.degrees(radius / EARTH_RADIUS)
+    dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+    return (
+        max(latitude - dlat, -90.0), max(longitude - dlon, -180.0),
+        min(latitude + dlat, 90.0), min(longitude + dlon, 180.0),
+    )
+
+
+def within_bbox(queryset, south, west, north, east):
+    return queryset.filter(
+        prefix_q(covering_cells(south, west, north, east)),
+        latitude__gte=south, latitude__lte=north,
+        longitude__gte=west, longitude__lte=east,
+    )
+
+
+def haversine(latitude, longitude):
+    """Expression for the distance in metres from a point to each row"""
+    dlat = Radians(F('latitude') - latitude) / 2
+    dlon = Radians(F('longitude') - longitude) / 2
+    a = Power(Sin(dlat), 2) + math.cos(math.radians(latitude)) * Cos(Radians('latitude')) * Power(Sin(dlon), 2)
+    return 2 * EARTH_RADIUS * ASin(Sqrt(a), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius):
+    """Rows within ``radius`` metres, annotated with ``distance`` and nearest first"""
+    return within_bbox(queryset, *radius_bbox(latitude, longitude, radius)).annotate(
+        distance=haversine(latitude, longitude)
+    ).filter(distance__lte=radius).order_by('distance')
+
+
+def hotspots(queryset, precision=DEFAULT_HOTSPOT_PRECISION, limit=100):
+    """Complaint counts per geohash cell at ``precision``, busiest first"""
+    rows = queryset.filter(geohash__isnull=False).annotate(
+        cell=Substr('geohash', 1, precision)
+    ).values('cell').annotate(count=Count('id')).order_by('-count', 'cell')[:limit]
+    spots = []
+    for row in rows:
+        south, west, north, east = bounds(row['cell'])
+        spots.append({
+            'cell': row['cell'],
+            'count': row['count'],
+            'latitude': (south + north) / 2,
+            'longitude': (west + east) / 2,
+            'bbox': [south, west, north, east],
+        })
+    return spots
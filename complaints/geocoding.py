@@ -0,0 +1,223 @@
+"""
+Reverse geocoding with a local cache.
+
+Coordinates are rounded to ROUND_DIGITS decimals (about 11 m) and looked
+up in order:
+
+1. an in-process LRU of recent answers,
+2. the ``GeocodeCache`` table shared by all workers,
+3. the offline gazetteer (``GEOCODE_GAZETTEER``), a CSV of
+   ``name,latitude,longitude[,radius_m]`` rows such as campus buildings,
+4. Nominatim, only if ``GEOCODE_NOMINATIM_URL`` is set (it is empty by
+   default, so lookups stay offline), whose answers are stored in the
+   table.
+
+When nothing matches, the coordinates themselves are returned, as the
+browser used to do, and that miss is remembered for MISS_TTL seconds. A
+network failure also stops this process from calling Nominatim for
+FAILURE_BACKOFF seconds, so an outage or rate limit costs one timeout
+per worker rather than one per request.
+"""
+import csv
+import json
+import logging
+import math
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+ROUND_DIGITS = 4
+GAZETTEER_RADIUS = 150
+# Gazetteer grid cell in degrees; radii above ~1 km may miss across cells
+GAZETTEER_CELL = 0.01
+USER_AGENT = 'complaint-system/1.0 (reverse geocoding cache)'
+# Seconds an unanswered point is served its coordinates without retrying
+MISS_TTL = 300
+# Seconds Nominatim is skipped after a timeout or connection error
+FAILURE_BACKOFF = 60
+
+
+class LRUCache:
+    """A small thread-safe least-recently-used mapping"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_lru = LRUCache(getattr(settings, 'GEOCODE_CACHE_SIZE', 4096))
+# key -> monotonic time until which the point is known to have no answer
+_misses = LRUCache(getattr(settings, 'GEOCODE_CACHE_SIZE', 4096))
+_nominatim_retry_at = 0.0
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def cache_key(latitude, longitude):
+    return f'{round(latitude, ROUND_DIGITS):.{ROUND_DIGITS}f},{round(longitude, ROUND_DIGITS):.{ROUND_DIGITS}f}'
+
+
+def format_address(data):
+    """Short "road, suburb, city, state" from a Nominatim response"""
+    address = data.get('address') or {}
+    parts = [
+        address.get('road'),
+        address.get('suburb'),
+        address.get('city') or address.get('town') or address.get('village'),
+        address.get('state'),
+    ]
+    return ', '.join(part for part in parts if part) or data.get('display_name', '')
+
+
+def _distance(lat1, lon1, lat2, lon2):
+    """Equirectangular approximation, plenty for gazetteer radii"""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371008.8 * math.hypot(x, y)
+
+
+def _cell(latitude, longitude):
+    return int(latitude // GAZETTEER_CELL), int(longitude // GAZETTEER_CELL)
+
+
+def load_gazetteer(path):
+    """Read a gazetteer CSV into a grid of ``(name, lat, lon, radius)`` entries"""
+    grid = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            try:
+                name, latitude, longitude = row[0].strip(), float(row[1]), float(row[2])
+                radius = float(row[3]) if len(row) > 3 and row[3].strip() else GAZETTEER_RADIUS
+            except (IndexError, ValueError):
+                # Header or malformed line
+                continue
+            grid.setdefault(_cell(latitude, longitude), []).append((name, latitude, longitude, radius))
+    return grid
+
+
+def _get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = getattr(settings, 'GEOCODE_GAZETTEER', '')
+                try:
+                    _gazetteer = load_gazetteer(path) if path else {}
+                except OSError as e:
+                    logger.warning('Could not load gazetteer %s: %s', path, e)
+                    _gazetteer = {}
+    return _gazetteer
+
+
+def gazetteer_lookup(latitude, longitude):
+    """Name of the closest gazetteer place whose radius covers the point"""
+    grid = _get_gazetteer()
+    if not grid:
+        return None
+    row, col = _cell(latitude, longitude)
+    best = None
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            for name, lat, lon, radius in grid.get((row + dr, col + dc), ()):
+                distance = _distance(latitude, longitude, lat, lon)
+                if distance <= radius and (best is None or distance < best[0]):
+                    best = (distance, name)
+    return best[1] if best else None
+
+
+def nominatim_lookup(latitude, longitude):
+    """Address from Nominatim, or None when it is disabled, unreachable or backing off"""
+    global _nominatim_retry_at
+    url = getattr(settings, 'GEOCODE_NOMINATIM_URL', '')
+    if not url or time.monotonic() < _nominatim_retry_at:
+        return None
+    query = urllib.parse.urlencode({
+        'format': 'json', 'lat': latitude, 'lon': longitude, 'zoom': 18, 'addressdetails': 1,
+    })
+    request = urllib.request.Request(f'{url}?{query}', headers={'User-Agent': USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=getattr(settings, 'GEOCODE_TIMEOUT', 3)) as response:
+            data = json.load(response)
+    except (OSError, ValueError) as e:
+        _nominatim_retry_at = time.monotonic() + FAILURE_BACKOFF
+        logger.warning('Reverse geocoding failed for %s,%s, not retrying for %ds: %s',
+                       latitude, longitude, FAILURE_BACKOFF, e)
+        return None
+    return format_address(data) if isinstance(data, dict) and 'error' not in data else None
+
+
+def reverse(latitude, longitude):
+    """Return ``(address, source)`` for a point; source says where it came from"""
+    key = cache_key(latitude, longitude)
+    hit = _lru.get(key)
+    if hit is not None:
+        return hit[0], 'memory'
+
+    coordinates = f'{latitude:.6f}, {longitude:.6f}'
+    missed_until = _misses.get(key)
+    if missed_until is not None and missed_until > time.monotonic():
+        return coordinates, 'coordinates'
+
+    row = GeocodeCache.objects.filter(key=key).values_list('address', 'source').first()
+    if row is not None:
+        _lru.set(key, row)
+        return row[0], 'database'
+
+    # Local and cheap, so before the network; kept in memory only, as the file may change
+    address = gazetteer_lookup(latitude, longitude)
+    if address:
+        _lru.set(key, (address, GeocodeCache.GAZETTEER))
+        return address, GeocodeCache.GAZETTEER
+
+    # Look the rounded point up so neighbours within the cell share one answer
+    lat, lon = (float(v) for v in key.split(','))
+    address = nominatim_lookup(lat, lon)
+    if address:
+        try:
+            with transaction.atomic():
+                GeocodeCache.objects.create(key=key, address=address, source=GeocodeCache.NOMINATIM)
+        except IntegrityError:
+            # Another request stored this cell at the same time
+            pass
+        _lru.set(key, (address, GeocodeCache.NOMINATIM))
+        return address, GeocodeCache.NOMINATIM
+
+    _misses.set(key, time.monotonic() + MISS_TTL)
+    return coordinates, 'coordinates'
+
+
+def reset():
+    """Forget in-process answers, misses, the loaded gazetteer and Nominatim backoff"""
+    global _gazetteer, _nominatim_retry_at
+    _lru.clear()
+    _misses.clear()
+    _gazetteer = None
+    _nominatim_retry_at = 0.0
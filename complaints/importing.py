@@ -0,0 +1,378 @@
+"""
+Bulk import of complaints from CSV or NDJSON.
+
+The input uses the export columns (``export.HEADERS``), so an export can be
+loaded back into another database; ``files_count`` is ignored and an
+optional ``files`` column lists attachment paths (a JSON array in NDJSON,
+``|`` separated in CSV) relative to a files directory. Rows are validated
+one by one and written with ``bulk_create`` in BATCH_SIZE batches, one
+transaction per batch:
+
+* unknown usernames are created in bulk, with unusable passwords;
+* complaint ids already in the database (or earlier in the file) are
+  skipped, so an interrupted import can simply be re-run;
+* a blank category (and urgency) is filled in by the classifier;
+* geohash is derived from the GPS fix, as ``Complaint.save()`` would;
+* attachments go through the blob store and are recorded with one
+  ``bulk_create`` per batch.
+
+``duplicate_of`` ids are resolved once everything is in, so they may point
+forwards in the file. ``bulk_create`` skips signals and counters; callers
+rebuild the stats and bump the cache versions afterwards.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import blobstore, classifier, geo
+from .export import HEADERS
+from .models import Complaint, ComplaintFile
+from .seeding import BATCH_SIZE, LOOKUP_CHUNK, complaint_pks, manual_timestamps
+
+FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+FILES_SEPARATOR = '|'
+# Columns read on import; the rest of a row is ignored
+COLUMNS = [name for name in HEADERS if name != 'files_count'] + ['files']
+MAX_ERRORS = 1000
+
+STATUSES = {value for value, _ in Complaint.STATUS_CHOICES}
+URGENCIES = {value for value, _ in Complaint.URGENCY_CHOICES}
+# Text the CSV export guarded against spreadsheet formula evaluation
+_GUARDED = ("'=", "'+", "'-", "'@")
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    skipped: int = 0
+    users_created: int = 0
+    files: int = 0
+    duplicates_linked: int = 0
+    # Owners of the imported complaints, for cache invalidation
+    user_ids: set = field(default_factory=set)
+    # (line number, message) for rejected rows, capped at MAX_ERRORS
+    errors: list = field(default_factory=list)
+    rejected: int = 0
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def detect_format(path):
+    """The input format implied by the extension of ``path``"""
+    try:
+        return FORMATS[os.path.splitext(path)[1].lower()]
+    except KeyError:
+        raise ValueError(f"Cannot tell the format of {path}; pass one of: {', '.join(sorted(set(FORMATS.values())))}")
+
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for record in reader:
+        row = {}
+        for name, value in record.items():
+            if name is None:
+                continue
+            if value.startswith(_GUARDED):
+                value = value[1:]
+            row[name] = value
+        if row.get('files'):
+            row['files'] = [path for path in row['files'].split(FILES_SEPARATOR) if path]
+        yield reader.line_num, row
+
+
+def _ndjson_rows(stream):
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f'Invalid JSON: {e}')
+            continue
+        yield number, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+
+
+def read_rows(stream, format):
+    """``(line number, row dict)`` pairs from a binary stream; bad lines give an exception instead of a dict"""
+    if format == 'csv':
+        return _csv_rows(stream)
+    if format == 'ndjson':
+        return _ndjson_rows(stream)
+    raise ValueError(f'Unknown format {format!r}')
+
+
+def _text(row, name, default=None):
+    value = row.get(name)
+    if value is None or value == '':
+        return default
+    return str(value).strip()
+
+
+def _number(row, name, kind):
+    value = row.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+
+
+def _timestamp(row, name, default=None):
+    value = _text(row, name)
+    if value is None:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'{name} must be an ISO 8601 timestamp')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_row(row, now):
+    """
+    Validate one input row into ``(complaint fields, username, email, files, duplicate_of)``.
+
+    Raises ValueError with a message fit for the import report.
+    """
+    username = _text(row, 'user')
+    if not username:
+        raise ValueError('user is required')
+    details = _text(row, 'details', '')
+    if not details:
+        raise ValueError('details is required')
+
+    status = _text(row, 'status', 'pending')
+    if status not in STATUSES:
+        raise ValueError(f'Unknown status {status!r}')
+    complaint_type = _text(row, 'category')
+    urgency = _text(row, 'urgency')
+    if urgency is not None and urgency not in URGENCIES:
+        raise ValueError(f'Unknown urgency {urgency!r}')
+    if complaint_type is None or urgency is None:
+        detected = classifier.classify(details)
+        complaint_type = complaint_type or detected['complaint_type']
+        urgency = urgency or detected['urgency']
+
+    complaint_id = _text(row, 'id') or f"CMP{str(uuid.uuid4().int)[:8]}"
+    if len(complaint_id) > Complaint._meta.get_field('complaint_id').max_length:
+        raise ValueError('id is too long')
+
+    latitude = _number(row, 'latitude', float)
+    longitude = _number(row, 'longitude', float)
+    if (latitude is None) != (longitude is None):
+        raise ValueError('latitude and longitude go together')
+    if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('latitude/longitude out of range')
+
+    rating = _number(row, 'rating', int)
+    if rating is not None and not 1 <= rating <= 5:
+        raise ValueError('rating must be between 1 and 5')
+    feedback = _text(row, 'feedback')
+    reopen_count = _number(row, 'reopen_count', int) or 0
+    submitted_at = _timestamp(row, 'submitted_at', now)
+    updated_at = _timestamp(row, 'updated_at', submitted_at)
+
+    files = row.get('files') or []
+    if not isinstance(files, list) or not all(isinstance(path, str) for path in files):
+        raise ValueError('files must be a list of paths')
+
+    fields = {
+        'complaint_id': complaint_id,
+        'complaint_type': complaint_type,
+        'urgency': urgency,
+        'status': status,
+        'location': _text(row, 'location', 'Not specified'),
+        'details': details,
+        'name': _text(row, 'name', username),
+        'roll': _text(row, 'roll'),
+        'latitude': latitude,
+        'longitude': longitude,
+        'geohash': geo.encode(latitude, longitude) if latitude is not None else None,
+        'rating': rating,
+        'feedback': feedback,
+        # Not exported; the last update is the closest known time
+        'feedback_submitted_at': updated_at if rating is not None or feedback else None,
+        'reopened': reopen_count > 0,
+        'reopen_count': reopen_count,
+        'submitted_at': submitted_at,
+        'updated_at': updated_at,
+    }
+    return fields, username, _text(row, 'email', ''), files, _text(row, 'duplicate_of')
+
+
+def _user_ids(usernames_emails, result):
+    """``{username: id}``, creating the users that do not exist yet"""
+    usernames = list(usernames_emails)
+    ids = {}
+    for start in range(0, len(usernames), LOOKUP_CHUNK):
+        ids.update(User.objects.filter(username__in=usernames[start:start + LOOKUP_CHUNK]).values_list('username', 'id'))
+    missing = [username for username in usernames if username not in ids]
+    if missing:
+        new_users = [User(username=username, email=usernames_emails[username]) for username in missing]
+        for user in new_users:
+            user.set_unusable_password()
+        User.objects.bulk_create(new_users)
+        result.users_created += len(new_users)
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            ids.update(User.objects.filter(username__in=missing[start:start + LOOKUP_CHUNK]).values_list('username', 'id'))
+    return ids
+
+
+def _existing_ids(complaint_ids):
+    existing = set()
+    for start in range(0, len(complaint_ids), LOOKUP_CHUNK):
+        existing.update(Complaint.objects.filter(
+            complaint_id__in=complaint_ids[start:start + LOOKUP_CHUNK]
+        ).values_list('complaint_id', flat=True))
+    return existing
+
+
+def _attach_files(complaints, files_by_id, files_dir, result):
+    attachments = []
+    for complaint in complaints:
+        for path in files_by_id.get(complaint.complaint_id, ()):
+            full_path = os.path.join(files_dir, path)
+            with open(full_path, 'rb') as f:
+                content = f.read()
+            name = os.path.basename(path)
+            blob = blobstore.store_bytes(content, hashlib.sha256(content).hexdigest(), name)
+            attachments.append(ComplaintFile(
+                complaint=complaint,
+                blob=blob,
+                file=blob.file.name,
+                name=name,
+                size=blob.size,
+                sha256=blob.sha256,
+            ))
+    ComplaintFile.objects.bulk_create(attachments)
+    result.files += len(attachments)
+
+
+def _write_batch(batch, files_dir, result):
+    """Insert one batch of parsed rows; returns the ``(complaint_id, duplicate_of)`` links to resolve"""
+    existing = _existing_ids([parsed[0]['complaint_id'] for _, parsed in batch])
+    batch = [(line, parsed) for line, parsed in batch if parsed[0]['complaint_id'] not in existing]
+    result.skipped += len(existing)
+    if not batch:
+        return []
+
+    emails = {}
+    for _, (_, username, email, _, _) in batch:
+        if email or username not in emails:
+            emails[username] = email
+    user_ids = _user_ids(emails, result)
+    complaints, files_by_id, links = [], {}, []
+    for _, (fields, username, _, files, duplicate_of) in batch:
+        complaints.append(Complaint(user_id=user_ids[username], **fields))
+        if files:
+            files_by_id[fields['complaint_id']] = files
+        if duplicate_of:
+            links.append((fields['complaint_id'], duplicate_of))
+
+    with manual_timestamps(Complaint):
+        Complaint.objects.bulk_create(complaints)
+    if files_by_id:
+        # bulk_create only sets primary keys on some backends
+        pks = complaint_pks(list(files_by_id))
+        for complaint in complaints:
+            complaint.pk = pks.get(complaint.complaint_id, complaint.pk)
+        _attach_files(complaints, files_by_id, files_dir, result)
+    result.created += len(complaints)
+    result.user_ids.update(user_ids.values())
+    return links
+
+
+def _missing_files(files, files_dir):
+    root = os.path.realpath(files_dir)
+    missing = []
+    for path in files:
+        full_path = os.path.realpath(os.path.join(root, path))
+        # Paths must stay inside the files directory
+        if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+            missing.append(path)
+    return missing
+
+
+def _link_duplicates(links, result):
+    pks = complaint_pks(list({cid for link in links for cid in link}))
+    updates = [
+        Complaint(pk=pks[complaint_id], duplicate_of_id=pks[duplicate_of])
+        for complaint_id, duplicate_of in links
+        if complaint_id in pks and duplicate_of in pks and complaint_id != duplicate_of
+    ]
+    Complaint.objects.bulk_update(updates, ['duplicate_of'], batch_size=BATCH_SIZE)
+    result.duplicates_linked = len(updates)
+
+
+def import_rows(rows, files_dir=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Import ``(line number, row)`` pairs from ``read_rows``.
+
+    Attachment paths are resolved against ``files_dir``; rows with files
+    are rejected without one. ``progress(result)`` is called after every
+    batch.
+    """
+    result = ImportResult()
+    now = timezone.now()
+    seen = set()
+    links = []
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            links.extend(_write_batch(batch, files_dir, result))
+        batch.clear()
+        if progress:
+            progress(result)
+
+    for line, row in rows:
+        if isinstance(row, Exception):
+            result.reject(line, str(row))
+            continue
+        try:
+            parsed = parse_row(row, now)
+        except ValueError as e:
+            result.reject(line, str(e))
+            continue
+        complaint_id, files = parsed[0]['complaint_id'], parsed[3]
+        if complaint_id in seen:
+            result.reject(line, f'Repeated id {complaint_id}')
+            continue
+        if files and files_dir is None:
+            result.reject(line, 'Row lists files but no files directory was given')
+            continue
+        missing = _missing_files(files, files_dir) if files else []
+        if missing:
+            result.reject(line, f"Missing file(s): {', '.join(missing)}")
+            continue
+        seen.add(complaint_id)
+        batch.append((line, parsed))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if links:
+        with transaction.atomic():
+            _link_duplicates(links, result)
+    return result
+
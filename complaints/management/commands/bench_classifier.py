@@ -0,0 +1,82 @@
+import random
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from complaints import classifier
+from complaints.models import Complaint
+
+SAMPLE_TEXTS = [
+    'Water leakage in hostel B bathroom since morning, please fix urgent',
+    'हॉस्टल के कमरे 204 में पंखा और लाइट दोनों काम नहीं कर रहे हैं',
+    'कॉलेजच्या रस्त्यावर मोठा खड्डा आहे, वाहतूक अडकते',
+    'wifi network keeps dropping in the library, internet connection very slow',
+    'Garbage not collected near the mess for three days, very dirty',
+    'लैब में धुआँ निकल रहा है, आग लगने का खतरा है, तुरंत आइए',
+    'नळाला पाणी येत नाही, टाकी रिकामी आहे',
+    'My name is Rahul, roll number 21, the projector in room 5 is broken',
+]
+
+
+def keyword_loop(text):
+    """The per-keyword scan the browser used to run, for comparison"""
+    lower = text.lower()
+    complaint_type, max_matches = classifier.GENERAL, 0
+    for category, words in classifier.CATEGORIES.items():
+        matches = 0
+        for word in words:
+            if re.search(r'\b' + re.escape(word) + r'\b', text, re.I) or word.lower() in lower:
+                matches += 1
+        if matches > max_matches:
+            complaint_type, max_matches = category, matches
+    urgent = any(word in lower for word in classifier.URGENT_WORDS)
+    return {'complaint_type': complaint_type, 'urgency': classifier.HIGH if urgent else classifier.NORMAL}
+
+
+class Command(BaseCommand):
+    help = 'Measure per-complaint classification cost in microseconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--texts', type=int, default=10000,
+                            help='Number of complaint texts to classify per run')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per method')
+        parser.add_argument('--from-db', action='store_true',
+                            help='Use the details of stored complaints instead of built-in samples')
+
+    def handle(self, *args, **options):
+        count = options['texts']
+        if options['from_db']:
+            texts = list(Complaint.objects.order_by('-id').values_list('details', flat=True)[:count])
+        else:
+            rng = random.Random(0)
+            texts = [rng.choice(SAMPLE_TEXTS) for _ in range(count)]
+        if not texts:
+            self.stdout.write('No complaint texts to classify')
+            return
+
+        methods = {
+            'keyword loop': lambda: [keyword_loop(text) for text in texts],
+            'classify': lambda: [classifier.classify(text) for text in texts],
+            'classify_many': lambda: classifier.classify_many(texts),
+        }
+        self.stdout.write(f'{len(texts)} texts, {options["runs"]} runs')
+        results = {}
+        for name, run in methods.items():
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) / len(texts) * 1e6)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f'{name:<14} {results[name]:>8.2f} us/complaint')
+
+        agree = sum(
+            keyword_loop(text)['complaint_type'] == classifier.classify(text)['complaint_type']
+            for text in texts
+        )
+        self.stdout.write(
+            f"\n{results['keyword loop'] / results['classify']:.1f}x faster, "
+            f'same category for {agree}/{len(texts)} texts'
+        )
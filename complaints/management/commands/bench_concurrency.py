@@ -0,0 +1,170 @@
+import asyncio
+import io
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = [
+    '/api/get-complaints/?limit=50',
+    '/api/get-notifications/',
+    '/api/get-dashboard-stats/',
+    '/api/get-user-session/',
+]
+
+
+def session_cookie(user):
+    """A ``Cookie`` header value for a fresh session logged in as ``user``"""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def default_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'rps': len(latencies) / elapsed if elapsed else float('inf'),
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0],
+    }
+
+
+def run_wsgi(path, cookie, host, total, concurrency):
+    """``total`` requests through the WSGI handler from ``concurrency`` threads"""
+    handler = WSGIHandler()
+    path, _, query = path.partition('?')
+    statuses = []
+    lock = threading.Lock()
+
+    def one(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host, 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        started = time.perf_counter()
+        status = []
+        body = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            b''.join(body)
+        finally:
+            body.close()
+        with lock:
+            statuses.append(status[0].split()[0])
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return summarize(latencies, time.perf_counter() - started), statuses
+
+
+async def _run_asgi(path, cookie, host, total, concurrency):
+    handler = ASGIHandler()
+    path, _, query = path.partition('?')
+    statuses = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': (host, 80),
+        }
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client stays connected until the handler cancels this wait
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(str(message['status']))
+
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(latencies, time.perf_counter() - started), statuses
+
+
+def run_asgi(path, cookie, host, total, concurrency):
+    """``total`` requests through the ASGI handler, ``concurrency`` in flight at once"""
+    return asyncio.run(_run_asgi(path, cookie, host, total, concurrency))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent request throughput of the JSON read endpoints '
+        'through the WSGI handler (a thread per in-flight request, as '
+        'threaded gunicorn workers do) and the ASGI handler (one event loop). '
+        'Requests are made in-process, so this measures the Django stack '
+        'without any server or network overhead. Both handlers serve the sync '
+        'views unless ASYNC_VIEWS=True is set, as asgi.py does.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to send requests as (default: first superuser)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and handler')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Endpoint to hit, repeatable (default: the four polled read endpoints)')
+        parser.add_argument('--handler', choices=['wsgi', 'asgi', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('No such user; create one or pass --user')
+
+        cookie = session_cookie(user)
+        host = default_host()
+        runners = {'wsgi': run_wsgi, 'asgi': run_asgi}
+        handlers = list(runners) if options['handler'] == 'both' else [options['handler']]
+        total, concurrency = options['requests'], options['concurrency']
+
+        self.stdout.write(
+            f"{total} requests per endpoint, {concurrency} concurrent, as {user.username}, "
+            f"{'async' if settings.ASYNC_VIEWS else 'sync'} views"
+        )
+        self.stdout.write(f"{'endpoint':<36} {'handler':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}  statuses")
+        for path in options['paths'] or DEFAULT_PATHS:
+            for name in handlers:
+                result, statuses = runners[name](path, cookie, host, total, concurrency)
+                codes = ','.join(sorted(set(statuses)))
+                self.stdout.write(
+                    f"{path:<36} {name:<6} {result['rps']:>9.1f} {result['p50']:>9.2f} {result['p95']:>9.2f}  {codes}"
+                )
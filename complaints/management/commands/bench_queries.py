@@ -0,0 +1,100 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from complaints import reminders, seeding
+from complaints.models import Complaint, Notification
+
+
+def hot_queries(user_id, now):
+    """The query shapes the API issues on every dashboard poll, as ``(queryset, is_count)``"""
+    cutoff = now - timedelta(days=3)
+    return {
+        'admin page': (Complaint.objects.order_by('-submitted_at', '-id')[:50], False),
+        'user page': (Complaint.objects.filter(user_id=user_id).order_by('-submitted_at', '-id')[:50], False),
+        'status page': (Complaint.objects.filter(status='pending').order_by('submitted_at')[:50], False),
+        'overdue count': (Complaint.objects.filter(
+            status__in=['pending', 'progress'], submitted_at__lte=cutoff
+        ), True),
+        'reminders due': (reminders.overdue_complaints(now).order_by('submitted_at')[:500], False),
+        'unread notifications': (Notification.objects.filter(
+            user_id=user_id, read=False
+        ).order_by('-created_at')[:20], False),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Show query plans and latency for the hot complaint queries. '
+        'With --compare, the Meta.indexes of Complaint and Notification are '
+        'dropped for a "before" run and recreated afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='First bulk insert this many synthetic complaints (and as many notifications)')
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Number of synthetic users to spread seeded rows over')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs per query')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also benchmark without the composite/partial indexes')
+        parser.add_argument('--no-plans', action='store_true', help='Skip EXPLAIN output')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            started = time.monotonic()
+            user_ids = seeding.seed_users(options['users'], prefix='bench')
+            seeding.seed_complaints(user_ids, options['seed'])
+            seeding.seed_notifications(user_ids, options['seed'])
+            self.stdout.write(f"Seeded {options['seed']} complaints in {time.monotonic() - started:.1f}s")
+
+        user_id = (
+            Complaint.objects.values_list('user_id', flat=True).order_by('-submitted_at').first()
+        )
+        self.stdout.write(
+            f'{connection.vendor}: {Complaint.objects.count()} complaints, '
+            f'{Notification.objects.count()} notifications'
+        )
+
+        if options['compare']:
+            indexes = [(model, index) for model in (Complaint, Notification) for index in model._meta.indexes]
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            try:
+                before = self.run(user_id, 'without indexes', options)
+            finally:
+                with connection.schema_editor() as editor:
+                    for model, index in indexes:
+                        editor.add_index(model, index)
+            after = self.run(user_id, 'with indexes', options)
+
+            self.stdout.write('\nSummary (median ms)')
+            for name in after:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f'  {name:<22} {before[name]:>9.2f} -> {after[name]:>9.2f}  ({speedup:.1f}x)')
+        else:
+            self.run(user_id, 'current schema', options)
+
+    def run(self, user_id, label, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label} =='))
+        results = {}
+        for name, (queryset, is_count) in hot_queries(user_id, timezone.now()).items():
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                if is_count:
+                    queryset.count()
+                else:
+                    list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f'{name:<22} {results[name]:>9.2f} ms')
+            if not options['no_plans']:
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'    {line}')
+        return results
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from complaints import blobstore
+from complaints.models import Blob, ComplaintFile
+
+
+def hash_file(name, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    size = 0
+    with default_storage.open(name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class Command(BaseCommand):
+    help = (
+        'Move attachments that predate the blob store into content-addressed '
+        'blobs, deleting duplicate copies, then reconcile reference counts '
+        'and collect unreferenced blobs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how much space deduplication would free')
+
+    def handle(self, *args, **options):
+        legacy = ComplaintFile.objects.filter(blob__isnull=True).exclude(file='').order_by('id')
+        seen = set(Blob.objects.values_list('sha256', flat=True))
+        moved = duplicates = missing = 0
+        freed = 0
+
+        for cf in legacy.iterator(chunk_size=500):
+            if not default_storage.exists(cf.file.name):
+                missing += 1
+                self.stderr.write(f'  missing: {cf.file.name} (ComplaintFile {cf.pk})')
+                continue
+
+            sha256, size = hash_file(cf.file.name)
+            if sha256 in seen:
+                duplicates += 1
+                freed += size
+            else:
+                moved += 1
+                seen.add(sha256)
+            if options['dry_run']:
+                continue
+
+            blob = blobstore.adopt(cf.file.name, sha256, size, cf.name)
+            ComplaintFile.objects.filter(pk=cf.pk).update(
+                blob=blob, file=blob.file.name, sha256=sha256, size=size
+            )
+
+        verb = 'would free' if options['dry_run'] else 'freed'
+        self.stdout.write(
+            f'{moved} unique file(s) moved, {duplicates} duplicate(s) {verb} '
+            f'{freed / (1024 * 1024):.1f} MB, {missing} missing'
+        )
+        if options['dry_run']:
+            return
+
+        references = (
+            ComplaintFile.objects.filter(blob=OuterRef('pk'))
+            .order_by().values('blob').annotate(n=Count('id')).values('n')
+        )
+        Blob.objects.update(ref_count=Coalesce(Subquery(references), 0))
+        collected, collected_bytes = blobstore.collect_garbage()
+        self.stdout.write(self.style.SUCCESS(
+            f'Reference counts reconciled; collected {collected} unreferenced blob(s) '
+            f'({collected_bytes / (1024 * 1024):.1f} MB)'
+        ))
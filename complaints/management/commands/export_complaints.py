@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from complaints import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream complaints to a CSV, NDJSON or XLSX file (or stdout) in '
+        'constant memory, optionally filtered by status and submission date.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(export.ENCODERS), default='csv')
+        parser.add_argument('--status', help='Comma separated statuses to include')
+        parser.add_argument('--from', dest='from', help='First submission date, YYYY-MM-DD')
+        parser.add_argument('--to', help='Last submission date (inclusive), YYYY-MM-DD')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE,
+                            help='Rows fetched and encoded per batch')
+
+    def handle(self, *args, **options):
+        if options['format'] == 'xlsx' and not options['output']:
+            raise CommandError('XLSX is binary; pass --output')
+        try:
+            filters = export.parse_filters(options)
+        except ValueError as e:
+            raise CommandError(e)
+
+        encoder = export.get_encoder(options['format'])
+        rows = export.queryset(**filters)
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in export.stream(encoder, rows, options['chunk_size']):
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from complaints import thumbnails
+from complaints.models import Blob
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails for image blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Parallel image workers')
+        parser.add_argument('--force', action='store_true', help='Regenerate existing thumbnails too')
+
+    def handle(self, *args, **options):
+        blobs = Blob.objects.all() if options['force'] else Blob.objects.filter(thumbnail='')
+        blob_ids = [
+            pk for pk, name in blobs.values_list('pk', 'file').iterator(chunk_size=2000)
+            if thumbnails.is_image(name)
+        ]
+
+        def work(blob_id):
+            try:
+                return thumbnails.generate(blob_id, force=options['force'])
+            finally:
+                close_old_connections()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            created = sum(1 for name in pool.map(work, blob_ids) if name)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {created} of {len(blob_ids)} thumbnail(s) in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from complaints import caching, importing, seeding, stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Load complaints from a CSV or NDJSON file in the export format '
+        f"(columns: {', '.join(importing.COLUMNS)}), in batches, creating "
+        'missing users and attachments, then rebuild the dashboard counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument('--format', choices=sorted(set(importing.FORMATS.values())),
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--files-dir', help='Directory the paths in the files column are relative to')
+        parser.add_argument('--batch-size', type=int, default=seeding.BATCH_SIZE,
+                            help='Complaints inserted per transaction')
+        parser.add_argument('--show-errors', type=int, default=20, help='Rejected rows to list')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        try:
+            format = options['format'] or importing.detect_format(options['path'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        started = time.monotonic()
+
+        def progress(result):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  {result.created} imported, {result.created / elapsed:.0f}/s')
+
+        try:
+            with open(options['path'], 'rb') as f:
+                result = importing.import_rows(
+                    importing.read_rows(f, format), files_dir=options['files_dir'],
+                    batch_size=options['batch_size'], progress=progress
+                )
+        except OSError as e:
+            raise CommandError(e)
+
+        if result.created:
+            stats.rebuild()
+            caching.complaints_changed(*result.user_ids)
+            caching.users_changed()
+
+        for line, message in result.errors[:options['show_errors']]:
+            self.stderr.write(f'  line {line}: {message}')
+        summary = (
+            f'Imported {result.created} complaints ({result.files} files, {result.users_created} new users, '
+            f'{result.duplicates_linked} duplicate links) in {time.monotonic() - started:.1f}s; '
+            f'{result.skipped} already present, {result.rejected} rejected'
+        )
+        self.stdout.write(self.style.WARNING(summary) if result.rejected else self.style.SUCCESS(summary))
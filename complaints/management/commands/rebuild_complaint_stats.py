@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from complaints.models import ComplaintStats
+from complaints.stats import compute_all, drift, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized ComplaintStats rows from the complaint table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted rows, do not rewrite them',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            drifted = drift(compute_all(), {s.user_id: s for s in ComplaintStats.objects.all()})
+        else:
+            drifted = rebuild()
+
+        for user_id, fields in drifted.items():
+            scope = 'global' if user_id is None else f'user {user_id}'
+            self.stdout.write(f"  {scope}: {', '.join(fields)}")
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} drifted row(s), nothing written (dry run)')
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the stats rows, {len(drifted)} had drifted'
+        ))
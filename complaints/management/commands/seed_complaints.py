@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from complaints import caching, seeding, stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, complaints and their notifications with '
+        'realistic category, status, urgency, GPS and feedback distributions, '
+        'then rebuild the dashboard counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Synthetic users to create or reuse')
+        parser.add_argument('--complaints', type=int, default=10000, help='Complaints to insert')
+        parser.add_argument('--days', type=int, default=365, help='Spread submissions over this many days')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the synthetic users')
+        parser.add_argument('--random-seed', type=int, help='Seed for reproducible data')
+        parser.add_argument('--no-notifications', action='store_true',
+                            help='Skip the filed/status notifications for each complaint')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['complaints'] < 0 or options['days'] < 1:
+            raise CommandError('--users and --days must be positive, --complaints not negative')
+
+        rng = random.Random(options['random_seed'])
+        started = time.monotonic()
+        user_ids = seeding.seed_users(options['users'], prefix=options['prefix'])
+        self.stdout.write(f'{len(user_ids)} users ready')
+
+        total = options['complaints']
+        step = max(total // 10, seeding.BATCH_SIZE)
+
+        def progress(done):
+            if done % step < seeding.BATCH_SIZE or done == total:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'  {done}/{total} complaints, {done / elapsed:.0f}/s')
+
+        seeding.seed_complaints(
+            user_ids, total, days=options['days'], rng=rng,
+            notifications=not options['no_notifications'], progress=progress
+        )
+
+        stats.rebuild()
+        caching.complaints_changed(*user_ids)
+        caching.notifications_changed(*user_ids)
+        caching.users_changed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {total} complaints in {time.monotonic() - started:.1f}s; counters rebuilt'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from complaints import reminders
+
+
+class Command(BaseCommand):
+    help = 'Send reminders for complaints pending longer than the reminder window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=reminders.CHUNK_SIZE,
+                            help='Complaints locked and flagged per transaction')
+        parser.add_argument('--days', type=int, default=reminders.REMINDER_DAYS,
+                            help='Days a complaint may stay pending before a reminder')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and sweep every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        sweep_options = {'chunk_size': options['chunk_size'], 'reminder_days': options['days']}
+        if options['interval']:
+            self.stdout.write(f"Sweeping every {options['interval']}s")
+            reminders.run_forever(options['interval'], **sweep_options)
+            return
+
+        result = reminders.sweep(**sweep_options)
+        rate = result['reminders_sent'] / result['elapsed'] if result['elapsed'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {result['reminders_sent']} reminders in {result['chunks']} chunk(s), "
+            f"{result['elapsed']:.2f}s ({rate:.0f} complaints/s)"
+        ))
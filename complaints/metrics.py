@@ -0,0 +1,391 @@
+"""
+Prometheus metrics for the complaint pipeline.
+
+A small in-process registry of counters and histograms, rendered in the
+Prometheus text format by the ``/metrics`` endpoint. The metrics are
+declared at the bottom of this module and updated where the work happens:
+submissions and attachment bytes in the views, fan-out sizes in
+``notifications.dispatch``, sweep durations in ``reminders.sweep``, API
+cache lookups in ``caching`` and request latency in ``MetricsMiddleware``.
+
+By default each process keeps its own values, which is right for a
+single worker. With METRICS_MULTIPROC_DIR set, every process (gunicorn
+workers, cron'd management commands) writes its values to its own
+memory-mapped ``<pid>.db`` file in that directory and a scrape sums all
+of them. There are no cross-process locks, so no worker waits on
+another; within a process, one threading lock guards updates. Files of
+exited processes keep counting towards the totals, as counters should;
+clear the directory when the server starts.
+"""
+import hmac
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+REGISTRY = []
+
+_lock = threading.Lock()
+_values = None
+
+
+class _MemoryValues:
+    """This process's values in a dict"""
+
+    def __init__(self):
+        self._values = defaultdict(float)
+
+    def add(self, increments):
+        for key, amount in increments:
+            self._values[key] += amount
+
+    def items(self):
+        return list(self._values.items())
+
+    def close(self):
+        pass
+
+
+class _FileValues:
+    """
+    This process's values in a memory-mapped file other processes can read.
+
+    Layout: the number of bytes in use (uint32, padded to 8), then one entry
+    per key: key length (uint32), the UTF-8 key padded to a multiple of 8,
+    and the value (float64). Only the owning process writes, its threads
+    taking turns under the module lock; an entry is complete before the
+    used size is moved past it, so readers in other processes never see
+    half an entry and need no lock.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+    HEADER = 8
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self.INITIAL_SIZE:
+            self._file.truncate(self.INITIAL_SIZE)
+            size = self.INITIAL_SIZE
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = struct.unpack_from('I', self._map, 0)[0]
+        if not self._used:
+            self._used = self.HEADER
+            struct.pack_into('I', self._map, 0, self._used)
+        # A reused pid keeps adding to the values already in its file
+        self._positions = {key: position for key, position, _ in _entries(self._map, self._used)}
+
+    def _grow(self, needed):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._map.close()
+        self._file.truncate(capacity)
+        self._capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+
+    def _position(self, key):
+        position = self._positions.get(key)
+        if position is None:
+            encoded = key.encode()
+            padded = len(encoded) + (-(4 + len(encoded)) % 8)
+            size = 4 + padded + 8
+            if self._used + size > self._capacity:
+                self._grow(self._used + size)
+            struct.pack_into(f'I{padded}sd', self._map, self._used, len(encoded), encoded, 0.0)
+            position = self._used + 4 + padded
+            self._used += size
+            struct.pack_into('I', self._map, 0, self._used)
+            self._positions[key] = position
+        return position
+
+    def add(self, increments):
+        for key, amount in increments:
+            position = self._position(key)
+            struct.pack_into('d', self._map, position, struct.unpack_from('d', self._map, position)[0] + amount)
+
+    def items(self):
+        return [(key, value) for key, _, value in _entries(self._map, self._used)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _entries(buffer, used):
+    """``(key, value position, value)`` for every entry in a values file"""
+    position = _FileValues.HEADER
+    while position < used:
+        length = struct.unpack_from('I', buffer, position)[0]
+        key = bytes(buffer[position + 4:position + 4 + length]).decode()
+        position += 4 + length + (-(4 + length) % 8)
+        yield key, position, struct.unpack_from('d', buffer, position)[0]
+        position += 8
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _FileValues.HEADER:
+        return []
+    used = min(struct.unpack_from('I', data, 0)[0], len(data))
+    return [(key, value) for key, _, value in _entries(data, used)]
+
+
+def _store():
+    """This process's value store, opened on first use and again after a fork"""
+    global _values
+    values = _values
+    if values is not None and values.pid == os.getpid():
+        return values
+    with _lock:
+        if _values is None or _values.pid != os.getpid():
+            directory = settings.METRICS_MULTIPROC_DIR
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                values = _FileValues(os.path.join(directory, f'{os.getpid()}.db'))
+            else:
+                values = _MemoryValues()
+            values.pid = os.getpid()
+            _values = values
+        return _values
+
+
+def _add(increments):
+    store = _store()
+    with _lock:
+        store.add(increments)
+
+
+def reset():
+    """Forget this process's values and reopen the store (tests, settings changes)"""
+    global _values
+    with _lock:
+        if _values is not None:
+            _values.close()
+        _values = None
+
+
+def collect():
+    """``{key: value}`` summed over every process sharing METRICS_MULTIPROC_DIR (or this one)"""
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        store = _store()
+        with _lock:
+            return dict(store.items())
+    totals = defaultdict(float)
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        if name.endswith('.db'):
+            try:
+                items = _read_file(os.path.join(directory, name))
+            except OSError:
+                continue
+            for key, value in items:
+                totals[key] += value
+    return totals
+
+
+@lru_cache(maxsize=4096)
+def _key(name, suffix, label_values):
+    return json.dumps([name, suffix, label_values], ensure_ascii=False)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self, values):
+        """``(sample name, labels, value)`` for this metric out of ``collect()``"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters only go up')
+        _add([(_key(self.name, '', self._label_values(labels)), amount)])
+
+    def samples(self, values):
+        for (suffix, label_values), value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, label_values)), value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        label_values = self._label_values(labels)
+        bucket = next(b for b in self.buckets if value <= b)
+        _add([
+            (_key(self.name, 'bucket', label_values + (_format(bucket),)), 1),
+            (_key(self.name, 'sum', label_values), value),
+            (_key(self.name, 'count', label_values), 1),
+        ])
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the ``with`` block took"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, values):
+        series = defaultdict(dict)
+        for (suffix, label_values), value in values.items():
+            if suffix == 'bucket':
+                *label_values, le = label_values
+                series[tuple(label_values)][le] = value
+            else:
+                series[tuple(label_values)][suffix] = value
+        for label_values, found in sorted(series.items()):
+            labels = dict(zip(self.labelnames, label_values))
+            cumulative = 0
+            for bucket in self.buckets:
+                cumulative += found.get(_format(bucket), 0)
+                yield f'{self.name}_bucket', {**labels, 'le': _format(bucket)}, cumulative
+            yield f'{self.name}_sum', labels, found.get('sum', 0)
+            yield f'{self.name}_count', labels, found.get('count', 0)
+
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def exposition():
+    """Every registered metric in the Prometheus text format"""
+    by_metric = defaultdict(dict)
+    for key, value in collect().items():
+        name, suffix, label_values = json.loads(key)
+        by_metric[name][(suffix, tuple(label_values))] = value
+
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for sample, labels, value in metric.samples(by_metric.get(metric.name, {})):
+            if labels:
+                rendered = ','.join(f'{name}="{_escape(v)}"' for name, v in labels.items())
+                sample = f'{sample}{{{rendered}}}'
+            lines.append(f'{sample} {_format(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def authorized(request):
+    """
+    Admins' sessions, or scrapers sending METRICS_TOKEN as a bearer token.
+    With no token configured only admins can read the metrics.
+    """
+    token = settings.METRICS_TOKEN
+    sent = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+        return True
+    return request.user.is_authenticated and request.user.is_superuser
+
+
+def _observe_request(request, response, started):
+    match = getattr(request, 'resolver_match', None)
+    # Unmatched paths and odd methods share a series so scanners can't add new ones
+    view = match.view_name if match else '<unresolved>'
+    method = request.method if request.method in METHODS else 'other'
+    REQUEST_SECONDS.observe(time.perf_counter() - started, view=view, method=method)
+    REQUESTS.inc(view=view, method=method, status=str(response.status_code))
+    return response
+
+
+class MetricsMiddleware:
+    """
+    Per-view request counts and latency. For streaming responses this is
+    the time until the response starts, not until the last byte is sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        return _observe_request(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        return _observe_request(request, await self.get_response(request), started)
+
+
+REQUESTS = Counter(
+    'complaints_http_requests_total', 'HTTP requests by view, method and status code',
+    ['view', 'method', 'status'],
+)
+REQUEST_SECONDS = Histogram(
+    'complaints_http_request_duration_seconds', 'Time to respond to a request, by view and method',
+    ['view', 'method'],
+)
+COMPLAINTS_SUBMITTED = Counter(
+    'complaints_submitted_total', 'Complaints filed through the API, by urgency', ['urgency'],
+)
+ATTACHMENTS = Counter(
+    'complaints_attachments_total', 'Attachments received, by how they were sent', ['source'],
+)
+ATTACHMENT_BYTES = Counter(
+    'complaints_attachment_bytes_total', 'Attachment bytes received, before deduplication', ['source'],
+)
+NOTIFICATION_FANOUT = Histogram(
+    'complaints_notification_fanout', 'Notifications written per dispatch',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+REMINDER_SWEEP_SECONDS = Histogram(
+    'complaints_reminder_sweep_duration_seconds', 'Duration of completed reminder sweeps',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+REMINDERS_SENT = Counter(
+    'complaints_reminders_sent_total', 'Overdue complaints reminded about',
+)
+API_CACHE_REQUESTS = Counter(
+    'complaints_api_cache_requests_total', 'API payload cache lookups by endpoint and outcome (hit or miss)',
+    ['endpoint', 'outcome'],
+)
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0002_complaintstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['-submitted_at', '-id'], name='complaint_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['user', '-submitted_at', '-id'], name='complaint_user_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['status', 'submitted_at'], name='complaint_status_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(condition=models.Q(('reminder_sent', False), ('status__in', ['pending', 'progress'])), fields=['status', 'reminder_sent', 'submitted_at'], name='complaint_reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', '-created_at'], name='notification_user_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', '-created_at'], name='notification_unread_idx'),
+        ),
+    ]
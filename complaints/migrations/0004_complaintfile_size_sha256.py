@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaintfile',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='complaintfile',
+            name='size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0005_blob_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='thumbnail',
+            field=models.FileField(blank=True, upload_to=''),
+        ),
+    ]
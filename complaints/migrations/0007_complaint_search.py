@@ -0,0 +1,69 @@
+# Full-text search index over complaints, see complaints/search.py
+
+from django.db import migrations
+
+FTS_TABLE = 'complaints_complaint_fts'
+COLUMNS = ['complaint_id', 'complaint_type', 'location', 'name', 'details']
+# tsvector weight labels, same order as COLUMNS
+WEIGHTS = ['A', 'B', 'C', 'D', 'D']
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        cols = ', '.join(COLUMNS)
+        new = ', '.join(f'new.{c}' for c in COLUMNS)
+        old = ', '.join(f'old.{c}' for c in COLUMNS)
+        statements = [
+            f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                {cols}, content='complaints_complaint', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2')""",
+            f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON complaints_complaint BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new});
+            END""",
+            f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON complaints_complaint BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            END""",
+            f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {cols} ON complaints_complaint BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old});
+                INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new});
+            END""",
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ]
+    elif vendor == 'postgresql':
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple'::regconfig, coalesce({column}, '')), '{weight}')"
+            for column, weight in zip(COLUMNS, WEIGHTS)
+        )
+        statements = [
+            f'ALTER TABLE complaints_complaint ADD COLUMN search_vector tsvector '
+            f'GENERATED ALWAYS AS ({vector}) STORED',
+            'CREATE INDEX complaint_search_idx ON complaints_complaint USING GIN (search_vector)',
+        ]
+    else:
+        statements = []
+
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS complaint_search_idx')
+        schema_editor.execute('ALTER TABLE complaints_complaint DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0006_blob_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0007_complaint_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='complaints.complaint'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+from complaints import geo
+
+
+def backfill_geohash(apps, schema_editor):
+    Complaint = apps.get_model('complaints', 'Complaint')
+    located = Complaint.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for complaint in located.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        complaint.geohash = geo.encode(complaint.latitude, complaint.longitude)
+        batch.append(complaint)
+        if len(batch) == 2000:
+            Complaint.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    Complaint.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0008_complaint_duplicate_of'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(condition=models.Q(('geohash__isnull', False)), fields=['geohash'], name='complaint_geohash_idx'),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0009_complaint_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('address', models.TextField()),
+                ('source', models.CharField(choices=[('nominatim', 'Nominatim'), ('gazetteer', 'Gazetteer')], default='nominatim', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0010_geocodecache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['updated_at'], name='complaint_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['user', 'updated_at'], name='complaint_user_updated_idx'),
+        ),
+    ]
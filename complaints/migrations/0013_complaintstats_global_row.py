@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-18 13:20
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+COUNTERS = [
+    'total', 'pending', 'progress', 'resolved', 'reopened',
+    'high_urgency', 'with_files', 'rating_sum', 'rating_count',
+]
+
+
+def seed_global_row(apps, schema_editor):
+    """Leave exactly one global row, summed from the user rows unless there already is one"""
+    ComplaintStats = apps.get_model('complaints', 'ComplaintStats')
+    global_rows = ComplaintStats.objects.filter(user__isnull=True)
+    if global_rows.count() == 1:
+        return
+    # Missing, or duplicated by concurrent first writes that each got part of the increments
+    global_rows.delete()
+    row = ComplaintStats(user=None)
+    for stats in ComplaintStats.objects.filter(user__isnull=False).iterator(chunk_size=2000):
+        for name in COUNTERS:
+            setattr(row, name, getattr(row, name) + getattr(stats, name))
+        for name, count in stats.categories.items():
+            row.categories[name] = row.categories.get(name, 0) + count
+    row.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0012_complainttombstone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_global_row, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='complaintstats',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('user', models.Value(0)), condition=models.Q(('user__isnull', True)), name='complaint_stats_one_global_row'),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 import uuid
 
+from . import geo
+
 class Complaint(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -36,6 +40,8 @@ class Complaint(models.Model):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     gps_accuracy = models.FloatField(null=True, blank=True)
+    # Geohash cell of latitude/longitude, kept in sync by save()
+    geohash = models.CharField(max_length=12, null=True, blank=True, editable=False)
     
     # Feedback
     feedback = models.TextField(blank=True, null=True)
@@ -51,23 +57,73 @@ class Complaint(models.Model):
     reminder_sent = models.BooleanField(default=False)
     reminder_sent_at = models.DateTimeField(blank=True, null=True)
     
+    # Near-duplicate detection: points at the first complaint of the cluster
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates'
+    )
+    
     # Timestamps
     submitted_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Keyset pages of get_complaints: admins see everything, users their own rows
+            models.Index(fields=['-submitted_at', '-id'], name='complaint_submitted_idx'),
+            models.Index(fields=['user', '-submitted_at', '-id'], name='complaint_user_submitted_idx'),
+            models.Index(fields=['status', 'submitted_at'], name='complaint_status_submitted_idx'),
+            # ETag validators read the newest updated_at per scope
+            models.Index(fields=['updated_at'], name='complaint_updated_idx'),
+            models.Index(fields=['user', 'updated_at'], name='complaint_user_updated_idx'),
+            # Reminder sweep only ever looks at open complaints not yet reminded
+            models.Index(
+                fields=['status', 'reminder_sent', 'submitted_at'],
+                condition=models.Q(status__in=['pending', 'progress'], reminder_sent=False),
+                name='complaint_reminder_due_idx',
+            ),
+            # Box, radius and hotspot queries; most complaints have no GPS fix
+            models.Index(
+                fields=['geohash'],
+                condition=models.Q(geohash__isnull=False),
+                name='complaint_geohash_idx',
+            ),
+        ]
+    
     def save(self, *args, **kwargs):
         if not self.complaint_id:
             # Generate CMP + random 8 digits
             self.complaint_id = f"CMP{str(uuid.uuid4().int)[:8]}"
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.complaint_id} - {self.user.username} - {self.status}"
 
+class Blob(models.Model):
+    """One stored copy of an attachment's content, shared by every ComplaintFile with the same hash"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField()
+    thumbnail = models.FileField(blank=True)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
 class ComplaintFile(models.Model):
     complaint = models.ForeignKey(Complaint, on_delete=models.CASCADE, related_name='files')
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='references')
     file = models.FileField(upload_to='complaint_files/%Y/%m/%d/')
     name = models.CharField(max_length=255)
+    size = models.BigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -92,6 +148,91 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'read', '-created_at'], name='notification_user_read_idx'),
+            # get_notifications only ever reads the unread ones
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(read=False),
+                name='notification_unread_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} - {self.user.username}"
+
+class ComplaintStats(models.Model):
+    """Denormalized complaint counters; the row with no user holds global totals"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='complaint_stats')
+    
+    total = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    progress = models.IntegerField(default=0)
+    resolved = models.IntegerField(default=0)
+    reopened = models.IntegerField(default=0)
+    high_urgency = models.IntegerField(default=0)
+    with_files = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    categories = models.JSONField(default=dict)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'complaint stats'
+        constraints = [
+            # NULLs never collide in a unique index, so the global row needs its own
+            models.UniqueConstraint(
+                Coalesce('user', Value(0)), condition=Q(user__isnull=True), name='complaint_stats_one_global_row'
+            ),
+        ]
+    
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'pending': self.pending,
+            'progress': self.progress,
+            'resolved': self.resolved,
+            'reopened': self.reopened,
+            'high_urgency': self.high_urgency,
+            'with_files': self.with_files,
+            'categories': self.categories,
+            'avg_rating': round(self.rating_sum / self.rating_count, 1) if self.rating_count else 0,
+        }
+    
+    def __str__(self):
+        return f"Stats - {self.user.username if self.user else 'global'}"
+
+
+class ComplaintTombstone(models.Model):
+    """A deleted complaint, kept for a while so delta syncs can drop it on clients"""
+    complaint_id = models.CharField(max_length=20)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.complaint_id} deleted {self.deleted_at}"
+
+class GeocodeCache(models.Model):
+    """Reverse geocoded address per coordinate cell, see complaints.geocoding"""
+    NOMINATIM = 'nominatim'
+    GAZETTEER = 'gazetteer'
+    SOURCE_CHOICES = [
+        (NOMINATIM, 'Nominatim'),
+        (GAZETTEER, 'Gazetteer'),
+    ]
+    
+    # Rounded "lat,lon"
+    key = models.CharField(max_length=32, unique=True)
+    address = models.TextField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default=NOMINATIM)
+    created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.title} - {self.user.username}"
\ No newline at end of file
+        return f"{self.key} - {self.address}"
@@ -0,0 +1,59 @@
+"""
+Notification fan-out.
+
+Views build ``Notification`` objects in memory and hand them to
+``dispatch``, which writes them with batched ``bulk_create`` inside one
+transaction and pushes them to connected browsers once it commits. The
+admin recipient list is resolved once and cached, so an event costs a
+constant number of queries however many admins there are.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching, metrics, realtime
+from .models import Notification
+
+ADMIN_IDS_CACHE_KEY = 'complaints:admin_ids'
+ADMIN_IDS_TIMEOUT = 300
+BATCH_SIZE = 500
+
+
+def get_admin_ids():
+    """Return the ids of all superusers, cached for ADMIN_IDS_TIMEOUT seconds"""
+    admin_ids = cache.get(ADMIN_IDS_CACHE_KEY)
+    if admin_ids is None:
+        admin_ids = list(User.objects.filter(is_superuser=True).values_list('id', flat=True))
+        cache.set(ADMIN_IDS_CACHE_KEY, admin_ids, ADMIN_IDS_TIMEOUT)
+    return admin_ids
+
+
+def invalidate_admin_ids():
+    cache.delete(ADMIN_IDS_CACHE_KEY)
+
+
+def for_admins(title, message, type='info', complaint=None, admin_ids=None):
+    """Build (unsaved) notifications addressed to every admin"""
+    if admin_ids is None:
+        admin_ids = get_admin_ids()
+    return [
+        Notification(user_id=admin_id, title=title, message=message, type=type, complaint=complaint)
+        for admin_id in admin_ids
+    ]
+
+
+def dispatch(notifications):
+    """Write a list of unsaved notifications in batches, in one transaction"""
+    if not notifications:
+        return []
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        metrics.NOTIFICATION_FANOUT.observe(len(created))
+        caching.notifications_changed(*(n.user_id for n in notifications))
+        transaction.on_commit(lambda: realtime.publish_notifications(created))
+    return created
+
+
+def notify_admins(title, message, type='info', complaint=None):
+    """Notify every admin about an event"""
+    return dispatch(for_admins(title, message, type, complaint))
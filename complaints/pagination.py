@@ -0,0 +1,72 @@
+"""Keyset (cursor) pagination over ``(submitted_at, id)``"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(complaint):
+    """Build an opaque cursor pointing just past ``complaint``"""
+    raw = f"{complaint.submitted_at.isoformat()}|{complaint.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(submitted_at, id)`` for a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        submitted_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(submitted_at), int(pk)
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_page_size(raw):
+    """Clamp a ``limit`` query value to ``1..MAX_PAGE_SIZE``"""
+    if not raw:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(raw)
+    except ValueError:
+        raise ValueError('Invalid limit')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset``, newest first.
+
+    Rows are ordered by ``-submitted_at, -id`` and each page seeks past the
+    previous cursor instead of using OFFSET, so every page costs the same
+    regardless of how deep the client has scrolled.
+    """
+    rows = list(_page_queryset(queryset, cursor, page_size))
+    return _split_page(rows, page_size)
+
+
+async def apaginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """``paginate`` for async views"""
+    rows = [row async for row in _page_queryset(queryset, cursor, page_size)]
+    return _split_page(rows, page_size)
+
+
+def _page_queryset(queryset, cursor, page_size):
+    queryset = queryset.order_by('-submitted_at', '-id')
+    if cursor:
+        submitted_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(submitted_at__lt=submitted_at) |
+            Q(submitted_at=submitted_at, id__lt=pk)
+        )
+    # One extra row tells whether another page follows
+    return queryset[:page_size + 1]
+
+
+def _split_page(rows, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1]) if has_more else None
+    return rows, next_cursor
@@ -0,0 +1,267 @@
+"""
+Opt-in per-request profiling.
+
+With ``REQUEST_PROFILING`` on, ``ProfilingMiddleware`` times every request
+and, through a database execute wrapper, counts its queries and their
+total time. SQL text repeated DUPLICATE_THRESHOLD or more times in one
+request is flagged as a likely N+1 (a related lookup inside a loop) and
+logged. Each response carries a ``Server-Timing`` header (total, db,
+repeated queries) that browser dev tools show next to the request, and
+per-endpoint aggregates for this worker are kept for the
+``get_request_metrics`` endpoint. A REQUEST_PROFILING_SAMPLE_RATE share
+of requests is also profiled and dumped to REQUEST_PROFILING_DIR:
+``cProfile`` stats (the request's own thread only) or, with
+``REQUEST_PROFILER = 'pyinstrument'``, an HTML report that follows async
+views.
+
+Queries are attributed through a context variable, so async views whose
+ORM calls run in ``sync_to_async`` threads are counted too. Queries run
+while a streaming response is iterated come after the middleware
+returns and are not counted. With the setting off the middleware removes
+itself at startup and costs nothing.
+"""
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_THRESHOLD = 3
+RECENT_DUPLICATES = 50
+SQL_PREVIEW = 300
+
+_current = contextvars.ContextVar('complaints_request_profile', default=None)
+
+_lock = threading.Lock()
+_endpoints = {}
+_duplicates = deque(maxlen=RECENT_DUPLICATES)
+
+
+class RequestProfile:
+    """What one request did; filled in by the execute wrapper"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements[sql] += 1
+
+    def repeated(self):
+        """``{sql: times}`` for statements run DUPLICATE_THRESHOLD or more times"""
+        return {sql: n for sql, n in self.statements.items() if n >= DUPLICATE_THRESHOLD}
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # The statement with placeholders: the same lookup for another row matches
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+def _install_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install():
+    """
+    Wrap every database connection opened from now on, and the ones already
+    open in this thread. Called from the app's ``ready()`` so connections
+    opened by other threads before the first request are covered too.
+    """
+    connection_created.connect(_install_wrapper, dispatch_uid='complaints.profiling')
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(connection)
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    # Unmatched paths share one bucket so scanners can't grow the table
+    return match.view_name if match else '<unresolved>'
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+def server_timing(profile, total_seconds):
+    """The ``Server-Timing`` header value for a finished request"""
+    parts = [
+        f'total;dur={total_seconds * 1000:.1f}',
+        f'db;dur={profile.sql_seconds * 1000:.1f};desc="{profile.queries} queries"',
+    ]
+    repeated = profile.repeated()
+    if repeated:
+        parts.append(f'dup;desc="{sum(repeated.values())} repeated queries"')
+    return ', '.join(parts)
+
+
+def _finish(request, response, profile):
+    total = time.perf_counter() - profile.started
+    endpoint = _endpoint(request)
+    size = _response_size(response)
+    repeated = profile.repeated()
+
+    response['Server-Timing'] = server_timing(profile, total)
+    for sql, times in repeated.items():
+        logger.warning('%s ran the same query %d times (possible N+1): %s', endpoint, times, sql[:SQL_PREVIEW])
+
+    with _lock:
+        stats = _endpoints.setdefault(endpoint, {
+            'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'queries': 0, 'max_queries': 0, 'sql_ms': 0.0,
+            'bytes': 0, 'flagged': 0,
+        })
+        stats['requests'] += 1
+        stats['total_ms'] += total * 1000
+        stats['max_ms'] = max(stats['max_ms'], total * 1000)
+        stats['queries'] += profile.queries
+        stats['max_queries'] = max(stats['max_queries'], profile.queries)
+        stats['sql_ms'] += profile.sql_seconds * 1000
+        stats['bytes'] += size or 0
+        if repeated:
+            stats['flagged'] += 1
+            _duplicates.extend(
+                {'endpoint': endpoint, 'times': times, 'sql': sql[:SQL_PREVIEW], 'at': time.time()}
+                for sql, times in repeated.items()
+            )
+    return response
+
+
+def metrics():
+    """Per-endpoint aggregates and the latest repeated-query samples for this process"""
+    with _lock:
+        endpoints = {name: dict(stats) for name, stats in _endpoints.items()}
+        duplicates = list(_duplicates)
+    for stats in endpoints.values():
+        n = stats['requests']
+        stats['avg_ms'] = round(stats['total_ms'] / n, 2)
+        stats['avg_queries'] = round(stats['queries'] / n, 2)
+        stats['avg_sql_ms'] = round(stats['sql_ms'] / n, 2)
+        for key in ('total_ms', 'max_ms', 'sql_ms'):
+            stats[key] = round(stats[key], 2)
+    return {'endpoints': endpoints, 'repeated_queries': duplicates}
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+        _duplicates.clear()
+
+
+class _Sampler:
+    """Profiles a sampled request with cProfile or pyinstrument and writes the dump"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImproperlyConfigured("REQUEST_PROFILER = 'pyinstrument' needs the pyinstrument package")
+        elif kind != 'cprofile':
+            raise ImproperlyConfigured("REQUEST_PROFILER must be 'cprofile' or 'pyinstrument'")
+
+    def start(self, async_mode=False):
+        if self.kind == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode='enabled' if async_mode else 'disabled')
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile at a time; skip overlapping samples
+                return None
+        return profiler
+
+    def stop(self, profiler, request, total_seconds):
+        if self.kind == 'pyinstrument':
+            profiler.stop()
+        else:
+            profiler.disable()
+        directory = settings.REQUEST_PROFILING_DIR
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', _endpoint(request)).strip('-')
+        stem = os.path.join(directory, f'{time.strftime("%Y%m%dT%H%M%S")}-{slug}-{total_seconds * 1000:.0f}ms')
+        # A dump that can't be written must not fail the request it describes
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if self.kind == 'pyinstrument':
+                with open(f'{stem}.html', 'w') as f:
+                    f.write(profiler.output_html())
+            else:
+                profiler.dump_stats(f'{stem}.prof')
+        except OSError:
+            logger.exception('Could not write the request profile %s', stem)
+
+
+class ProfilingMiddleware:
+    """Times requests, counts their SQL and flags repeated queries; see the module docstring"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        self.sampler = _Sampler(settings.REQUEST_PROFILER) if self.sample_rate > 0 else None
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def _sample(self):
+        return self.sampler is not None and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self.sampler.start() if self._sample() else None
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                self.sampler.stop(profiler, request, time.perf_counter() - profile.started)
+            _current.reset(token)
+        return _finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self.sampler.start(async_mode=True) if self._sample() else None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if profiler is not None:
+                self.sampler.stop(profiler, request, time.perf_counter() - profile.started)
+            _current.reset(token)
+        return _finish(request, response, profile)
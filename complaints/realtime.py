@@ -0,0 +1,125 @@
+"""
+Server-Sent Events push of notifications.
+
+``notifications.dispatch`` publishes every notification to the in-process
+``hub`` once its transaction commits, and each open
+``/api/notification-stream/`` connection (an async view, so it only
+holds a coroutine under the ASGI server, not a worker) subscribes its
+user. The hub only reaches connections in the same process; on every
+HEARTBEAT without events a stream also asks the database for newer
+notifications, so events published by other workers arrive within that
+interval. Event ids are notification ids, which lets a reconnecting
+EventSource resume from ``Last-Event-ID``.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from .models import Notification
+from .sync import serialize_notification
+
+HEARTBEAT = 15
+QUEUE_SIZE = 100
+CATCH_UP_LIMIT = 100
+
+
+def _offer(queue, item):
+    # A client that stops reading drops events rather than growing memory;
+    # it catches up from the database on its next heartbeat
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        pass
+
+
+class Hub:
+    """Per-user fan-out from any thread to queues living on event loops"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[user_id].add(entry)
+        return entry
+
+    def unsubscribe(self, user_id, entry):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._subscribers.values())
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            entries = list(self._subscribers.get(user_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, (event, data))
+            except RuntimeError:
+                # Loop already closed; its stream is going away
+                pass
+
+
+hub = Hub()
+
+
+def publish_notifications(notifications):
+    for n in notifications:
+        hub.publish(n.user_id, 'notification', serialize_notification(n))
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _newer(user_id, last_id):
+    rows = Notification.objects.filter(
+        user_id=user_id, id__gt=last_id
+    ).select_related('complaint').order_by('id')[:CATCH_UP_LIMIT]
+    return [n async for n in rows]
+
+
+async def _latest_id(user_id):
+    latest = await Notification.objects.filter(user_id=user_id).order_by('-id').values_list('id', flat=True).afirst()
+    return latest or 0
+
+
+async def stream(user_id, last_id=None):
+    """Async iterator of SSE frames for ``user_id``, resuming after ``last_id``"""
+    loop_entry = hub.subscribe(user_id)
+    queue = loop_entry[1]
+    try:
+        # Subscribed first, so nothing published from here on is lost
+        if last_id is None:
+            last_id = await _latest_id(user_id)
+        yield 'retry: 5000\n\n'
+
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                missed = await _newer(user_id, last_id)
+                for n in missed:
+                    last_id = n.id
+                    yield format_event('notification', serialize_notification(n), n.id)
+                if not missed:
+                    yield ': keepalive\n\n'
+                continue
+            if data['id'] <= last_id:
+                # Already sent by a database catch-up
+                continue
+            last_id = data['id']
+            yield format_event(event, data, data['id'])
+    finally:
+        hub.unsubscribe(user_id, loop_entry)
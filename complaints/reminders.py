@@ -0,0 +1,135 @@
+"""
+Reminder sweep for complaints left pending too long.
+
+Overdue complaints are processed in bounded chunks. Each chunk is locked
+with ``select_for_update(skip_locked=True)``, its notifications are written
+with one batched insert and the complaints are flagged with one UPDATE
+(bumping the owners' cached payloads on commit), so several sweeps (cron,
+web workers, the check-reminders endpoint) can run at once without sending
+a reminder twice.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, metrics, notifications
+from .models import Complaint, Notification
+
+logger = logging.getLogger(__name__)
+
+REMINDER_DAYS = 3
+CHUNK_SIZE = 500
+
+
+def overdue_complaints(now, reminder_days=REMINDER_DAYS):
+    return Complaint.objects.filter(
+        status__in=['pending', 'progress'],
+        reminder_sent=False,
+        submitted_at__lte=now - timedelta(days=reminder_days)
+    )
+
+
+def _reminder_notifications(complaint, now, admin_ids):
+    days_pending = (now - complaint.submitted_at).days
+    return [
+        Notification(
+            user_id=complaint.user_id,
+            title='Pending Complaint Reminder',
+            message=f'Your complaint {complaint.complaint_id} is pending for {days_pending} days.',
+            type='warning',
+            complaint=complaint
+        ),
+        *notifications.for_admins(
+            title='⚠️ Pending Complaint',
+            message=f'Complaint {complaint.complaint_id} pending for {days_pending} days',
+            type='warning',
+            complaint=complaint,
+            admin_ids=admin_ids
+        ),
+    ]
+
+
+def sweep(now=None, chunk_size=CHUNK_SIZE, reminder_days=REMINDER_DAYS):
+    """
+    Send reminders for every overdue complaint.
+
+    Returns a dict with ``reminders_sent``, ``chunks`` and ``elapsed``
+    (seconds).
+    """
+    now = now or timezone.now()
+    started = time.monotonic()
+    admin_ids = notifications.get_admin_ids()
+    reminders_sent = 0
+    chunks = 0
+
+    while True:
+        with transaction.atomic():
+            chunk = list(
+                overdue_complaints(now, reminder_days)
+                .select_for_update(skip_locked=True)
+                .only('id', 'complaint_id', 'user_id', 'submitted_at')
+                .order_by('submitted_at', 'id')[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            pending_notifications = []
+            for complaint in chunk:
+                pending_notifications.extend(_reminder_notifications(complaint, now, admin_ids))
+            notifications.dispatch(pending_notifications)
+
+            Complaint.objects.filter(pk__in=[c.pk for c in chunk]).update(
+                reminder_sent=True,
+                reminder_sent_at=now,
+                updated_at=now
+            )
+            # The owners' cached listings and dashboards carry reminder state and updated_at
+            caching.complaints_changed(*{c.user_id for c in chunk})
+
+        reminders_sent += len(chunk)
+        chunks += 1
+
+    elapsed = time.monotonic() - started
+    metrics.REMINDER_SWEEP_SECONDS.observe(elapsed)
+    metrics.REMINDERS_SENT.inc(reminders_sent)
+    return {
+        'reminders_sent': reminders_sent,
+        'chunks': chunks,
+        'elapsed': elapsed,
+    }
+
+
+def run_forever(interval, **sweep_options):
+    """Sweep every ``interval`` seconds until the process exits"""
+    while True:
+        try:
+            result = sweep(**sweep_options)
+            if result['reminders_sent']:
+                logger.info('Sent %d reminders in %.2fs', result['reminders_sent'], result['elapsed'])
+        except Exception:
+            logger.exception('Reminder sweep failed')
+        time.sleep(interval)
+
+
+_scheduler = None
+
+
+def start_scheduler(interval=None):
+    """
+    Start the in-process sweep thread if REMINDER_SWEEP_INTERVAL is set.
+
+    Safe to call from every worker: concurrent sweeps skip each other's
+    locked rows.
+    """
+    global _scheduler
+    interval = interval or getattr(settings, 'REMINDER_SWEEP_INTERVAL', 0)
+    if not interval or _scheduler is not None:
+        return None
+    _scheduler = threading.Thread(target=run_forever, args=(interval,), name='reminder-sweep', daemon=True)
+    _scheduler.start()
+    return _scheduler
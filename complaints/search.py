@@ -0,0 +1,114 @@
+"""
+Full-text search over complaints.
+
+The index lives in the database and is kept current by the database
+itself, so every write path (views, admin, bulk_create, update()) is
+covered:
+
+* SQLite: an external-content FTS5 table ``complaints_complaint_fts``
+  maintained by triggers, ranked with ``bm25``.
+* PostgreSQL: a stored generated ``search_vector`` tsvector column with a
+  GIN index, ranked with ``ts_rank``.
+
+Both are created by migration ``0007_complaint_search``. Other backends
+fall back to ``icontains`` matching ordered by recency.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Complaint
+
+FTS_TABLE = 'complaints_complaint_fts'
+
+# Indexed columns and their ranking weight, most important first
+SEARCH_COLUMNS = [
+    ('complaint_id', 10.0),
+    ('complaint_type', 4.0),
+    ('location', 3.0),
+    ('name', 2.0),
+    ('details', 1.0),
+]
+
+# Characters with a meaning in FTS5 / tsquery syntax
+_OPERATORS = re.compile(r"""["'&|!():*<>\\^{}\[\]+-]""")
+
+MAX_TERMS = 8
+
+
+def terms(query):
+    """Split user input into at most MAX_TERMS plain search terms"""
+    words = (_OPERATORS.sub(' ', word).strip() for word in query.split())
+    return [w for word in words for w in word.split()][:MAX_TERMS]
+
+
+def _fts5_query(words):
+    # Every term must match, each as a prefix ("wat" finds "water")
+    return ' '.join('"{}"*'.format(w.replace('"', '""')) for w in words)
+
+
+def _tsquery(words):
+    return ' & '.join("'{}':*".format(w.replace("'", "''")) for w in words)
+
+
+def _ranked_ids(words, user_id, limit, offset):
+    """Return complaint ids best match first, restricted to ``user_id`` if given"""
+    scope = 'AND c.user_id = %s' if user_id is not None else ''
+    scope_params = [user_id] if user_id is not None else []
+
+    if connection.vendor == 'sqlite':
+        weights = ', '.join(str(weight) for _, weight in SEARCH_COLUMNS)
+        sql = f"""
+            SELECT c.id FROM {FTS_TABLE} f
+            JOIN complaints_complaint c ON c.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s {scope}
+            ORDER BY bm25({FTS_TABLE}, {weights}), c.submitted_at DESC
+            LIMIT %s OFFSET %s
+        """
+        params = [_fts5_query(words), *scope_params, limit, offset]
+    else:
+        sql = f"""
+            SELECT c.id FROM complaints_complaint c
+            WHERE c.search_vector @@ to_tsquery('simple', %s) {scope}
+            ORDER BY ts_rank(c.search_vector, to_tsquery('simple', %s)) DESC, c.submitted_at DESC
+            LIMIT %s OFFSET %s
+        """
+        query = _tsquery(words)
+        params = [query, *scope_params, query, limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(words, user_id, limit, offset):
+    complaints = Complaint.objects.all()
+    if user_id is not None:
+        complaints = complaints.filter(user_id=user_id)
+    for word in words:
+        match = Q()
+        for column, _ in SEARCH_COLUMNS:
+            match |= Q(**{f'{column}__icontains': word})
+        complaints = complaints.filter(match)
+    complaints = complaints.order_by('-submitted_at', '-id')
+    return list(complaints.values_list('id', flat=True)[offset:offset + limit])
+
+
+def search(query, user=None, limit=20, offset=0):
+    """
+    Return ``(complaint ids, has_more)`` for ``query``, best match first.
+
+    Non-admin ``user``s only search their own complaints.
+    """
+    words = terms(query)
+    if not words:
+        return [], False
+
+    user_id = user.id if user is not None and not user.is_superuser else None
+    if connection.vendor in ('sqlite', 'postgresql'):
+        ids = _ranked_ids(words, user_id, limit + 1, offset)
+    else:
+        ids = _fallback_ids(words, user_id, limit + 1, offset)
+    return ids[:limit], len(ids) > limit
+
@@ -0,0 +1,290 @@
+"""
+Synthetic data for benchmarking.
+
+``seed_complaints`` generates complaints shaped like real traffic rather
+than identical rows: category mix and wording (Hindi, Marathi and English
+text the classifier recognises), urgency by category, status by age,
+GPS fixes clustered around campus spots, ratings and feedback on resolved
+complaints, and the notifications the views would have sent. Complaints
+and their notifications are written in BATCH_SIZE batches with
+``bulk_insert``; users and the standalone notifications of
+``seed_notifications`` with ``bulk_create``. Either way ``save()`` and
+signals are bypassed, so derived columns (geohash) are filled here and the
+counters must be rebuilt afterwards (``manage.py rebuild_complaint_stats``).
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import classifier, geo
+from .models import Complaint, Notification
+
+BATCH_SIZE = 5000
+# Keeps IN (...) lookups under SQLite's default bound parameter limit
+LOOKUP_CHUNK = 900
+
+# Category -> (share of complaints, chance of High urgency, detail templates)
+CATEGORY_PROFILES = {
+    'बिजली/Electricity/वीज': (18, 0.15, [
+        'No electricity in {place} since morning, fan and light not working',
+        '{place} में बिजली नहीं है, पंखा बंद है',
+        '{place} मध्ये वीज नाही, लाईट गेली आहे',
+        'Power keeps tripping in {place}, bulb fused again',
+    ]),
+    'पानी/Water/पाणी': (16, 0.2, [
+        'Water leakage from the pipe near {place}',
+        '{place} में पानी नहीं आ रहा, टंकी खाली है',
+        '{place} येथे नळाला पाणी येत नाही',
+        'Tap broken in {place}, water flowing continuously',
+    ]),
+    'सफाई/Cleaning/स्वच्छता': (15, 0.05, [
+        'Garbage not collected near {place} for three days, very dirty',
+        '{place} के पास कचरा पड़ा है, सफाई नहीं हुई',
+        '{place} जवळ घाण आहे, कचरापेटी भरली आहे',
+        'Toilets in {place} are dirty, please clean',
+    ]),
+    'इंटरनेट/Internet': (14, 0.05, [
+        'wifi network keeps dropping in {place}',
+        '{place} में इंटरनेट कनेक्शन बहुत धीमा है',
+        '{place} मध्ये वायफाय चालत नाही',
+        'No internet connection in {place} since yesterday',
+    ]),
+    'सड़क/Road/रस्ता': (8, 0.1, [
+        'Big pothole on the road near {place}',
+        '{place} के सामने सड़क पर गड्ढा है',
+        '{place} समोर रस्ता खराब आहे, खड्डा आहे',
+    ]),
+    'आग/Fire/अग्नी': (1, 0.9, [
+        'Smoke coming from the switch board in {place}, urgent',
+        '{place} में धुआँ निकल रहा है, तुरंत आइए',
+        '{place} मध्ये धूर येत आहे, तात्काळ या',
+    ]),
+    classifier.GENERAL: (28, 0.05, [
+        'Projector in {place} is not working',
+        'Chairs in {place} are broken',
+        '{place} में कुर्सियाँ टूटी हुई हैं',
+        'Noise near {place} late at night',
+        '{place} मध्ये दरवाजा तुटला आहे',
+    ]),
+}
+CATEGORY_NAMES = list(CATEGORY_PROFILES)
+CATEGORY_WEIGHTS = [profile[0] for profile in CATEGORY_PROFILES.values()]
+
+# Spot -> (latitude, longitude); GPS fixes scatter around these
+PLACES = {
+    'Hostel A': (18.5204, 73.8567),
+    'Hostel B': (18.5211, 73.8580),
+    'Girls Hostel': (18.5198, 73.8591),
+    'Library': (18.5190, 73.8552),
+    'Main Building': (18.5183, 73.8569),
+    'Computer Lab': (18.5179, 73.8560),
+    'Mess': (18.5215, 73.8560),
+    'Canteen': (18.5188, 73.8584),
+    'Parking': (18.5170, 73.8575),
+    'Sports Ground': (18.5225, 73.8600),
+}
+PLACE_NAMES = list(PLACES)
+GPS_SHARE = 0.65
+GPS_SPREAD = 0.0008
+
+FIRST_NAMES = ['Aarav', 'Aditi', 'Rahul', 'Sneha', 'Vikram', 'Priya', 'Rohan', 'Pooja', 'Amit', 'Neha', 'Sanket', 'Kavya']
+FEEDBACK = [
+    'Fixed quickly, thank you',
+    'Took too long but resolved',
+    'जल्दी ठीक हुआ, धन्यवाद',
+    'काम झाले, धन्यवाद',
+    'Problem came back after two days',
+]
+RATINGS = [1, 2, 3, 4, 5]
+RATING_WEIGHTS = [5, 8, 17, 35, 35]
+FEEDBACK_SHARE = 0.35
+
+STATUSES = ['pending', 'progress', 'resolved', 'reopened']
+# Status mix by age: fresh complaints are mostly open, old ones resolved
+STATUS_WEIGHTS_BY_AGE = [
+    (2, [70, 25, 5, 0]),
+    (14, [25, 25, 45, 5]),
+    (None, [5, 5, 82, 8]),
+]
+
+
+@contextmanager
+def manual_timestamps(model):
+    """Let bulk_create keep explicit values for auto_now/auto_now_add fields"""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objs):
+    """
+    Insert ``objs`` with one prepared INSERT run through ``executemany``.
+
+    Unlike ``bulk_create`` the statement is not recompiled for every value,
+    which is most of the cost at millions of rows. Primary keys are not set
+    on ``objs``; auto fields are left to the database.
+    """
+    # The connection itself, not the thread-local proxy, for the per-value calls
+    connection = connections[router.db_for_write(model)]
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(model._meta.db_table),
+        ', '.join(qn(f.column) for f in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    rows = [[f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields] for obj in objs]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def complaint_pks(complaint_ids):
+    """``{complaint_id: pk}`` for ``complaint_ids``"""
+    pks = {}
+    for start in range(0, len(complaint_ids), LOOKUP_CHUNK):
+        chunk = complaint_ids[start:start + LOOKUP_CHUNK]
+        pks.update(Complaint.objects.filter(complaint_id__in=chunk).values_list('complaint_id', 'pk'))
+    return pks
+
+
+def seed_users(count, prefix='seed'):
+    """Create (or reuse) ``count`` plain users named ``<prefix>_<n>``"""
+    existing = set(User.objects.filter(username__startswith=f'{prefix}_').values_list('username', flat=True))
+    User.objects.bulk_create([
+        User(username=f'{prefix}_{n}', email=f'{prefix}_{n}@example.com')
+        for n in range(count)
+        if f'{prefix}_{n}' not in existing
+    ], batch_size=BATCH_SIZE)
+    # Earlier runs may have created more users with this prefix
+    users = User.objects.filter(username__startswith=f'{prefix}_').order_by('id')
+    return list(users.values_list('id', flat=True)[:count])
+
+
+def _status(rng, age_days):
+    for max_age, weights in STATUS_WEIGHTS_BY_AGE:
+        if max_age is None or age_days < max_age:
+            return rng.choices(STATUSES, weights)[0]
+
+
+def make_complaint(rng, user_id, now, days):
+    """One unsaved synthetic complaint submitted within the last ``days`` days"""
+    # Skewed towards recent submissions
+    age = timedelta(seconds=days * 86400 * rng.random() ** 1.5)
+    submitted_at = now - age
+    complaint_type = rng.choices(CATEGORY_NAMES, CATEGORY_WEIGHTS)[0]
+    _, high_share, templates = CATEGORY_PROFILES[complaint_type]
+    place = rng.choice(PLACE_NAMES)
+    status = _status(rng, age.days)
+
+    complaint = Complaint(
+        complaint_id=f'CMP{rng.randrange(10 ** 16):016d}',
+        user_id=user_id,
+        complaint_type=complaint_type,
+        urgency=classifier.HIGH if rng.random() < high_share else classifier.NORMAL,
+        location=place,
+        details=rng.choice(templates).format(place=place),
+        name=rng.choice(FIRST_NAMES),
+        roll=str(rng.randrange(1, 121)),
+        status=status,
+        submitted_at=submitted_at,
+        updated_at=submitted_at,
+    )
+    if rng.random() < GPS_SHARE:
+        latitude, longitude = PLACES[place]
+        complaint.latitude = rng.gauss(latitude, GPS_SPREAD)
+        complaint.longitude = rng.gauss(longitude, GPS_SPREAD)
+        complaint.gps_accuracy = round(rng.uniform(5, 50), 1)
+        complaint.geohash = geo.encode(complaint.latitude, complaint.longitude)
+    if status != 'pending':
+        complaint.updated_at = submitted_at + (age * rng.random())
+    if status == 'reopened':
+        complaint.reopened = True
+        complaint.reopen_count = rng.choice([1, 1, 1, 2])
+        complaint.reopen_reason = 'Problem not fixed'
+    elif status == 'resolved' and rng.random() < FEEDBACK_SHARE:
+        complaint.rating = rng.choices(RATINGS, RATING_WEIGHTS)[0]
+        complaint.feedback = rng.choice(FEEDBACK)
+        complaint.feedback_submitted_at = complaint.updated_at
+    if status in ('pending', 'progress') and age.days >= 3:
+        complaint.reminder_sent = rng.random() < 0.8
+    return complaint
+
+
+def complaint_notifications(complaint):
+    """The notifications the views would have sent the owner of ``complaint``"""
+    created_at = complaint.submitted_at
+    notifications = [Notification(
+        user_id=complaint.user_id,
+        complaint_id=complaint.pk,
+        title='Complaint Filed',
+        message=f'Your complaint {complaint.complaint_id} has been submitted successfully.',
+        type='success',
+        read=complaint.status != 'pending',
+        created_at=created_at,
+    )]
+    if complaint.status != 'pending':
+        notifications.append(Notification(
+            user_id=complaint.user_id,
+            complaint_id=complaint.pk,
+            title='Status Updated',
+            message=f'Your complaint {complaint.complaint_id} status changed from pending to {complaint.status}',
+            type='info',
+            read=complaint.status == 'resolved',
+            created_at=complaint.updated_at,
+        ))
+    return notifications
+
+
+def seed_complaints(user_ids, count, days=365, rng=None, notifications=False, progress=None):
+    """
+    Bulk insert ``count`` complaints spread over the last ``days`` days.
+
+    With ``notifications``, also insert the filed/status notifications for
+    each one. ``progress(done)`` is called after every batch.
+    """
+    rng = rng or random.Random()
+    now = timezone.now()
+    for start in range(0, count, BATCH_SIZE):
+        batch = [
+            make_complaint(rng, rng.choice(user_ids), now, days)
+            for _ in range(min(BATCH_SIZE, count - start))
+        ]
+        with transaction.atomic():
+            bulk_insert(Complaint, batch)
+            if notifications:
+                pks = complaint_pks([c.complaint_id for c in batch])
+                for complaint in batch:
+                    complaint.pk = pks[complaint.complaint_id]
+                bulk_insert(Notification, [n for c in batch for n in complaint_notifications(c)])
+        if progress:
+            progress(start + len(batch))
+    return count
+
+
+def seed_notifications(user_ids, count, days=30, rng=None):
+    """Bulk insert ``count`` notifications, roughly a third of them unread"""
+    rng = rng or random.Random()
+    now = timezone.now()
+    with manual_timestamps(Notification):
+        for start in range(0, count, BATCH_SIZE):
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=rng.choice(user_ids),
+                    title='Status Updated',
+                    message='Synthetic notification',
+                    read=rng.random() > 0.3,
+                    created_at=now - timedelta(seconds=rng.randrange(days * 86400)),
+                )
+                for _ in range(min(BATCH_SIZE, count - start))
+            ])
+    return count
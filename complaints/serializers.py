@@ -0,0 +1,78 @@
+"""JSON serialization helpers for complaint API responses"""
+
+
+def serialize_file(f):
+    """Serialize a ComplaintFile for the complaint JSON"""
+    return {
+        'id': f.id,
+        'name': f.name,
+        'url': f.file.url if f.file else None,
+        'thumb_url': f.blob.thumbnail.url if f.blob_id and f.blob.thumbnail else None,
+        'size': f.size,
+        'type': f.file.name.split('.')[-1] if f.file else 'unknown'
+    }
+
+
+# Output field -> (value getter, model columns needed to compute it)
+COMPLAINT_FIELDS = {
+    'id': (lambda c: c.complaint_id, ['complaint_id']),
+    'complaint_type': (lambda c: c.complaint_type, ['complaint_type']),
+    'urgency': (lambda c: c.urgency, ['urgency']),
+    'location': (lambda c: c.location, ['location']),
+    'details': (lambda c: c.details, ['details']),
+    'name': (lambda c: c.name, ['name']),
+    'roll': (lambda c: c.roll, ['roll']),
+    'status': (lambda c: c.status, ['status']),
+    'submitted_at': (lambda c: c.submitted_at.isoformat(), ['submitted_at']),
+    'updated_at': (lambda c: c.updated_at.isoformat(), ['updated_at']),
+    'files': (lambda c: [serialize_file(f) for f in c.files.all()], []),
+    'has_gps': (lambda c: bool(c.latitude and c.longitude), ['latitude', 'longitude']),
+    'latitude': (lambda c: c.latitude, ['latitude']),
+    'longitude': (lambda c: c.longitude, ['longitude']),
+    'gps_accuracy': (lambda c: c.gps_accuracy, ['gps_accuracy']),
+    'rating': (lambda c: c.rating, ['rating']),
+    'feedback': (lambda c: c.feedback, ['feedback']),
+    'reopened': (lambda c: c.reopened, ['reopened']),
+    'reopen_reason': (lambda c: c.reopen_reason, ['reopen_reason']),
+    'duplicate_of': (
+        lambda c: c.duplicate_of.complaint_id if c.duplicate_of_id else None,
+        ['duplicate_of__complaint_id']
+    ),
+    'user_name': (lambda c: c.user.username, ['user__username']),
+    'user_email': (lambda c: c.user.email, ['user__email']),
+}
+
+
+def parse_fields(raw):
+    """Parse a comma separated ``fields=`` value, returning None for all fields"""
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in COMPLAINT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def complaint_queryset(queryset, fields=None):
+    """Restrict columns and attach related rows needed to serialize ``fields``"""
+    fields = fields or list(COMPLAINT_FIELDS)
+    if 'user_name' in fields or 'user_email' in fields:
+        queryset = queryset.select_related('user')
+    if 'duplicate_of' in fields:
+        queryset = queryset.select_related('duplicate_of')
+    if 'files' in fields:
+        queryset = queryset.prefetch_related('files__blob')
+    if len(fields) < len(COMPLAINT_FIELDS):
+        # Always keep the keyset columns so cursors can be built from any projection
+        columns = {'submitted_at'}
+        for name in fields:
+            columns.update(COMPLAINT_FIELDS[name][1])
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+def serialize_complaint(c, fields=None):
+    """Serialize a Complaint, optionally projected to ``fields``"""
+    fields = fields or COMPLAINT_FIELDS
+    return {name: COMPLAINT_FIELDS[name][0](c) for name in fields}
@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import blobstore, caching, thumbnails
+from .models import Blob, ComplaintFile
+from .notifications import invalidate_admin_ids
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_admin_ids(sender, instance, update_fields=None, **kwargs):
+    """Drop the cached admin list whenever an admin may have been added or removed"""
+    # Logins only touch last_login; don't throw the cache away for those
+    if update_fields and 'is_superuser' not in update_fields:
+        return
+    invalidate_admin_ids()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reset_user_counts(sender, instance, created=True, **kwargs):
+    """Admin dashboards show the number of accounts"""
+    if created:
+        caching.users_changed()
+
+
+@receiver(post_delete, sender=ComplaintFile)
+def release_blob(sender, instance, **kwargs):
+    """Drop the attachment's blob reference; unreferenced blobs are collected on commit"""
+    if instance.blob_id:
+        blobstore.release(instance.blob_id)
+
+
+@receiver(post_save, sender=Blob)
+def queue_thumbnail(sender, instance, created, **kwargs):
+    if created and thumbnails.is_image(instance.file.name):
+        thumbnails.schedule(instance.pk)
@@ -0,0 +1,253 @@
+"""
+Materialized complaint counters for the dashboards.
+
+Every write path in ``views.py`` and ``bulk.py`` reports how a complaint's
+contribution to the counters changed (see ``contribution`` and ``record``)
+inside the transaction that writes the complaint, and the global and
+per-user ``ComplaintStats`` rows are adjusted in place. Dashboard reads
+are then a primary-key lookup instead of a scan.
+
+There are no model signals: ``post_save`` can't see what a row held
+before. Writes that bypass these paths leave the counters stale until
+``manage.py rebuild_complaint_stats`` recomputes every row from scratch,
+so run it after editing or deleting complaints in the admin site, from
+the shell, or through cascades (deleting a user).
+
+The global row (no user) is created by migration 0013 and kept unique by
+a constraint; every write locks it first, which is what serializes
+``record_many`` and ``rebuild``.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .models import Complaint, ComplaintFile, ComplaintStats
+
+COUNTERS = [
+    'total', 'pending', 'progress', 'resolved', 'reopened',
+    'high_urgency', 'with_files', 'rating_sum', 'rating_count',
+]
+
+
+def contribution(complaint, has_files=False):
+    """Return what a single complaint adds to its scope's counters"""
+    values = dict.fromkeys(COUNTERS, 0)
+    values['total'] = 1
+    if complaint.status in values:
+        values[complaint.status] = 1
+    if complaint.urgency == 'High':
+        values['high_urgency'] = 1
+    if has_files:
+        values['with_files'] = 1
+    if complaint.rating is not None:
+        values['rating_sum'] = int(complaint.rating)
+        values['rating_count'] = 1
+    values['categories'] = {complaint.complaint_type: 1}
+    return values
+
+
+def record(user_id, before=None, after=None):
+    """
+    Apply the change from ``before`` to ``after`` to the global and user rows.
+
+    Pass only ``after`` for a new complaint and only ``before`` for a deleted
+    one. Rows are locked while they are updated so concurrent requests do
+    not lose increments.
+    """
+    record_many([(user_id, before, after)])
+
+
+def record_many(changes):
+    """
+    Apply a list of ``(user_id, before, after)`` changes, as ``record`` does.
+
+    Changes are summed per scope first and the counter rows are locked,
+    created and written together, so a batch costs the same few queries
+    however many complaints and owners it touches.
+    """
+    deltas = {}
+    for user_id, before, after in changes:
+        before = before or {}
+        after = after or {}
+        for scope in (None, user_id):
+            delta, categories = deltas.setdefault(scope, (dict.fromkeys(COUNTERS, 0), {}))
+            for name in COUNTERS:
+                delta[name] += after.get(name, 0) - before.get(name, 0)
+            for name, count in after.get('categories', {}).items():
+                categories[name] = categories.get(name, 0) + count
+            for name, count in before.get('categories', {}).items():
+                categories[name] = categories.get(name, 0) - count
+
+    changed = {}
+    for scope, (delta, categories) in deltas.items():
+        categories = {name: count for name, count in categories.items() if count}
+        if any(delta.values()) or categories:
+            changed[scope] = (delta, categories)
+    if not changed:
+        return
+
+    # Only the columns that move; bulk_update builds a CASE per column and row
+    fields = [name for name in COUNTERS if any(delta[name] for delta, _ in changed.values())]
+    if any(categories for _, categories in changed.values()):
+        fields.append('categories')
+    now = timezone.now()
+    with transaction.atomic():
+        rows = _locked_rows(changed)
+        for scope, (delta, categories) in changed.items():
+            stats = rows[scope]
+            for name, change in delta.items():
+                setattr(stats, name, getattr(stats, name) + change)
+            for name, change in categories.items():
+                count = stats.categories.get(name, 0) + change
+                if count > 0:
+                    stats.categories[name] = count
+                else:
+                    stats.categories.pop(name, None)
+            # bulk_update skips auto_now
+            stats.updated_at = now
+        ComplaintStats.objects.bulk_update(rows.values(), fields + ['updated_at'], batch_size=500)
+
+
+def _locked_rows(scopes):
+    """
+    Lock the counter rows of ``scopes``, creating the missing ones.
+
+    The global row is locked first, then users in id order, so concurrent
+    batches lock alike.
+    """
+    rows = {}
+    if None in scopes:
+        rows[None] = _locked_global_row()
+    user_ids = sorted(scope for scope in scopes if scope is not None)
+    if not user_ids:
+        return rows
+    locked = ComplaintStats.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+    rows.update((stats.user_id, stats) for stats in locked)
+    missing = [user_id for user_id in user_ids if user_id not in rows]
+    if missing:
+        # A concurrent batch may create some of them first; take those as they are
+        ComplaintStats.objects.bulk_create([ComplaintStats(user_id=user_id) for user_id in missing], ignore_conflicts=True)
+        locked = ComplaintStats.objects.select_for_update().filter(user_id__in=missing).order_by('user_id')
+        rows.update((stats.user_id, stats) for stats in locked)
+    return rows
+
+
+def _locked_global_row():
+    try:
+        return ComplaintStats.objects.select_for_update().get(user_id=None)
+    except ComplaintStats.DoesNotExist:
+        # Only after a flush; the unique constraint lets one concurrent create win
+        return ComplaintStats.objects.select_for_update().get_or_create(user_id=None)[0]
+
+
+def get_stats(user=None):
+    """Read the counters for ``user``, or the global counters when None"""
+    stats = ComplaintStats.objects.filter(user=user).first()
+    return (stats or ComplaintStats(user=user)).as_dict()
+
+
+async def aget_stats(user=None):
+    stats = await ComplaintStats.objects.filter(user=user).afirst()
+    return (stats or ComplaintStats(user=user)).as_dict()
+
+
+def compute_stats(complaints, per_user=False):
+    """
+    Count the counters of a complaint queryset straight from the table.
+
+    All counters come from one conditional aggregate and the category
+    histogram from one grouped query, so the cost is two queries whatever
+    the number of rows. Returns an unsaved ``ComplaintStats`` (``as_dict()``
+    is the dashboard payload), or with ``per_user`` a ``{user_id:
+    ComplaintStats}`` mapping from the same two queries grouped by owner.
+    """
+    complaints = complaints.order_by()
+    counters = dict(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        progress=Count('id', filter=Q(status='progress')),
+        resolved=Count('id', filter=Q(status='resolved')),
+        reopened=Count('id', filter=Q(status='reopened')),
+        high_urgency=Count('id', filter=Q(urgency='High')),
+        with_files=Count('id', filter=Q(has_files=True)),
+        rating_sum=Sum('rating', default=0),
+        rating_count=Count('rating'),
+    )
+    annotated = complaints.annotate(has_files=Exists(ComplaintFile.objects.filter(complaint=OuterRef('pk'))))
+
+    if not per_user:
+        stats = ComplaintStats(**annotated.aggregate(**counters))
+        stats.categories = dict(complaints.values_list('complaint_type').annotate(count=Count('id')))
+        return stats
+
+    result = {}
+    for row in annotated.values('user').annotate(**counters):
+        user_id = row.pop('user')
+        result[user_id] = ComplaintStats(user_id=user_id, **row)
+    for user_id, complaint_type, count in complaints.values_list('user', 'complaint_type').annotate(count=Count('id')):
+        result[user_id].categories[complaint_type] = count
+    return result
+
+
+def compute_all():
+    """
+    Recompute every scope's counters from the complaint table.
+
+    Returns a ``{user_id: ComplaintStats}`` mapping (``None`` for the global
+    row): the per-user rows of ``compute_stats``, summed for the global one.
+    """
+    result = compute_stats(Complaint.objects.all(), per_user=True)
+    total = ComplaintStats(user_id=None)
+    for stats in result.values():
+        for name in COUNTERS:
+            setattr(total, name, getattr(total, name) + getattr(stats, name))
+        for name, count in stats.categories.items():
+            total.categories[name] = total.categories.get(name, 0) + count
+    result[None] = total
+    return result
+
+
+def drift(fresh, current):
+    """``{user_id: [field, ...]}`` for the rows of ``current`` that differ from ``fresh``"""
+    drifted = {}
+    for user_id in fresh.keys() | current.keys():
+        new = fresh.get(user_id) or ComplaintStats(user_id=user_id)
+        old = current.get(user_id) or ComplaintStats(user_id=user_id)
+        fields = [name for name in COUNTERS + ['categories'] if getattr(new, name) != getattr(old, name)]
+        if fields:
+            drifted[user_id] = fields
+    return drifted
+
+
+def rebuild():
+    """
+    Recompute every counter row and correct the drifted ones in place.
+
+    The counter rows are locked (global row first, as ``record_many`` does)
+    before the complaint table is counted, so an increment either lands
+    before the count and is included, or waits and applies on top of the
+    corrected row. Returns ``drift()`` of the rows before the rebuild.
+    """
+    with transaction.atomic():
+        locked = ComplaintStats.objects.select_for_update().order_by(F('user_id').asc(nulls_first=True))
+        current = {stats.user_id: stats for stats in locked}
+        if None not in current:
+            current[None] = _locked_global_row()
+        fresh = compute_all()
+        drifted = drift(fresh, current)
+
+        updated, created = [], []
+        now = timezone.now()
+        for user_id, fields in drifted.items():
+            new = fresh.get(user_id) or ComplaintStats(user_id=user_id)
+            stats = current.get(user_id)
+            if stats is None:
+                created.append(new)
+                continue
+            for name in COUNTERS + ['categories']:
+                setattr(stats, name, getattr(new, name))
+            stats.updated_at = now
+            updated.append(stats)
+        ComplaintStats.objects.bulk_update(updated, COUNTERS + ['categories', 'updated_at'], batch_size=500)
+        ComplaintStats.objects.bulk_create(created, batch_size=1000)
+    return drifted
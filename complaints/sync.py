@@ -0,0 +1,109 @@
+"""
+Delta sync for clients that already hold a copy of their complaints.
+
+``changes`` returns what happened after a watermark: complaints whose
+``updated_at`` is newer, ids deleted since (from ``ComplaintTombstone``),
+and new notifications, plus the watermark for the next call. Watermarks
+trail the server clock by SKEW so rows committed by transactions that
+were still open are not skipped; clients upsert by id, so the overlap is
+harmless. When too much changed (more than MAX_CHANGES complaints,
+deletions and notifications together), or the watermark predates the
+tombstone retention, the reply asks for a full reload instead.
+"""
+import base64
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Complaint, ComplaintTombstone, Notification
+from .serializers import complaint_queryset, serialize_complaint
+
+SKEW = timedelta(seconds=5)
+TOMBSTONE_RETENTION = timedelta(days=30)
+MAX_CHANGES = 1000
+
+
+def encode_watermark(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def decode_watermark(raw):
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(raw.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid watermark')
+
+
+def record_deletion(complaint):
+    """Leave a tombstone for a complaint about to be deleted"""
+    record_deletions([complaint])
+
+
+def record_deletions(complaints):
+    """Leave tombstones for complaints about to be deleted, in a constant number of queries"""
+    now = timezone.now()
+    ComplaintTombstone.objects.bulk_create([
+        ComplaintTombstone(complaint_id=c.complaint_id, user_id=c.user_id) for c in complaints
+    ])
+    # Duplicates lose their link when the complaint goes; let syncs see that
+    Complaint.objects.filter(duplicate_of__in=[c.pk for c in complaints]).update(
+        duplicate_of=None, updated_at=now
+    )
+    ComplaintTombstone.objects.filter(deleted_at__lt=now - TOMBSTONE_RETENTION).delete()
+
+
+def serialize_notification(n):
+    return {
+        'id': n.id,
+        'title': n.title,
+        'message': n.message,
+        'type': n.type,
+        'read': n.read,
+        'complaint_id': n.complaint.complaint_id if n.complaint else None,
+        'created_at': n.created_at.isoformat(),
+    }
+
+
+def changes(user, since=None, fields=None):
+    """Payload of everything ``user`` can see that changed after ``since``"""
+    now = timezone.now()
+    watermark = encode_watermark(now - SKEW)
+    if since is None or since < now - TOMBSTONE_RETENTION:
+        return {'success': True, 'reset': True, 'watermark': watermark}
+
+    complaints = Complaint.objects.all()
+    tombstones = ComplaintTombstone.objects.filter(deleted_at__gt=since)
+    if not user.is_superuser:
+        complaints = complaints.filter(user=user)
+        tombstones = tombstones.filter(user=user)
+
+    # Complaints, deletions and notifications share one MAX_CHANGES budget;
+    # each read takes one row more than is left of it to detect overflow
+    reset = {'success': True, 'reset': True, 'watermark': watermark}
+    updated = list(
+        complaint_queryset(complaints.filter(updated_at__gt=since), fields)
+        .order_by('updated_at', 'id')[:MAX_CHANGES + 1]
+    )
+    if len(updated) > MAX_CHANGES:
+        return reset
+
+    left = MAX_CHANGES - len(updated)
+    deleted = list(tombstones.order_by('deleted_at', 'id').values_list('complaint_id', flat=True)[:left + 1])
+    if len(deleted) > left:
+        return reset
+
+    left -= len(deleted)
+    notifications = list(Notification.objects.filter(
+        user=user, created_at__gt=since
+    ).select_related('complaint').order_by('created_at', 'id')[:left + 1])
+    if len(notifications) > left:
+        return reset
+
+    return {
+        'success': True,
+        'reset': False,
+        'watermark': watermark,
+        'complaints': [serialize_complaint(c, fields) for c in updated],
+        'deleted': deleted,
+        'notifications': [serialize_notification(n) for n in notifications],
+    }
@@ -1,3 +1,706 @@
-from django.test import TestCase
+"""
+Endpoint benchmarks with query-count, latency and memory budgets.
 
-# Create your tests here.
+Every URL in ``complaints/urls.py`` is driven through the test client
+against datasets built by ``seeding.seed_complaints``, one test class per
+size in COMPLAINTS_BENCH_SIZES (comma separated; 1000 and 10000 by
+default, add 100000,1000000 before a deploy). The dataset is committed
+before the class starts and flushed after it. Each request is measured
+twice inside a rolled back savepoint, with an empty API cache: once for
+wall time and the number of queries, once under ``tracemalloc`` for peak
+Python memory. A table of the results is printed per size.
+
+Query budgets are the same at every size, so an N+1 in ``views.py``
+fails on the smallest dataset. Latency and memory budgets only apply to
+endpoints whose work is bounded by a page size; those that scan every
+complaint (``scans``) are measured but not held to them, and the ones
+that also return every row (``unbounded``) are skipped above
+UNBOUNDED_MAX_SIZE. COMPLAINTS_BENCH_TIME_FACTOR scales the latency
+budgets for slow machines.
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Optional
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, duplicates, export, geo, geocoding, metrics, profiling, reminders, seeding, stats, sync, urls, views
+from .models import Complaint, ComplaintStats, ComplaintTombstone, Notification
+
+BENCH_SIZES = [int(n) for n in os.environ.get('COMPLAINTS_BENCH_SIZES', '1000,10000').split(',') if n.strip()]
+TIME_FACTOR = float(os.environ.get('COMPLAINTS_BENCH_TIME_FACTOR', 1))
+UNBOUNDED_MAX_SIZE = 100000
+PASSWORD = 'bench-password'
+# Complaints owned by the regular user, whatever the dataset size
+OWN_COMPLAINTS = 20
+
+
+@dataclass
+class Case:
+    name: str
+    url_name: str
+    max_queries: int
+    user: Optional[str] = 'user'
+    method: str = 'get'
+    # Query string for GET, JSON body for POST; a callable gets the test case
+    data: object = None
+    prepare: Optional[Callable] = None
+    multipart: bool = False
+    status: int = 200
+    max_ms: float = 250
+    max_memory_kb: int = 2048
+    scans: bool = False
+    unbounded: bool = False
+
+
+def _other_complaints(test, count=100):
+    return list(Complaint.objects.exclude(user=test.user).order_by('-id').values_list('complaint_id', flat=True)[:count])
+
+
+def _leave_overdue(test, count=20):
+    # Constant work per sweep: everything else overdue is already reminded
+    overdue = reminders.overdue_complaints(timezone.now())
+    keep = list(overdue.order_by('submitted_at').values_list('pk', flat=True)[:count])
+    overdue.exclude(pk__in=keep).update(reminder_sent=True)
+
+
+CASES = [
+    Case('home', 'home', 0, user=None),
+    Case('login_page', 'login', 0, user=None, status=302),
+    Case('register_page', 'register', 0, user=None, status=302),
+    Case('logout', 'logout', 4),
+    Case('api_login', 'api_login', 12, user=None, method='post',
+         data=lambda test: {'username': test.user.username, 'password': PASSWORD}),
+    Case('api_register', 'api_register', 14, user=None, method='post',
+         data={'username': 'bench_new', 'email': 'bench_new@example.com', 'password': PASSWORD}),
+    Case('submit_complaint', 'submit_complaint', 16, method='post',
+         data={'details': 'Water leakage from the pipe near Hostel A', 'location': 'Hostel A', 'name': 'Bench'}),
+    Case('upload_complaint_files', 'upload_complaint_files', 17, method='post', multipart=True,
+         data=lambda test: {'complaint_id': test.own.complaint_id}),
+    Case('get_complaints_user', 'get_complaints', 5, data={'limit': 50}),
+    Case('get_complaints_admin', 'get_complaints', 5, user='admin', data={'limit': 50}),
+    Case('search_complaints', 'search_complaints', 5, user='admin', data={'q': 'water pipe'}),
+    # Ordering by distance reads every complaint in the covering cells
+    Case('get_nearby_complaints', 'get_nearby_complaints', 4, user='admin',
+         data={'lat': 18.5204, 'lon': 73.8567, 'radius': 100}, scans=True),
+    Case('get_complaint_hotspots', 'get_complaint_hotspots', 4, user='admin', data={'precision': '6,7'}, scans=True),
+    Case('reverse_geocode', 'reverse_geocode', 3, data={'lat': 18.5204, 'lon': 73.8567}),
+    Case('classify_complaint', 'classify_complaint', 2, method='post', data={'text': 'No electricity in hostel'}),
+    Case('update_status', 'update_status', 14, user='admin', method='post',
+         data=lambda test: {'complaint_id': test.own.complaint_id, 'status': 'progress'}),
+    Case('delete_complaint', 'delete_complaint', 18, user='admin', method='post',
+         data=lambda test: {'complaint_id': test.own.complaint_id}),
+    Case('bulk_update_status', 'bulk_update_status', 14, user='admin', method='post',
+         data=lambda test: {'complaint_ids': _other_complaints(test), 'status': 'progress'},
+         max_ms=500, max_memory_kb=4096),
+    # One more counter UPDATE once the ids span more owners than SQLite binds per statement
+    Case('bulk_delete_complaints', 'bulk_delete_complaints', 19, user='admin', method='post',
+         data=lambda test: {'complaint_ids': _other_complaints(test)},
+         max_ms=500, max_memory_kb=4096),
+    Case('submit_feedback', 'submit_feedback', 15, method='post',
+         data=lambda test: {'complaint_id': test.own.complaint_id, 'rating': 5, 'feedback': 'Fixed'}),
+    Case('reopen_complaint', 'reopen_complaint', 15, method='post',
+         data=lambda test: {'complaint_id': test.own.complaint_id, 'reason': 'Still broken'}),
+    Case('sync_changes', 'sync_changes', 6,
+         data=lambda test: {'since': sync.encode_watermark(timezone.now() - timedelta(days=7))}),
+    Case('get_notifications', 'get_notifications', 4),
+    Case('notification_stream', 'notification_stream', 2, status=501),
+    Case('mark_notification_read', 'mark_notification_read', 4, method='post',
+         data=lambda test: {'notification_id': Notification.objects.filter(user=test.user).values_list('id', flat=True).first()}),
+    Case('get_dashboard_stats_user', 'get_dashboard_stats', 4),
+    Case('get_dashboard_stats_admin', 'get_dashboard_stats', 6, user='admin'),
+    Case('get_admin_data', 'get_admin_data', 8, user='admin', scans=True, unbounded=True),
+    Case('export_complaints', 'export_complaints', 3, user='admin', data={'format': 'csv'}, scans=True,
+         max_memory_kb=16384),
+    Case('get_duplicate_clusters', 'get_duplicate_clusters', 3, user='admin'),
+    Case('get_cache_stats', 'get_cache_stats', 2, user='admin'),
+    Case('get_request_metrics', 'get_request_metrics', 2, user='admin'),
+    # Sums every series in the registry, so bounded by views rather than rows
+    Case('metrics', 'metrics', 2, user='admin'),
+    # An admin batch job rather than a page load
+    Case('check_reminders', 'check_reminders', 13, user='admin', prepare=_leave_overdue, max_ms=1000),
+    Case('get_user_session', 'get_user_session', 2),
+]
+
+
+@dataclass
+class Measurement:
+    status: int
+    queries: int
+    ms: float
+    memory_kb: int
+    sql: list = field(default_factory=list)
+
+
+class EndpointBenchmarkMixin:
+    size = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media_root = tempfile.mkdtemp()
+        cls._settings = override_settings(
+            MEDIA_ROOT=cls._media_root,
+            SECURE_SSL_REDIRECT=False,
+            GEOCODE_NOMINATIM_URL='',
+            THUMBNAIL_WORKERS=0,
+            # Hashing cost is not what these budgets are about
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        )
+        cls._settings.enable()
+        cls.results = {}
+        # Seeded before the class transaction opens and flushed afterwards:
+        # SQLite's FTS index slows every insert of one long transaction down
+        try:
+            cls.seed()
+            super().setUpClass()
+        except Exception:
+            cls._cleanup()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._cleanup()
+        cls.report()
+
+    @classmethod
+    def _cleanup(cls):
+        call_command('flush', verbosity=0, interactive=False)
+        cls._settings.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+
+    @classmethod
+    def seed(cls):
+        started = time.monotonic()
+        user_ids = seeding.seed_users(max(cls.size // 100, 10), prefix='bench')
+        seeding.seed_complaints(user_ids, cls.size, rng=random.Random(cls.size), notifications=True)
+        cls.admin = User.objects.create_superuser('bench_admin', 'admin@example.com', PASSWORD)
+        cls.user = User.objects.create_user('bench_user', 'user@example.com', PASSWORD)
+        seeding.seed_complaints([cls.user.pk], OWN_COMPLAINTS, days=30, rng=random.Random(0), notifications=True)
+        stats.rebuild()
+        cls.own = Complaint.objects.filter(user=cls.user).order_by('-submitted_at').first()
+        # The process-wide index may hold rows of an earlier dataset
+        duplicates.index = duplicates.DuplicateIndex()
+        duplicates.index.rebuild()
+        cls.seed_seconds = time.monotonic() - started
+
+    @classmethod
+    def report(cls):
+        out = sys.stdout
+        out.write(f'\n{connection.vendor}, {cls.size} complaints (seeded in {cls.seed_seconds:.1f}s)\n')
+        out.write(f"  {'endpoint':<28}{'status':>7}{'queries':>9}{'ms':>10}{'peak KB':>10}\n")
+        for name, m in cls.results.items():
+            out.write(f'  {name:<28}{m.status:>7}{m.queries:>9}{m.ms:>10.1f}{m.memory_kb:>10}\n')
+
+    def _request(self, case):
+        if case.prepare:
+            case.prepare(self)
+        data = case.data(self) if callable(case.data) else case.data
+        path = reverse(case.url_name)
+        if case.method == 'get':
+            return lambda: self.client.get(path, data)
+        if case.multipart:
+            return lambda: self.client.post(
+                path, {**data, 'files': SimpleUploadedFile('bench.txt', b'bench attachment')}
+            )
+        body = json.dumps(data)
+        return lambda: self.client.post(path, body, content_type='application/json')
+
+    @staticmethod
+    def _consume(response):
+        # Streamed bodies are read and dropped, as a client would
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.content
+        return response
+
+    def measure(self, case):
+        if case.user:
+            self.client.force_login(getattr(self, case.user))
+        cache.clear()
+        with transaction.atomic():
+            send = self._request(case)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self._consume(send())
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        # Read now: the next request's request_started signal resets the query log
+        sql = [q['sql'] for q in queries.captured_queries]
+
+        cache.clear()
+        with transaction.atomic():
+            send = self._request(case)
+            tracemalloc.start()
+            try:
+                self._consume(send())
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            transaction.set_rollback(True)
+
+        return Measurement(
+            status=response.status_code,
+            queries=len(sql),
+            ms=elapsed * 1000,
+            memory_kb=peak // 1024,
+            sql=sql,
+        )
+
+    def check(self, case):
+        if case.unbounded and self.size > UNBOUNDED_MAX_SIZE:
+            self.skipTest(f'{case.name} returns every complaint; measured up to {UNBOUNDED_MAX_SIZE}')
+        m = self.measure(case)
+        self.results[case.name] = m
+
+        self.assertEqual(m.status, case.status, f'{case.name} answered {m.status}')
+        self.assertLessEqual(
+            m.queries, case.max_queries,
+            f'{case.name} ran {m.queries} queries (budget {case.max_queries}):\n' + '\n'.join(m.sql)
+        )
+        if not case.scans:
+            self.assertLessEqual(
+                m.ms, case.max_ms * TIME_FACTOR,
+                f'{case.name} took {m.ms:.0f} ms (budget {case.max_ms * TIME_FACTOR:.0f})'
+            )
+        if not case.unbounded:
+            self.assertLessEqual(
+                m.memory_kb, case.max_memory_kb,
+                f'{case.name} peaked at {m.memory_kb} KB (budget {case.max_memory_kb})'
+            )
+
+
+def _benchmark(case):
+    def test(self):
+        self.check(case)
+    test.__doc__ = f'{case.name} stays within its budgets'
+    return test
+
+
+for _case in CASES:
+    setattr(EndpointBenchmarkMixin, f'test_{_case.name}', _benchmark(_case))
+
+for _size in BENCH_SIZES:
+    _name = f'EndpointBenchmark{_size}'
+    globals()[_name] = type(_name, (EndpointBenchmarkMixin, TestCase), {'size': _size})
+
+
+class EndpointCoverageTests(SimpleTestCase):
+    def test_every_url_has_a_case(self):
+        covered = {case.url_name for case in CASES}
+        missing = [p.name for p in urls.urlpatterns if p.name not in covered]
+        self.assertEqual(missing, [], 'Add a Case with budgets for every new endpoint')
+
+
+@override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=0, SECURE_SSL_REDIRECT=False)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        profiling.reset()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def tearDown(self):
+        profiling.reset()
+
+    def test_server_timing_counts_queries(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get_cache_stats'))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertNotIn('dup;', timing)
+
+        endpoint = profiling.metrics()['endpoints']['get_cache_stats']
+        self.assertEqual(endpoint['requests'], 1)
+        self.assertEqual(endpoint['queries'], len(queries))
+        self.assertEqual(endpoint['bytes'], len(response.content))
+
+    def test_repeated_queries_are_flagged(self):
+        def n_plus_one(request):
+            for pk in range(profiling.DUPLICATE_THRESHOLD):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse('ok')
+
+        with self.assertLogs('complaints.profiling', 'WARNING'):
+            response = profiling.ProfilingMiddleware(n_plus_one)(RequestFactory().get('/loop/'))
+        self.assertIn(f'dup;desc="{profiling.DUPLICATE_THRESHOLD} repeated queries"', response['Server-Timing'])
+        [sample] = profiling.metrics()['repeated_queries']
+        self.assertEqual(sample['endpoint'], '<unresolved>')
+        self.assertEqual(sample['times'], profiling.DUPLICATE_THRESHOLD)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        user = User.objects.create_user('user', 'user@example.com', 'x')
+        self.client.force_login(user)
+        self.assertFalse(self.client.get(reverse('get_request_metrics')).json()['success'])
+        self.client.force_login(self.admin)
+        data = self.client.get(reverse('get_request_metrics')).json()
+        self.assertTrue(data['enabled'])
+        self.assertIn('get_request_metrics', data['endpoints'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_exposition_format(self):
+        metrics.COMPLAINTS_SUBMITTED.inc(urgency='High')
+        metrics.COMPLAINTS_SUBMITTED.inc(urgency='High')
+        metrics.NOTIFICATION_FANOUT.observe(3)
+        metrics.NOTIFICATION_FANOUT.observe(40)
+        text = metrics.exposition()
+        self.assertIn('# TYPE complaints_submitted_total counter', text)
+        self.assertIn('complaints_submitted_total{urgency="High"} 2.0', text)
+        self.assertIn('complaints_notification_fanout_bucket{le="2.0"} 0', text)
+        self.assertIn('complaints_notification_fanout_bucket{le="5.0"} 1', text)
+        self.assertIn('complaints_notification_fanout_bucket{le="+Inf"} 2', text)
+        self.assertIn('complaints_notification_fanout_sum 43.0', text)
+        self.assertIn('complaints_notification_fanout_count 2.0', text)
+        with self.assertRaises(ValueError):
+            metrics.COMPLAINTS_SUBMITTED.inc(category='Water')
+
+    def test_multiprocess_files_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            metrics.reset()
+            metrics.REMINDERS_SENT.inc(2)
+            # Another worker's file, grown past its initial size
+            other = metrics._FileValues(os.path.join(directory, '1.db'))
+            other.add([(metrics._key('unregistered', '', (f'{n:0>200}',)), 1) for n in range(400)])
+            other.add([(metrics._key(metrics.REMINDERS_SENT.name, '', ()), 5)])
+            other.close()
+            self.assertIn('complaints_reminders_sent_total 7.0', metrics.exposition())
+
+            # Reopening a file keeps its values
+            other = metrics._FileValues(os.path.join(directory, '1.db'))
+            other.add([(metrics._key(metrics.REMINDERS_SENT.name, '', ()), 1)])
+            other.close()
+            self.assertIn('complaints_reminders_sent_total 8.0', metrics.exposition())
+
+    @override_settings(SECURE_SSL_REDIRECT=False, MEDIA_ROOT=tempfile.gettempdir(), GEOCODE_NOMINATIM_URL='')
+    def test_requests_and_submissions_are_counted(self):
+        user = User.objects.create_user('user', 'user@example.com', 'x')
+        self.client.force_login(user)
+        self.client.post(reverse('submit_complaint'), json.dumps({
+            'details': 'Smoke coming from the switch board, urgent', 'location': 'Library',
+        }), content_type='application/json')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('complaints_submitted_total{urgency="High"} 1.0', text)
+        self.assertIn('complaints_http_requests_total{view="submit_complaint",method="POST",status="200"} 1.0', text)
+        self.assertIn('complaints_http_request_duration_seconds_count{view="submit_complaint",method="POST"} 1.0', text)
+        self.assertIn('complaints_notification_fanout_count 1.0', text)
+
+    @override_settings(SECURE_SSL_REDIRECT=False, METRICS_TOKEN='secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+
+    @override_settings(SECURE_SSL_REDIRECT=False, METRICS_TOKEN='')
+    def test_admins_only_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '}).status_code, 401)
+        self.client.force_login(User.objects.create_user('user', 'user@example.com', 'x'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class ComplaintStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'user@example.com', 'x')
+
+    def _complaint(self, **fields):
+        complaint = Complaint.objects.create(user=self.user, complaint_type='General', location='Library', details='x', **fields)
+        stats.record(self.user.pk, after=stats.contribution(complaint))
+        return complaint
+
+    def test_one_global_row(self):
+        # Seeded by migration 0013, or recreated by the first write after a flush
+        self._complaint()
+        self.assertEqual(ComplaintStats.objects.filter(user=None).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ComplaintStats.objects.create(user=None)
+        self._complaint()
+        self.assertEqual(stats.get_stats()['total'], 2)
+
+    def test_rebuild_corrects_drift_in_place(self):
+        self._complaint(urgency='High')
+        self._complaint()
+        global_pk = ComplaintStats.objects.get(user=None).pk
+        ComplaintStats.objects.filter(user=self.user).update(total=7)
+        Complaint.objects.filter(urgency='Normal').delete()
+
+        drifted = stats.rebuild()
+        self.assertEqual(set(drifted), {None, self.user.pk})
+        self.assertEqual(ComplaintStats.objects.get(user=None).pk, global_pk)
+        self.assertEqual(stats.get_stats()['total'], 1)
+        self.assertEqual(stats.get_stats(self.user)['total'], 1)
+        self.assertEqual(stats.rebuild(), {})
+
+    def test_compute_stats_matches_the_materialized_rows(self):
+        self._complaint(urgency='High', rating=4)
+        self._complaint(status='resolved')
+        with self.assertNumQueries(2):
+            counted = stats.compute_stats(Complaint.objects.all())
+        self.assertEqual(counted.as_dict(), stats.get_stats())
+        self.assertEqual(counted.as_dict()['avg_rating'], 4.0)
+        self.assertEqual(stats.compute_stats(Complaint.objects.none(), per_user=True), {})
+
+    @override_settings(SECURE_SSL_REDIRECT=False, GEOCODE_NOMINATIM_URL='')
+    def test_write_rolls_back_with_its_counters(self):
+        self.client.force_login(self.user)
+        complaint = self._complaint()
+        with mock.patch.object(stats, 'record_many', side_effect=RuntimeError('counters unavailable')):
+            response = self.client.post(reverse('update_status'), json.dumps({
+                'complaint_id': complaint.complaint_id, 'status': 'resolved',
+            }), content_type='application/json')
+            self.assertFalse(response.json()['success'])
+            response = self.client.post(reverse('submit_complaint'), json.dumps({
+                'details': 'Fan is not working', 'location': 'Library',
+            }), content_type='application/json')
+            self.assertFalse(response.json()['success'])
+        self.assertEqual(list(Complaint.objects.values_list('status', flat=True)), ['pending'])
+        self.assertEqual(stats.rebuild(), {})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CachedETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user', 'user@example.com', 'x')
+        self.complaint = Complaint.objects.create(user=self.user, complaint_type='General', location='Library', details='x')
+        stats.record(self.user.pk, after=stats.contribution(self.complaint))
+        self.client.force_login(self.user)
+
+    def test_write_from_another_worker_is_not_served_stale(self):
+        url = reverse('get_complaints')
+        first = self.client.get(url)
+        self.assertEqual(first.json()['complaints'][0]['status'], 'pending')
+
+        # Another worker's write: its version bump never reaches this process's cache
+        Complaint.objects.filter(pk=self.complaint.pk).update(
+            status='resolved', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        second = self.client.get(url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['complaints'][0]['status'], 'resolved')
+
+        third = self.client.get(url, headers={'If-None-Match': second['ETag']})
+        self.assertEqual(third.status_code, 304)
+
+
+class ReminderSweepTests(TestCase):
+    def test_sweep_invalidates_the_owners_cached_payloads(self):
+        user = User.objects.create_user('user', 'user@example.com', 'x')
+        complaint = Complaint.objects.create(user=user, complaint_type='General', location='Library', details='x')
+        Complaint.objects.filter(pk=complaint.pk).update(submitted_at=timezone.now() - timedelta(days=5))
+        scopes = ['complaints', f'complaints:{user.pk}']
+        before = caching.get_versions(scopes)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reminders.sweep()['reminders_sent'], 1)
+
+        after = caching.get_versions(scopes)
+        self.assertTrue(all(after[scope] != before[scope] for scope in scopes))
+
+
+@override_settings(GEOCODE_NOMINATIM_URL='http://nominatim.invalid/reverse')
+class GeocodingTests(TestCase):
+    def setUp(self):
+        geocoding.reset()
+        self.addCleanup(geocoding.reset)
+
+    def test_gazetteer_is_tried_before_nominatim(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('name,latitude,longitude\nLibrary,18.5190,73.8552\n')
+        self.addCleanup(os.remove, f.name)
+        with override_settings(GEOCODE_GAZETTEER=f.name), \
+                mock.patch('urllib.request.urlopen') as urlopen:
+            self.assertEqual(geocoding.reverse(18.5191, 73.8553), ('Library', 'gazetteer'))
+        urlopen.assert_not_called()
+
+    def test_failures_back_off_and_misses_are_remembered(self):
+        with mock.patch('urllib.request.urlopen', side_effect=OSError('timed out')) as urlopen, \
+                self.assertLogs('complaints.geocoding', 'WARNING'):
+            self.assertEqual(geocoding.reverse(10.0, 20.0)[1], 'coordinates')
+            self.assertEqual(geocoding.reverse(11.0, 21.0)[1], 'coordinates')
+            self.assertEqual(urlopen.call_count, 1)
+            with self.assertNumQueries(0):
+                self.assertEqual(geocoding.reverse(10.0, 20.0)[1], 'coordinates')
+
+
+class DuplicateIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'user@example.com', 'x')
+        self.index = duplicates.DuplicateIndex()
+
+    def _complaint(self, details, **fields):
+        return Complaint.objects.create(
+            user=self.user, complaint_type='General', location='Library', details=details, **fields
+        )
+
+    def test_a_lower_id_committed_late_is_indexed(self):
+        later = self._complaint('Projector in the seminar hall is not working', pk=100)
+        self.index.rebuild()
+        # Its id and timestamp were taken before the one already indexed, its commit after
+        earlier = self._complaint('Chairs near the library entrance are broken', pk=50)
+        Complaint.objects.filter(pk=earlier.pk).update(submitted_at=later.submitted_at - timedelta(seconds=5))
+
+        self.index.sync()
+        match = self.index.find('General', 'Library', 'chairs near the library entrance are broken!')
+        self.assertIsNotNone(match)
+        self.assertEqual(match[0], earlier.pk)
+
+    def test_sync_waits_for_the_first_build(self):
+        self._complaint('Water cooler on the second floor is leaking')
+        with self.assertNumQueries(0):
+            self.index.sync()
+        self.assertEqual(len(self.index), 0)
+
+    def test_rebuild_picks_up_rows_older_than_the_overlap(self):
+        self.index.rebuild()
+        imported = self._complaint('Water cooler on the second floor is leaking')
+        Complaint.objects.filter(pk=imported.pk).update(submitted_at=timezone.now() - timedelta(hours=1))
+        self.index.sync()
+        self.assertEqual(len(self.index), 0)
+
+        self.index.rebuild()
+        self.assertEqual(len(self.index), 1)
+
+    def test_rows_indexed_during_a_rebuild_survive_the_swap(self):
+        self.index.rebuild()
+        submitted = self._complaint('Lift in block B is stuck between floors')
+        rows = duplicates.DuplicateIndex._rows
+
+        def read_window(since):
+            # Another request indexes its complaint after the window was read
+            self.index.add(submitted)
+            return rows(since).exclude(pk=submitted.pk)
+
+        with mock.patch.object(duplicates.DuplicateIndex, '_rows', side_effect=read_window):
+            self.index.rebuild()
+        self.assertEqual(len(self.index), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, GEOCODE_NOMINATIM_URL='')
+class SubmitComplaintGPSTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'user@example.com', 'x')
+        self.client.force_login(self.user)
+
+    def _submit(self, gps):
+        return self.client.post(reverse('submit_complaint'), json.dumps({
+            'details': 'Fan is not working', 'location': 'Library', 'gpsLocation': gps,
+        }), content_type='application/json').json()
+
+    def test_fix_is_stored_with_its_geohash(self):
+        self.assertTrue(self._submit({'latitude': '12.97', 'longitude': 77.59, 'accuracy': 8})['success'])
+        complaint = Complaint.objects.get()
+        self.assertEqual((complaint.latitude, complaint.longitude, complaint.gps_accuracy), (12.97, 77.59, 8.0))
+        self.assertEqual(complaint.geohash, geo.encode(12.97, 77.59))
+
+    def test_bad_fix_is_rejected_before_anything_is_written(self):
+        for gps in ({'latitude': 'north', 'longitude': 77.59}, {'latitude': 91, 'longitude': 0}, {'latitude': 12.97}):
+            response = self._submit(gps)
+            self.assertFalse(response['success'])
+            self.assertEqual(response['message'], 'Invalid gpsLocation')
+        self.assertFalse(Complaint.objects.exists())
+        self.assertEqual(stats.get_stats()['total'], 0)
+
+    def test_encode_leaves_bad_coordinates_without_a_geohash(self):
+        self.assertIsNone(geo.encode('north', 77.59))
+        self.assertIsNone(geo.encode(12.97, 200))
+        complaint = Complaint.objects.create(user=self.user, complaint_type='General', location='Library', details='x', latitude=95, longitude=0)
+        self.assertIsNone(complaint.geohash)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        complaint = Complaint.objects.create(user=self.user, complaint_type='General', location='Library', details='x')
+        stats.record(self.user.pk, after=stats.contribution(complaint))
+        Notification.objects.create(user=self.user, title='Complaint Filed', message='x', complaint=complaint)
+        self.client.force_login(self.user)
+
+    def test_async_variants_match_the_sync_views(self):
+        for name in ('get_complaints', 'get_notifications', 'get_dashboard_stats', 'get_user_session'):
+            expected = self.client.get(reverse(name), {'limit': 10}).json()
+            cache.clear()
+            request = AsyncRequestFactory().get(reverse(name), {'limit': 10})
+            request.user = self.user
+
+            async def auser():
+                return self.user
+            request.auser = auser
+            response = async_to_sync(getattr(views, f'a{name}'))(request)
+            self.assertEqual(json.loads(response.content), expected, name)
+
+    def test_async_variants_are_only_routed_under_asgi(self):
+        self.assertIs(urls.polled(views.get_complaints, views.aget_complaints), views.get_complaints)
+        with override_settings(ASYNC_VIEWS=True):
+            self.assertIs(urls.polled(views.get_complaints, views.aget_complaints), views.aget_complaints)
+
+
+class SyncChangesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'user@example.com', 'x')
+        self.since = timezone.now() - timedelta(minutes=1)
+        Complaint.objects.create(user=self.user, complaint_type='General', location='Library', details='x')
+
+    @mock.patch.object(sync, 'MAX_CHANGES', 3)
+    def test_notifications_count_toward_the_reset(self):
+        Notification.objects.create(user=self.user, title='Complaint Filed', message='x')
+        ComplaintTombstone.objects.create(complaint_id='CMP1', user=self.user)
+        payload = sync.changes(self.user, self.since)
+        self.assertFalse(payload['reset'])
+        self.assertEqual((len(payload['complaints']), payload['deleted'], len(payload['notifications'])), (1, ['CMP1'], 1))
+
+        Notification.objects.create(user=self.user, title='Status Updated', message='x')
+        self.assertTrue(sync.changes(self.user, self.since)['reset'])
+
+
+class ExportTests(SimpleTestCase):
+    def test_csv_cells_that_read_as_formulas_are_quoted(self):
+        for text in ('=1+1', '+1', '-1', '@SUM(A1)', '\t=1+1', '\r=1+1'):
+            self.assertEqual(export.CSVEncoder._cell(text), "'" + text)
+        self.assertEqual(export.CSVEncoder._cell('Fan not working'), 'Fan not working')
+        self.assertEqual(export.CSVEncoder._cell(-1), '-1')
+
+
+class SeedingTests(TestCase):
+    def test_seed_users_returns_count_users(self):
+        first = seeding.seed_users(5, prefix='seed')
+        self.assertEqual(len(first), 5)
+        self.assertEqual(seeding.seed_users(3, prefix='seed'), first[:3])
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 5)
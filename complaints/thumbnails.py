@@ -0,0 +1,107 @@
+"""
+Background thumbnails for image attachments.
+
+When a new ``Blob`` is committed, ``schedule`` hands it to a small thread
+pool that decodes the image at reduced size, applies the EXIF orientation,
+and writes a metadata-free WebP (JPEG if Pillow lacks WebP) next to the
+original as ``<hash>.thumb.webp``. The original blob is left byte-for-byte
+intact since its path is its hash. List views link ``thumb_url`` instead of
+the full-resolution file.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from . import caching
+from .models import Blob, Complaint, ComplaintFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnail'
+        )
+    return _executor
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def thumbnail_name(blob_name, fmt):
+    return f"{os.path.splitext(blob_name)[0]}.thumb.{'webp' if fmt == 'WEBP' else 'jpg'}"
+
+
+def render(source):
+    """Return ``(bytes, format)`` for a thumbnail of the image file ``source``"""
+    fmt = 'WEBP' if features.check('webp') else 'JPEG'
+    with Image.open(source) as img:
+        # Let the JPEG decoder downscale while decoding instead of inflating full size
+        img.draft('RGB', (THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(THUMBNAIL_SIZE)
+        if img.mode not in ('RGB', 'RGBA') or fmt == 'JPEG':
+            img = img.convert('RGB')
+        options = {'quality': 75, 'method': 4} if fmt == 'WEBP' else {'quality': 75, 'optimize': True}
+        out = io.BytesIO()
+        # No exif= argument: the thumbnail carries no metadata at all
+        img.save(out, fmt, **options)
+    return out.getvalue(), fmt
+
+
+def generate(blob_id, force=False):
+    """Create the thumbnail for one blob; returns the thumbnail name or None"""
+    blob = Blob.objects.filter(pk=blob_id).first()
+    if blob is None or not is_image(blob.file.name) or (blob.thumbnail and not force):
+        return None
+    try:
+        with default_storage.open(blob.file.name, 'rb') as source:
+            content, fmt = render(source)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        logger.warning('No thumbnail for blob %s: %s', blob.sha256, e)
+        return None
+
+    name = thumbnail_name(blob.file.name, fmt)
+    default_storage.delete(name)
+    name = default_storage.save(name, ContentFile(content))
+    Blob.objects.filter(pk=blob_id).update(thumbnail=name)
+    # Complaint payloads carry thumb_url: refresh their ETags and cached copies
+    Complaint.objects.filter(files__blob_id=blob_id).update(updated_at=timezone.now())
+    owners = ComplaintFile.objects.filter(blob_id=blob_id).values_list('complaint__user_id', flat=True)
+    caching.complaints_changed(*set(owners))
+    return name
+
+
+def _run(blob_id):
+    close_old_connections()
+    try:
+        generate(blob_id)
+    except Exception:
+        logger.exception('Thumbnail generation failed for blob %s', blob_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(blob_id):
+    """Queue a thumbnail once the current transaction commits"""
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _get_executor().submit(_run, blob_id))
+    else:
+        transaction.on_commit(lambda: generate(blob_id))
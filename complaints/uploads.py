@@ -0,0 +1,117 @@
+"""
+Streaming multipart uploads for complaint attachments.
+
+``ComplaintFileUploadHandler`` replaces Django's memory/temporary-file
+handlers for the complaint endpoints. Each chunk is written straight to a
+staging file under ``MEDIA_ROOT/blobs/incoming/`` and fed to a SHA-256
+digest as it arrives, so a worker never holds more than one chunk of an
+attachment in memory. ``blobstore.adopt`` then renames the staged file to
+its content-addressed path (or drops it if the content is already stored).
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from . import blobstore
+
+UPLOAD_FIELD = 'files'
+
+
+class StoredUpload(UploadedFile):
+    """An upload already saved to storage as ``stored_name``"""
+
+    def __init__(self, name, stored_name, size, sha256, content_type=None, charset=None):
+        super().__init__(None, name, content_type, size, charset)
+        self.stored_name = stored_name
+        self.sha256 = sha256
+
+    def delete(self):
+        default_storage.delete(self.stored_name)
+
+
+class ComplaintFileUploadHandler(FileUploadHandler):
+    """Write ``files`` parts to MEDIA_ROOT chunk by chunk, hashing as they stream"""
+
+    def __init__(self, request=None, max_file_size=None):
+        super().__init__(request)
+        self.max_file_size = max_file_size or settings.COMPLAINT_UPLOAD_MAX_FILE_SIZE
+        self.errors = []
+        self.stored = []
+        self.destination = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != UPLOAD_FIELD:
+            raise SkipFile()
+        if self.content_length and self.content_length > self.max_file_size:
+            self._reject()
+
+        self.stored_name = blobstore.staging_name()
+        path = default_storage.path(self.stored_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.destination = open(path, 'xb')
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_file_size:
+            self._discard()
+            self._reject()
+        self.destination.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.destination.close()
+        self.destination = None
+        upload = StoredUpload(
+            name=self.file_name,
+            stored_name=self.stored_name,
+            size=file_size,
+            sha256=self.digest.hexdigest(),
+            content_type=self.content_type,
+            charset=self.charset,
+        )
+        self.stored.append(upload)
+        return upload
+
+    def upload_interrupted(self):
+        self._discard()
+        self.discard_all()
+
+    def keep(self):
+        """Hand the stored files over to their ComplaintFile rows"""
+        self.stored = []
+
+    def discard_all(self):
+        """Remove every file this handler stored, e.g. when the request fails later"""
+        for upload in self.stored:
+            upload.delete()
+        self.stored = []
+
+    def _reject(self):
+        limit_mb = self.max_file_size / (1024 * 1024)
+        self.errors.append(f'File "{self.file_name}" exceeds the {limit_mb:g} MB limit')
+        raise SkipFile()
+
+    def _discard(self):
+        if self.destination is not None:
+            self.destination.close()
+            self.destination = None
+            default_storage.delete(self.stored_name)
+
+
+def install_handler(request):
+    """Make ``request`` stream its uploads through a ComplaintFileUploadHandler"""
+    handler = ComplaintFileUploadHandler(request)
+    request.upload_handlers = [handler]
+    return handler
+
+
+def is_multipart(request):
+    return request.content_type == 'multipart/form-data'
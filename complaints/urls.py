@@ -1,6 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+
+def polled(sync_view, async_view):
+    # An async view under WSGI costs an event loop per request, so the
+    # async variants are only routed when asgi.py sets ASYNC_VIEWS
+    return async_view if settings.ASYNC_VIEWS else sync_view
+
+
 urlpatterns = [
     path('', views.home, name='home'),
     path('login/', views.login_view, name='login'),
@@ -9,15 +17,30 @@ urlpatterns = [
     path('api/login/', views.api_login, name='api_login'),
     path('api/register/', views.api_register, name='api_register'),
     path('api/submit-complaint/', views.submit_complaint, name='submit_complaint'),
-    path('api/get-complaints/', views.get_complaints, name='get_complaints'),
+    path('api/upload-complaint-files/', views.upload_complaint_files, name='upload_complaint_files'),
+    path('api/get-complaints/', polled(views.get_complaints, views.aget_complaints), name='get_complaints'),
+    path('api/search-complaints/', views.search_complaints, name='search_complaints'),
+    path('api/get-nearby-complaints/', views.get_nearby_complaints, name='get_nearby_complaints'),
+    path('api/get-complaint-hotspots/', views.get_complaint_hotspots, name='get_complaint_hotspots'),
+    path('api/reverse-geocode/', views.reverse_geocode, name='reverse_geocode'),
+    path('api/classify-complaint/', views.classify_complaint, name='classify_complaint'),
     path('api/update-status/', views.update_status, name='update_status'),
     path('api/delete-complaint/', views.delete_complaint, name='delete_complaint'),
+    path('api/bulk-update-status/', views.bulk_update_status, name='bulk_update_status'),
+    path('api/bulk-delete-complaints/', views.bulk_delete_complaints, name='bulk_delete_complaints'),
     path('api/submit-feedback/', views.submit_feedback, name='submit_feedback'),
     path('api/reopen-complaint/', views.reopen_complaint, name='reopen_complaint'),
-    path('api/get-notifications/', views.get_notifications, name='get_notifications'),
+    path('api/sync/', views.sync_changes, name='sync_changes'),
+    path('api/get-notifications/', polled(views.get_notifications, views.aget_notifications), name='get_notifications'),
+    path('api/notification-stream/', views.notification_stream, name='notification_stream'),
     path('api/mark-notification-read/', views.mark_notification_read, name='mark_notification_read'),
-    path('api/get-dashboard-stats/', views.get_dashboard_stats, name='get_dashboard_stats'),
+    path('api/get-dashboard-stats/', polled(views.get_dashboard_stats, views.aget_dashboard_stats), name='get_dashboard_stats'),
     path('api/get-admin-data/', views.get_admin_data, name='get_admin_data'),
+    path('api/export-complaints/', views.export_complaints, name='export_complaints'),
+    path('api/get-duplicate-clusters/', views.get_duplicate_clusters, name='get_duplicate_clusters'),
+    path('api/get-cache-stats/', views.get_cache_stats, name='get_cache_stats'),
+    path('api/get-request-metrics/', views.get_request_metrics, name='get_request_metrics'),
+    path('metrics', views.metrics_endpoint, name='metrics'),
     path('api/check-reminders/', views.check_reminders, name='check_reminders'),
-    path('api/get-user-session/', views.get_user_session, name='get_user_session'),
+    path('api/get-user-session/', polled(views.get_user_session, views.aget_user_session), name='get_user_session'),
 ]
\ No newline at end of file
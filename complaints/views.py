@@ -2,15 +2,32 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.views.decorators.http import condition
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Avg, Count, Q  # IMPORT ADDED HERE
+from .etags import (
+    acomplaints_etag, acondition, adashboard_stats_etag, admin_data_etag, anotifications_etag,
+    complaints_etag, dashboard_stats_etag, notifications_etag,
+)
 from .models import Complaint, ComplaintFile, Notification
+from .pagination import apaginate, paginate, parse_page_size
+from .serializers import complaint_queryset, parse_fields, serialize_complaint, serialize_file
+from . import blobstore, bulk, caching, classifier, duplicates, export, geo, geocoding, metrics, notifications, profiling, realtime, reminders, search, stats, sync, uploads
 import json
+import logging
 import base64
+import hashlib
+from collections import defaultdict
 from datetime import timedelta
-import uuid
+
+logger = logging.getLogger(__name__)
 
 def home(request):
     """Render the main HTML page"""
@@ -48,12 +65,12 @@ def api_login(request):
                 login(request, user)
                 
                 # Create login notification
-                Notification.objects.create(
+                notifications.dispatch([Notification(
                     user=user,
                     title='Login Successful',
                     message=f'Welcome back {user.username}!',
                     type='success'
-                )
+                )])
                 
                 return JsonResponse({
                     'success': True,
@@ -90,12 +107,12 @@ def api_register(request):
             user = User.objects.create_user(username=username, email=email, password=password)
             
             # Create welcome notification
-            Notification.objects.create(
+            notifications.dispatch([Notification(
                 user=user,
                 title='Welcome!',
                 message=f'Welcome {username} to Smart Complaint System!',
                 type='success'
-            )
+            )])
             
             # Auto login after registration
             login(request, user)
@@ -117,123 +134,429 @@ def api_register(request):
 @csrf_exempt
 @login_required
 def submit_complaint(request):
-    """API endpoint to submit a new complaint"""
+    """
+    API endpoint to submit a new complaint
+
+    Takes either a JSON body with base64 ``files``, or multipart/form-data
+    with the complaint JSON in ``payload`` and attachments streamed as
+    ``files`` parts straight to storage.
+    """
     if request.method == 'POST':
+        handler = uploads.install_handler(request) if uploads.is_multipart(request) else None
         try:
-            data = json.loads(request.body)
-            
-            # Create complaint
-            complaint = Complaint.objects.create(
-                user=request.user,
-                complaint_type=data.get('complaint_type', 'General'),
-                urgency=data.get('urgency', 'Normal'),
-                location=data.get('location', 'Not specified'),
-                details=data.get('details', ''),
-                name=data.get('name', request.user.username),
-                roll=data.get('roll', None)
-            )
-            
-            # Handle files if any
-            files = data.get('files', [])
-            for file_data in files:
-                # Decode base64 file
-                if file_data.get('data'):
-                    from django.core.files.base import ContentFile
-                    
-                    format, imgstr = file_data['data'].split(';base64,')
-                    file_content = ContentFile(base64.b64decode(imgstr), name=file_data['name'])
-                    
-                    ComplaintFile.objects.create(
-                        complaint=complaint,
-                        file=file_content,
-                        name=file_data['name']
-                    )
+            if handler:
+                uploaded = request.FILES.getlist(uploads.UPLOAD_FIELD)
+                if handler.errors:
+                    handler.discard_all()
+                    return JsonResponse({'success': False, 'message': '; '.join(handler.errors)})
+                data = json.loads(request.POST.get('payload') or '{}')
+            else:
+                uploaded = []
+                data = json.loads(request.body)
             
-            # Handle GPS location
-            gps = data.get('gpsLocation')
-            if gps:
-                complaint.latitude = gps.get('latitude')
-                complaint.longitude = gps.get('longitude')
-                complaint.gps_accuracy = gps.get('accuracy')
-                complaint.save()
+            # Classify on the server so every client gets the same answer;
+            # the client's guess only fills in what the keywords can't decide
+            details = data.get('details', '')
+            detected = classifier.classify(details)
+            if detected['complaint_type'] == classifier.GENERAL:
+                detected['complaint_type'] = data.get('complaint_type') or classifier.GENERAL
+            if data.get('urgency') == classifier.HIGH:
+                detected['urgency'] = classifier.HIGH
+
+            # Reject a bad GPS fix before anything is written
+            latitude, longitude, accuracy = _parse_gps(data.get('gpsLocation'))
+
+            location = data.get('location', 'Not specified')
+            duplicate_of = duplicates.find_duplicate(detected['complaint_type'], location, details)
             
-            # Create notification for user
-            Notification.objects.create(
-                user=request.user,
-                title='Complaint Filed',
-                message=f'Your complaint {complaint.complaint_id} has been submitted successfully.',
-                type='success',
-                complaint=complaint
-            )
+            # The complaint, its files and its counters commit together
+            with transaction.atomic():
+                complaint = Complaint.objects.create(
+                    user=request.user,
+                    complaint_type=detected['complaint_type'],
+                    urgency=detected['urgency'],
+                    location=location,
+                    details=details,
+                    duplicate_of_id=duplicate_of,
+                    name=data.get('name', request.user.username),
+                    roll=data.get('roll', None),
+                    latitude=latitude,
+                    longitude=longitude,
+                    gps_accuracy=accuracy,
+                )
+                
+                # Streamed uploads are already in storage, just record them
+                files_saved = len(_attach_uploads(complaint, uploaded))
+                
+                # Handle base64 files if any
+                files = data.get('files', [])
+                for file_data in files:
+                    # Decode base64 file
+                    if file_data.get('data'):
+                        format, imgstr = file_data['data'].split(';base64,')
+                        content = base64.b64decode(imgstr)
+                        blob = blobstore.store_bytes(content, hashlib.sha256(content).hexdigest(), file_data['name'])
+                        blobstore.attach(complaint, blob, file_data['name'])
+                        metrics.ATTACHMENTS.inc(source='base64')
+                        metrics.ATTACHMENT_BYTES.inc(len(content), source='base64')
+                        files_saved += 1
+                
+                stats.record(complaint.user_id, after=stats.contribution(complaint, has_files=files_saved > 0))
+                caching.complaints_changed(complaint.user_id)
+            # Only now do the streamed files belong to committed rows
+            if handler:
+                handler.keep()
+            duplicates.remember(complaint)
+            metrics.COMPLAINTS_SUBMITTED.inc(urgency=complaint.urgency)
             
-            # Create notification for admins
-            admin_users = User.objects.filter(is_superuser=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
+            # Notify the user and all admins in one batch; admins already heard
+            # about the first complaint of a duplicate cluster
+            notifications.dispatch([
+                Notification(
+                    user=request.user,
+                    title='Complaint Filed',
+                    message=f'Your complaint {complaint.complaint_id} has been submitted successfully.',
+                    type='success',
+                    complaint=complaint
+                ),
+                *([] if duplicate_of else notifications.for_admins(
                     title='New Complaint',
                     message=f'New complaint {complaint.complaint_id} filed by {request.user.username}',
                     type='info',
                     complaint=complaint
-                )
+                )),
+            ])
             
             return JsonResponse({
                 'success': True,
                 'complaint_id': complaint.complaint_id,
+                'duplicate_of': complaint.duplicate_of.complaint_id if duplicate_of else None,
                 'message': 'Complaint submitted successfully!'
             })
             
         except Exception as e:
+            if handler:
+                handler.discard_all()
+            return JsonResponse({'success': False, 'message': str(e)})
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+def _parse_gps(gps):
+    """``(latitude, longitude, accuracy)`` from a ``gpsLocation``, all None without a fix"""
+    if not gps or (gps.get('latitude') is None and gps.get('longitude') is None):
+        return None, None, None
+    try:
+        latitude, longitude = float(gps['latitude']), float(gps['longitude'])
+        accuracy = float(gps['accuracy']) if gps.get('accuracy') is not None else None
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Invalid gpsLocation')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('Invalid gpsLocation')
+    return latitude, longitude, accuracy
+
+
+def _attach_uploads(complaint, uploaded):
+    """Create ComplaintFile rows for uploads already staged by the upload handler"""
+    saved = [
+        blobstore.attach(
+            complaint,
+            blobstore.adopt(upload.stored_name, upload.sha256, upload.size, upload.name),
+            upload.name
+        )
+        for upload in uploaded
+    ]
+    if uploaded:
+        metrics.ATTACHMENTS.inc(len(uploaded), source='stream')
+        metrics.ATTACHMENT_BYTES.inc(sum(upload.size for upload in uploaded), source='stream')
+    return saved
+
+@csrf_exempt
+@login_required
+def upload_complaint_files(request):
+    """API endpoint to stream extra attachments (multipart ``files``) onto a complaint"""
+    if request.method == 'POST' and uploads.is_multipart(request):
+        handler = uploads.install_handler(request)
+        try:
+            uploaded = request.FILES.getlist(uploads.UPLOAD_FIELD)
+            if handler.errors:
+                handler.discard_all()
+                return JsonResponse({'success': False, 'message': '; '.join(handler.errors)})
+            
+            # The row lock keeps a concurrent upload from also counting the first file
+            with transaction.atomic():
+                complaint = Complaint.objects.select_for_update().get(complaint_id=request.POST.get('complaint_id'))
+                
+                # Check permission (admin or own complaint)
+                if not request.user.is_superuser and complaint.user_id != request.user.pk:
+                    handler.discard_all()
+                    return JsonResponse({'success': False, 'message': 'Permission denied'})
+                
+                had_files = complaint.files.exists()
+                saved = _attach_uploads(complaint, uploaded)
+                # New attachments change the complaint's payload
+                Complaint.objects.filter(pk=complaint.pk).update(updated_at=timezone.now())
+                if saved and not had_files:
+                    stats.record(
+                        complaint.user_id,
+                        stats.contribution(complaint),
+                        stats.contribution(complaint, has_files=True)
+                    )
+                caching.complaints_changed(complaint.user_id)
+            handler.keep()
+            
+            return JsonResponse({'success': True, 'files': [serialize_file(f) for f in saved]})
+            
+        except Complaint.DoesNotExist:
+            handler.discard_all()
+            return JsonResponse({'success': False, 'message': 'Complaint not found'})
+        except Exception as e:
+            handler.discard_all()
             return JsonResponse({'success': False, 'message': str(e)})
     
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=complaints_etag)
 def get_complaints(request):
-    """API endpoint to get complaints"""
+    """
+    API endpoint to get complaints
+
+    Passing ``limit`` or ``cursor`` switches to keyset pagination; follow
+    ``next_cursor`` until it is null. ``fields`` takes a comma separated
+    projection of the complaint keys. Responses are cached until one of
+    the caller's complaints changes.
+    """
     try:
         user = request.user
         is_admin = user.is_superuser
         
         if is_admin:
-            complaints = Complaint.objects.all().order_by('-submitted_at')
+            complaints = Complaint.objects.all()
         else:
-            complaints = Complaint.objects.filter(user=user).order_by('-submitted_at')
+            complaints = Complaint.objects.filter(user=user)
+        
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        complaints = complaint_queryset(complaints, fields)
+        cursor = request.GET.get('cursor')
+        
+        def build():
+            if cursor or 'limit' in request.GET:
+                page_size = parse_page_size(request.GET.get('limit'))
+                rows, next_cursor = paginate(complaints, cursor, page_size)
+                return {
+                    'success': True,
+                    'complaints': [serialize_complaint(c, fields) for c in rows],
+                    'next_cursor': next_cursor,
+                    'has_more': next_cursor is not None,
+                    'page_size': page_size,
+                }
+            
+            ordered = complaints.order_by('-submitted_at', '-id')
+            return {'success': True, 'complaints': [serialize_complaint(c, fields) for c in ordered]}
         
+        try:
+            payload = caching.cached(
+                'get_complaints', caching.complaint_scopes(user), build, caching.request_variant(request)
+            )
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        return JsonResponse(payload)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@acondition(acomplaints_etag)
+async def aget_complaints(request):
+    """``get_complaints`` on the async ORM, for ASGI"""
+    try:
+        user = await request.auser()
+        is_admin = user.is_superuser
+        
+        if is_admin:
+            complaints = Complaint.objects.all()
+        else:
+            complaints = Complaint.objects.filter(user=user)
+        
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        complaints = complaint_queryset(complaints, fields)
+        cursor = request.GET.get('cursor')
+        
+        async def build():
+            if cursor or 'limit' in request.GET:
+                page_size = parse_page_size(request.GET.get('limit'))
+                rows, next_cursor = await apaginate(complaints, cursor, page_size)
+                return {
+                    'success': True,
+                    'complaints': [serialize_complaint(c, fields) for c in rows],
+                    'next_cursor': next_cursor,
+                    'has_more': next_cursor is not None,
+                    'page_size': page_size,
+                }
+            
+            ordered = complaints.order_by('-submitted_at', '-id')
+            return {'success': True, 'complaints': [serialize_complaint(c, fields) async for c in ordered]}
+        
+        try:
+            payload = await caching.acached(
+                'get_complaints', caching.complaint_scopes(user), build, caching.request_variant(request, user)
+            )
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        return JsonResponse(payload)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+def search_complaints(request):
+    """
+    API endpoint for ranked full-text search over complaints
+
+    Matches ``q`` against complaint ID, type, location, name and details;
+    admins search everything, users their own complaints. Supports
+    ``page``, ``limit`` and ``fields`` like get_complaints.
+    """
+    try:
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+            page_size = parse_page_size(request.GET.get('limit'))
+            page = max(1, int(request.GET.get('page') or 1))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        
+        ids, has_more = search.search(
+            request.GET.get('q', ''),
+            user=request.user,
+            limit=page_size,
+            offset=(page - 1) * page_size
+        )
+        
+        rank = {pk: pos for pos, pk in enumerate(ids)}
+        complaints = sorted(
+            complaint_queryset(Complaint.objects.filter(pk__in=ids), fields),
+            key=lambda c: rank[c.pk]
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'complaints': [serialize_complaint(c, fields) for c in complaints],
+            'page': page,
+            'page_size': page_size,
+            'has_more': has_more,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+def get_nearby_complaints(request):
+    """
+    API endpoint for complaints with a GPS fix inside an area
+
+    Pass either ``bbox=south,west,north,east`` or ``lat``, ``lon`` and
+    ``radius`` in metres; radius results carry ``distance`` and come
+    nearest first. Admins see everything, users their own complaints.
+    """
+    try:
+        complaints = Complaint.objects.all() if request.user.is_superuser else Complaint.objects.filter(user=request.user)
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+            limit = parse_page_size(request.GET.get('limit'))
+            if request.GET.get('bbox'):
+                complaints = geo.within_bbox(complaints, *geo.parse_bbox(request.GET['bbox']))
+                complaints = complaints.order_by('-submitted_at', '-id')
+            else:
+                latitude, longitude = float(request.GET['lat']), float(request.GET['lon'])
+                radius = min(float(request.GET.get('radius') or 1000), geo.MAX_RADIUS)
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or radius <= 0:
+                    raise ValueError('Invalid lat, lon or radius')
+                complaints = geo.within_radius(complaints, latitude, longitude, radius)
+        except KeyError:
+            return JsonResponse({'success': False, 'message': 'Pass bbox, or lat and lon'})
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        
+        rows = list(complaint_queryset(complaints, fields)[:limit + 1])
         data = []
-        for c in complaints:
-            files = [{
-                'id': f.id,
-                'name': f.name,
-                'url': f.file.url if f.file else None,
-                'type': f.file.name.split('.')[-1] if f.file else 'unknown'
-            } for f in c.files.all()]
-            
-            data.append({
-                'id': c.complaint_id,
-                'complaint_type': c.complaint_type,
-                'urgency': c.urgency,
-                'location': c.location,
-                'details': c.details,
-                'name': c.name,
-                'roll': c.roll,
-                'status': c.status,
-                'submitted_at': c.submitted_at.isoformat(),
-                'updated_at': c.updated_at.isoformat(),
-                'files': files,
-                'has_gps': bool(c.latitude and c.longitude),
-                'rating': c.rating,
-                'feedback': c.feedback,
-                'reopened': c.reopened,
-                'reopen_reason': c.reopen_reason,
-                'user_name': c.user.username,
-                'user_email': c.user.email
-            })
+        for c in rows[:limit]:
+            item = serialize_complaint(c, fields)
+            if hasattr(c, 'distance'):
+                item['distance'] = round(c.distance, 1)
+            data.append(item)
         
-        return JsonResponse({'success': True, 'complaints': data})
+        return JsonResponse({'success': True, 'complaints': data, 'has_more': len(rows) > limit})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
 
+@login_required
+def get_complaint_hotspots(request):
+    """
+    API endpoint counting complaints per geohash cell
+
+    ``precision`` takes one or more comma separated geohash lengths (1-9,
+    default 6) to get several zoom levels at once; ``bbox`` and ``status``
+    narrow the complaints counted. Admins see everything, users their own.
+    """
+    try:
+        complaints = Complaint.objects.all() if request.user.is_superuser else Complaint.objects.filter(user=request.user)
+        try:
+            raw = request.GET.get('precision') or str(geo.DEFAULT_HOTSPOT_PRECISION)
+            precisions = sorted({int(p) for p in raw.split(',') if p.strip()})
+            if not precisions or not all(1 <= p <= geo.PRECISION for p in precisions):
+                raise ValueError(f'precision must be between 1 and {geo.PRECISION}')
+            limit = parse_page_size(request.GET.get('limit'))
+            if request.GET.get('bbox'):
+                complaints = geo.within_bbox(complaints, *geo.parse_bbox(request.GET['bbox']))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        if request.GET.get('status'):
+            complaints = complaints.filter(status=request.GET['status'])
+        
+        return JsonResponse({
+            'success': True,
+            'hotspots': {
+                str(precision): geo.hotspots(complaints, precision, limit)
+                for precision in precisions
+            },
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+def reverse_geocode(request):
+    """API endpoint resolving ``lat``/``lon`` to a short address via the local cache"""
+    try:
+        try:
+            latitude, longitude = float(request.GET['lat']), float(request.GET['lon'])
+        except (KeyError, ValueError):
+            return JsonResponse({'success': False, 'message': 'Invalid lat or lon'})
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return JsonResponse({'success': False, 'message': 'Invalid lat or lon'})
+        
+        address, source = geocoding.reverse(latitude, longitude)
+        return JsonResponse({'success': True, 'address': address, 'source': source})
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@csrf_exempt
+@login_required
+def classify_complaint(request):
+    """API endpoint returning the detected category and urgency for ``text``"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            return JsonResponse({'success': True, **classifier.classify(data.get('text', ''))})
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
 @csrf_exempt
 @login_required
 def update_status(request):
@@ -244,24 +567,29 @@ def update_status(request):
             complaint_id = data.get('complaint_id')
             new_status = data.get('status')
             
-            complaint = Complaint.objects.get(complaint_id=complaint_id)
-            
-            # Check permission (admin or own complaint)
-            if not request.user.is_superuser and complaint.user != request.user:
-                return JsonResponse({'success': False, 'message': 'Permission denied'})
-            
-            old_status = complaint.status
-            complaint.status = new_status
-            complaint.save()
+            # Locked so ``before`` is still the stored row when the counters move
+            with transaction.atomic():
+                complaint = Complaint.objects.select_for_update().get(complaint_id=complaint_id)
+                
+                # Check permission (admin or own complaint)
+                if not request.user.is_superuser and complaint.user_id != request.user.pk:
+                    return JsonResponse({'success': False, 'message': 'Permission denied'})
+                
+                old_status = complaint.status
+                before = stats.contribution(complaint)
+                complaint.status = new_status
+                complaint.save()
+                stats.record(complaint.user_id, before, stats.contribution(complaint))
+                caching.complaints_changed(complaint.user_id)
             
             # Notify user
-            Notification.objects.create(
-                user=complaint.user,
+            notifications.dispatch([Notification(
+                user_id=complaint.user_id,
                 title='Status Updated',
                 message=f'Your complaint {complaint.complaint_id} status changed from {old_status} to {new_status}',
                 type='info',
                 complaint=complaint
-            )
+            )])
             
             return JsonResponse({'success': True, 'message': 'Status updated successfully'})
             
@@ -281,13 +609,17 @@ def delete_complaint(request):
             data = json.loads(request.body)
             complaint_id = data.get('complaint_id')
             
-            complaint = Complaint.objects.get(complaint_id=complaint_id)
-            
             # Check permission (admin only)
             if not request.user.is_superuser:
                 return JsonResponse({'success': False, 'message': 'Permission denied'})
             
-            complaint.delete()
+            with transaction.atomic():
+                complaint = Complaint.objects.select_for_update().get(complaint_id=complaint_id)
+                before = stats.contribution(complaint, has_files=complaint.files.exists())
+                sync.record_deletion(complaint)
+                complaint.delete()
+                stats.record(complaint.user_id, before=before)
+                caching.complaints_changed(complaint.user_id)
             
             return JsonResponse({'success': True, 'message': 'Complaint deleted successfully'})
             
@@ -298,6 +630,55 @@ def delete_complaint(request):
     
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
+@csrf_exempt
+@login_required
+def bulk_update_status(request):
+    """
+    API endpoint to set one status on many complaints (admin only)
+
+    Takes ``complaint_ids`` (up to bulk.MAX_IDS) and ``status``; ``results``
+    maps each id to updated, unchanged or not_found.
+    """
+    if request.method == 'POST':
+        if not request.user.is_superuser:
+            return JsonResponse({'success': False, 'message': 'Permission denied'})
+        
+        try:
+            data = json.loads(request.body)
+            complaint_ids = bulk.parse_ids(data.get('complaint_ids'))
+            results = bulk.update_status(complaint_ids, data.get('status'))
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        
+        updated = sum(1 for outcome in results.values() if outcome == bulk.UPDATED)
+        return JsonResponse({'success': True, 'updated': updated, 'results': results})
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+@csrf_exempt
+@login_required
+def bulk_delete_complaints(request):
+    """
+    API endpoint to delete many complaints (admin only)
+
+    Takes ``complaint_ids`` (up to bulk.MAX_IDS); ``results`` maps each id
+    to deleted or not_found.
+    """
+    if request.method == 'POST':
+        if not request.user.is_superuser:
+            return JsonResponse({'success': False, 'message': 'Permission denied'})
+        
+        try:
+            data = json.loads(request.body)
+            results = bulk.delete(bulk.parse_ids(data.get('complaint_ids')))
+        except Exception as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        
+        deleted = sum(1 for outcome in results.values() if outcome == bulk.DELETED)
+        return JsonResponse({'success': True, 'deleted': deleted, 'results': results})
+    
+    return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
 @csrf_exempt
 @login_required
 def submit_feedback(request):
@@ -309,23 +690,24 @@ def submit_feedback(request):
             rating = data.get('rating')
             feedback = data.get('feedback')
             
-            complaint = Complaint.objects.get(complaint_id=complaint_id, user=request.user)
-            
-            complaint.rating = rating
-            complaint.feedback = feedback
-            complaint.feedback_submitted_at = timezone.now()
-            complaint.save()
+            with transaction.atomic():
+                complaint = Complaint.objects.select_for_update().get(complaint_id=complaint_id, user=request.user)
+                
+                before = stats.contribution(complaint)
+                complaint.rating = rating
+                complaint.feedback = feedback
+                complaint.feedback_submitted_at = timezone.now()
+                complaint.save()
+                stats.record(complaint.user_id, before, stats.contribution(complaint))
+                caching.complaints_changed(complaint.user_id)
             
             # Notify admins
-            admin_users = User.objects.filter(is_superuser=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
-                    title='New Feedback',
-                    message=f'Complaint {complaint.complaint_id} received {rating}/5 rating',
-                    type='info',
-                    complaint=complaint
-                )
+            notifications.notify_admins(
+                title='New Feedback',
+                message=f'Complaint {complaint.complaint_id} received {rating}/5 rating',
+                type='info',
+                complaint=complaint
+            )
             
             return JsonResponse({'success': True, 'message': 'Feedback submitted successfully'})
             
@@ -346,24 +728,25 @@ def reopen_complaint(request):
             complaint_id = data.get('complaint_id')
             reason = data.get('reason')
             
-            complaint = Complaint.objects.get(complaint_id=complaint_id, user=request.user)
-            
-            complaint.status = 'reopened'
-            complaint.reopened = True
-            complaint.reopen_reason = reason
-            complaint.reopen_count += 1
-            complaint.save()
+            with transaction.atomic():
+                complaint = Complaint.objects.select_for_update().get(complaint_id=complaint_id, user=request.user)
+                
+                before = stats.contribution(complaint)
+                complaint.status = 'reopened'
+                complaint.reopened = True
+                complaint.reopen_reason = reason
+                complaint.reopen_count += 1
+                complaint.save()
+                stats.record(complaint.user_id, before, stats.contribution(complaint))
+                caching.complaints_changed(complaint.user_id)
             
             # Notify admins
-            admin_users = User.objects.filter(is_superuser=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
-                    title='Complaint Reopened',
-                    message=f'Complaint {complaint.complaint_id} reopened by {request.user.username}. Reason: {reason}',
-                    type='warning',
-                    complaint=complaint
-                )
+            notifications.notify_admins(
+                title='Complaint Reopened',
+                message=f'Complaint {complaint.complaint_id} reopened by {request.user.username}. Reason: {reason}',
+                type='warning',
+                complaint=complaint
+            )
             
             return JsonResponse({'success': True, 'message': 'Complaint reopened successfully'})
             
@@ -375,27 +758,111 @@ def reopen_complaint(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=notifications_etag)
 def get_notifications(request):
-    """API endpoint to get user notifications"""
+    """API endpoint to get user notifications, cached until they change"""
     try:
-        notifications = Notification.objects.filter(
-            user=request.user,
-            read=False
-        ).order_by('-created_at')[:20]
+        def build():
+            notifications = Notification.objects.filter(
+                user=request.user,
+                read=False
+            ).select_related('complaint').order_by('-created_at')[:20]
+            
+            return [{
+                'id': n.id,
+                'title': n.title,
+                'message': n.message,
+                'type': n.type,
+                'complaint_id': n.complaint.complaint_id if n.complaint else None,
+                'created_at': n.created_at.isoformat()
+            } for n in notifications]
+        
+        data = caching.cached(
+            'get_notifications', [f'notifications:{request.user.pk}'], build, caching.request_variant(request)
+        )
+        return JsonResponse({'success': True, 'notifications': data})
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@acondition(anotifications_etag)
+async def aget_notifications(request):
+    """``get_notifications`` on the async ORM, for ASGI"""
+    try:
+        user = await request.auser()
         
-        data = [{
-            'id': n.id,
-            'title': n.title,
-            'message': n.message,
-            'type': n.type,
-            'complaint_id': n.complaint.complaint_id if n.complaint else None,
-            'created_at': n.created_at.isoformat()
-        } for n in notifications]
+        async def build():
+            notifications = Notification.objects.filter(
+                user=user,
+                read=False
+            ).select_related('complaint').order_by('-created_at')[:20]
+            
+            return [{
+                'id': n.id,
+                'title': n.title,
+                'message': n.message,
+                'type': n.type,
+                'complaint_id': n.complaint.complaint_id if n.complaint else None,
+                'created_at': n.created_at.isoformat()
+            } async for n in notifications]
         
+        data = await caching.acached(
+            'get_notifications', [f'notifications:{user.pk}'], build, caching.request_variant(request, user)
+        )
         return JsonResponse({'success': True, 'notifications': data})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
 
+@login_required
+def sync_changes(request):
+    """
+    API endpoint for delta sync
+
+    Returns complaints updated after the ``since`` watermark, the ids of
+    complaints deleted since, and new notifications, with the watermark
+    for the next call. Without ``since``, or when ``reset`` comes back
+    true, reload everything with get_complaints and keep the returned
+    watermark. ``fields`` works as in get_complaints.
+    """
+    try:
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+            since = request.GET.get('since')
+            since = sync.decode_watermark(since) if since else None
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
+        
+        return JsonResponse(sync.changes(request.user, since, fields))
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of the user's new notifications
+
+    Only served under the ASGI application; under WSGI it answers with an
+    error so the page keeps refreshing on its own. Reconnects resume from
+    the ``Last-Event-ID`` header.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'success': False, 'message': 'Streaming needs the ASGI server'}, status=501)
+    
+    try:
+        last_id = int(request.headers['Last-Event-ID']) if request.headers.get('Last-Event-ID') else None
+    except ValueError:
+        last_id = None
+    
+    return StreamingHttpResponse(
+        realtime.stream(user.pk, last_id),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @csrf_exempt
 @login_required
 def mark_notification_read(request):
@@ -409,6 +876,7 @@ def mark_notification_read(request):
             notification.read = True
             notification.read_at = timezone.now()
             notification.save()
+            caching.notifications_changed(request.user.pk)
             
             return JsonResponse({'success': True})
             
@@ -421,106 +889,209 @@ def mark_notification_read(request):
 
 # ==================== FIXED DASHBOARD STATS FUNCTION ====================
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_stats_etag)
 def get_dashboard_stats(request):
     """API endpoint to get dashboard statistics - FIXED"""
     try:
         user = request.user
         is_admin = user.is_superuser
         
-        if is_admin:
-            complaints = Complaint.objects.all()
-            total_users = User.objects.count()
-        else:
-            complaints = Complaint.objects.filter(user=user)
-            total_users = None
-        
-        total = complaints.count()
-        pending = complaints.filter(status='pending').count()
-        progress = complaints.filter(status='progress').count()
-        resolved = complaints.filter(status='resolved').count()
-        reopened = complaints.filter(status='reopened').count()
-        high_urgency = complaints.filter(urgency='High').count()
-        
-        # Category breakdown
-        categories = {}
-        for c in complaints:
-            cat = c.complaint_type
-            categories[cat] = categories.get(cat, 0) + 1
+        def build():
+            if is_admin:
+                data = stats.get_stats()
+                data['total_users'] = User.objects.count()
+            else:
+                data = stats.get_stats(user)
+                data['total_users'] = None
+            return data
         
-        # Average rating - FIXED: Using Avg from django.db.models (imported at top)
-        rated = complaints.exclude(rating__isnull=True)
-        avg_result = rated.aggregate(Avg('rating'))
-        avg_rating = avg_result['rating__avg'] or 0
+        scopes = caching.complaint_scopes(user) + (['users'] if is_admin else [])
+        data = caching.cached('get_dashboard_stats', scopes, build, caching.request_variant(request))
+        return JsonResponse({'success': True, 'stats': data})
+    except Exception as e:
+        logger.exception('get_dashboard_stats failed')
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@acondition(adashboard_stats_etag)
+async def aget_dashboard_stats(request):
+    """``get_dashboard_stats`` on the async ORM, for ASGI"""
+    try:
+        user = await request.auser()
+        is_admin = user.is_superuser
         
-        stats = {
-            'total': total,
-            'pending': pending,
-            'progress': progress,
-            'resolved': resolved,
-            'reopened': reopened,
-            'high_urgency': high_urgency,
-            'categories': categories,
-            'avg_rating': round(avg_rating, 1),
-            'total_users': total_users,
-        }
+        async def build():
+            if is_admin:
+                data = await stats.aget_stats()
+                data['total_users'] = await User.objects.acount()
+            else:
+                data = await stats.aget_stats(user)
+                data['total_users'] = None
+            return data
         
-        return JsonResponse({'success': True, 'stats': stats})
+        scopes = caching.complaint_scopes(user) + (['users'] if is_admin else [])
+        data = await caching.acached('get_dashboard_stats', scopes, build, caching.request_variant(request, user))
+        return JsonResponse({'success': True, 'stats': data})
     except Exception as e:
-        # Log the error for debugging
-        print(f"🔴 Error in get_dashboard_stats: {str(e)}")
+        logger.exception('get_dashboard_stats failed')
         return JsonResponse({'success': False, 'message': str(e)})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=admin_data_etag)
 def get_admin_data(request):
-    """API endpoint to get admin panel data"""
+    """API endpoint to get admin panel data, cached until any complaint or account changes"""
     if not request.user.is_superuser:
         return JsonResponse({'success': False, 'message': 'Permission denied'})
     
     try:
-        complaints = Complaint.objects.all().order_by('-submitted_at')
-        users = User.objects.all()
-        
-        # Calculate overdue complaints (>3 days pending)
-        now = timezone.now()
-        overdue = complaints.filter(
-            status__in=['pending', 'progress'],
-            submitted_at__lte=now - timedelta(days=3)
-        ).count()
+        def build():
+            # One query for the table: owners joined, file counts per row in a subquery
+            files_count = ComplaintFile.objects.filter(complaint=OuterRef('pk')).order_by().values(
+                'complaint'
+            ).annotate(n=Count('id')).values('n')
+            complaints = Complaint.objects.select_related('user', 'duplicate_of').annotate(
+                files_count=Coalesce(Subquery(files_count, output_field=IntegerField()), Value(0))
+            ).order_by('-submitted_at')
+            users = User.objects.all()
+            
+            # Calculate overdue complaints (>3 days pending)
+            now = timezone.now()
+            overdue = complaints.filter(
+                status__in=['pending', 'progress'],
+                submitted_at__lte=now - timedelta(days=3)
+            ).count()
+            
+            totals = stats.get_stats()
+            
+            data = [{
+                'id': c.complaint_id,
+                'user_name': c.user.username,
+                'user_email': c.user.email,
+                'complaint_type': c.complaint_type,
+                'urgency': c.urgency,
+                'location': c.location,
+                'details': c.details[:100] + ('...' if len(c.details) > 100 else ''),
+                'full_details': c.details,
+                'status': c.status,
+                'submitted_at': c.submitted_at.isoformat(),
+                'submitted_date': c.submitted_at.strftime('%Y-%m-%d'),
+                'submitted_time': c.submitted_at.strftime('%H:%M'),
+                'has_files': c.files_count > 0,
+                'files_count': c.files_count,
+                'rating': c.rating,
+                'duplicate_of': c.duplicate_of.complaint_id if c.duplicate_of_id else None,
+                'days_pending': (now - c.submitted_at).days if c.status in ['pending', 'progress'] else 0,
+            } for c in complaints]
+            
+            return {
+                'success': True,
+                'complaints': data,
+                'stats': {
+                    'total_complaints': totals['total'],
+                    'total_users': users.count(),
+                    'with_files': totals['with_files'],
+                    'pending_overdue': overdue,
+                }
+            }
+            
+        # The overdue count and days_pending age with time; API_CACHE_TIMEOUT bounds that
+        payload = caching.cached('get_admin_data', ['complaints', 'users'], build, caching.request_variant(request))
+        return JsonResponse(payload)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+
+@login_required
+def export_complaints(request):
+    """
+    API endpoint streaming every complaint as a download (admin only)
+
+    ``format`` is csv (default), ndjson or xlsx; ``status`` (comma
+    separated), ``from`` and ``to`` (YYYY-MM-DD) narrow the rows.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Permission denied'})
+    
+    try:
+        encoder = export.get_encoder(request.GET.get('format', 'csv'))
+        rows = export.queryset(**export.parse_filters(request.GET))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)})
+    
+    # Each server needs the iterator flavour it can stream without buffering
+    content = export.astream(encoder, rows) if isinstance(request, ASGIRequest) else export.stream(encoder, rows)
+    response = StreamingHttpResponse(content, content_type=encoder.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export.filename(encoder)}"'
+    return response
+
+@login_required
+def get_duplicate_clusters(request):
+    """
+    API endpoint grouping recent near-duplicate complaints for triage
+
+    Each cluster is the first complaint plus the ids of the complaints
+    flagged as its duplicates, largest clusters first. ``hours`` limits
+    how far back duplicates are collected (default 48).
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Permission denied'})
+    
+    try:
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+            hours = int(request.GET.get('hours') or duplicates.WINDOW.total_seconds() // 3600)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)})
         
-        with_files = complaints.exclude(files__isnull=True).count()
+        members = defaultdict(list)
+        rows = Complaint.objects.filter(
+            duplicate_of__isnull=False,
+            submitted_at__gte=timezone.now() - timedelta(hours=hours)
+        ).order_by('submitted_at').values_list('duplicate_of_id', 'complaint_id')
+        for root_id, complaint_id in rows:
+            members[root_id].append(complaint_id)
         
-        data = [{
-            'id': c.complaint_id,
-            'user_name': c.user.username,
-            'user_email': c.user.email,
-            'complaint_type': c.complaint_type,
-            'urgency': c.urgency,
-            'location': c.location,
-            'details': c.details[:100] + ('...' if len(c.details) > 100 else ''),
-            'full_details': c.details,
-            'status': c.status,
-            'submitted_at': c.submitted_at.isoformat(),
-            'submitted_date': c.submitted_at.strftime('%Y-%m-%d'),
-            'submitted_time': c.submitted_at.strftime('%H:%M'),
-            'has_files': c.files.exists(),
-            'files_count': c.files.count(),
-            'rating': c.rating,
-            'days_pending': (now - c.submitted_at).days if c.status in ['pending', 'progress'] else 0,
-        } for c in complaints]
+        roots = complaint_queryset(Complaint.objects.filter(pk__in=members), fields)
+        clusters = sorted(
+            ({
+                'complaint': serialize_complaint(c, fields),
+                'duplicates': members[c.pk],
+                'count': len(members[c.pk]) + 1,
+            } for c in roots),
+            key=lambda cluster: -cluster['count']
+        )
         
-        return JsonResponse({
-            'success': True,
-            'complaints': data,
-            'stats': {
-                'total_complaints': complaints.count(),
-                'total_users': users.count(),
-                'with_files': with_files,
-                'pending_overdue': overdue,
-            }
-        })
+        return JsonResponse({'success': True, 'clusters': clusters})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
 
+@login_required
+def get_cache_stats(request):
+    """API endpoint with this worker's API cache hit/miss counters"""
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Permission denied'})
+    
+    return JsonResponse({'success': True, 'cache': caching.counters()})
+
+@login_required
+def get_request_metrics(request):
+    """API endpoint with this worker's per-endpoint timings and repeated-query samples (REQUEST_PROFILING)"""
+    if not request.user.is_superuser:
+        return JsonResponse({'success': False, 'message': 'Permission denied'})
+    
+    return JsonResponse({'success': True, 'enabled': settings.REQUEST_PROFILING, **profiling.metrics()})
+
+def metrics_endpoint(request):
+    """Prometheus scrape endpoint for the metrics of every worker (see complaints/metrics.py)"""
+    if not metrics.authorized(request):
+        response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    
+    return HttpResponse(metrics.exposition(), content_type=metrics.CONTENT_TYPE)
+
 @login_required
 def check_reminders(request):
     """API endpoint to check and send reminders"""
@@ -528,43 +1099,8 @@ def check_reminders(request):
         return JsonResponse({'success': False, 'message': 'Permission denied'})
     
     try:
-        now = timezone.now()
-        reminder_days = 3
-        
-        pending_complaints = Complaint.objects.filter(
-            status__in=['pending', 'progress'],
-            reminder_sent=False,
-            submitted_at__lte=now - timedelta(days=reminder_days)
-        )
-        
-        reminders_sent = 0
-        for complaint in pending_complaints:
-            days_pending = (now - complaint.submitted_at).days
-            
-            # Notify user
-            Notification.objects.create(
-                user=complaint.user,
-                title='Pending Complaint Reminder',
-                message=f'Your complaint {complaint.complaint_id} is pending for {days_pending} days.',
-                type='warning',
-                complaint=complaint
-            )
-            
-            # Notify admins
-            admin_users = User.objects.filter(is_superuser=True)
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
-                    title='⚠️ Pending Complaint',
-                    message=f'Complaint {complaint.complaint_id} pending for {days_pending} days',
-                    type='warning',
-                    complaint=complaint
-                )
-            
-            complaint.reminder_sent = True
-            complaint.reminder_sent_at = now
-            complaint.save()
-            reminders_sent += 1
+        result = reminders.sweep()
+        reminders_sent = result['reminders_sent']
         
         return JsonResponse({
             'success': True,
@@ -586,4 +1122,19 @@ def get_user_session(request):
                 'is_superuser': request.user.is_superuser
             }
         })
+    return JsonResponse({'is_authenticated': False})
+
+async def aget_user_session(request):
+    """``get_user_session`` on the async ORM, for ASGI"""
+    user = await request.auser()
+    if user.is_authenticated:
+        return JsonResponse({
+            'is_authenticated': True,
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'is_superuser': user.is_superuser
+            }
+        })
     return JsonResponse({'is_authenticated': False})
\ No newline at end of file